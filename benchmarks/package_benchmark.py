@@ -0,0 +1,97 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+''' Compares serial and parallel packaging of a synthetic app workspace.
+
+    Usage: python3 benchmarks/package_benchmark.py [file count] [worker count]
+
+    The workspace contains a mix of small source files, medium text assets
+    and larger binary files. Each package is checked for identical entries.
+'''
+
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+import sdk_package
+
+DEFAULT_FILE_COUNT = 5000
+WORDS = ['qradar', 'app', 'flask', 'offense', 'asset', 'event', 'flow', 'rule', 'import', 'return']
+
+class BenchmarkManifest():
+    def __init__(self, manifest_json):
+        self.json = manifest_json
+
+class BenchmarkWorkspace():
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as manifest_file:
+            self.manifest = BenchmarkManifest(json.load(manifest_file))
+
+def create_workspace(path, file_count):
+    rand = random.Random(0)
+    with open(os.path.join(path, 'manifest.json'), 'w') as manifest_file:
+        json.dump({'name': 'benchmark', 'version': '1.0.0', 'uuid': '00000000-0000-0000-0000-000000000000',
+                   'image': 'qradar-app-base:2.1.8'}, manifest_file)
+    for index in range(file_count):
+        kind = index % 10
+        if kind < 7:
+            relative_dir = os.path.join('app', 'module{0}'.format(index % 50))
+            content = ' '.join(rand.choice(WORDS) for _ in range(rand.randint(200, 2000))).encode()
+            file_name = 'source{0}.py'.format(index)
+        elif kind < 9:
+            relative_dir = os.path.join('app', 'static', 'assets{0}'.format(index % 20))
+            content = ' '.join(rand.choice(WORDS) for _ in range(rand.randint(10000, 40000))).encode()
+            file_name = 'asset{0}.js'.format(index)
+        else:
+            relative_dir = os.path.join('container', 'pip')
+            content = rand.getrandbits(8 * 200000).to_bytes(200000, 'little')
+            file_name = 'wheel{0}.whl'.format(index)
+        os.makedirs(os.path.join(path, relative_dir), exist_ok=True)
+        with open(os.path.join(path, relative_dir, file_name), 'wb') as workspace_file:
+            workspace_file.write(content)
+
+def time_package(workspace, zip_path, workers):
+    start_time = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sdk_package.create_zip(workspace, zip_path, workers=workers)
+    return time.monotonic() - start_time
+
+def zip_entries(zip_path):
+    with zipfile.ZipFile(zip_path) as package_zip:
+        return [(zinfo.filename, zinfo.CRC, zinfo.compress_size) for zinfo in package_zip.infolist()]
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILE_COUNT
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workspace_path = os.path.join(temp_dir, 'workspace')
+        os.makedirs(workspace_path)
+        print('Creating workspace with {0} files'.format(file_count))
+        create_workspace(workspace_path, file_count)
+        workspace = BenchmarkWorkspace(workspace_path)
+        serial_zip = os.path.join(temp_dir, 'serial.zip')
+        parallel_zip = os.path.join(temp_dir, 'parallel.zip')
+        serial_seconds = time_package(workspace, serial_zip, 1)
+        parallel_seconds = time_package(workspace, parallel_zip, workers)
+        print('Serial:             {0:.2f}s'.format(serial_seconds))
+        print('Parallel ({0} workers): {1:.2f}s'.format(workers, parallel_seconds))
+        print('Speedup:            {0:.2f}x'.format(serial_seconds / parallel_seconds))
+        if zip_entries(serial_zip) != zip_entries(parallel_zip):
+            print('ERROR: serial and parallel packages differ')
+            sys.exit(1)
+        print('Serial and parallel packages contain identical entries')
+
+if __name__ == '__main__':
+    main()
@@ -3,18 +3,501 @@
 '''QRadar App Log Collector'''
 
 import argparse
+import collections
+import ctypes
+import ctypes.util
+import json
 import os
+import select
 import signal
+import socket
+import stat
+import struct
+import threading
 import time
-import logging
 import sys
 
+class InotifyWatcher():
+    ''' Reports changes beneath a directory tree using Linux inotify.
+        Raises OSError if inotify is not available.
+    '''
+    # From <sys/inotify.h>.
+    IN_MODIFY = 0x00000002
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+    WATCH_MASK = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    EVENT_HEADER_FORMAT = 'iIII'
+    EVENT_HEADER_SIZE = struct.calcsize(EVENT_HEADER_FORMAT)
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('C library not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError('inotify is not supported')
+        self.inotify_fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watched_dirs = {}
+        self.add_tree(directory)
+
+    def add_tree(self, directory):
+        for dir_path, _, _ in os.walk(directory):
+            watch_descriptor = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(dir_path),
+                                                           self.WATCH_MASK)
+            if watch_descriptor >= 0:
+                self.watched_dirs[watch_descriptor] = dir_path
+
+    def read_events(self, timeout):
+        ''' Waits up to timeout seconds for changes.
+            Returns a list of (path, is_new_directory) tuples.
+        '''
+        if not select.select([self.inotify_fd], [], [], timeout)[0]:
+            return []
+        try:
+            buffer = os.read(self.inotify_fd, self.READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            watch_descriptor, mask, _, name_length = struct.unpack_from(self.EVENT_HEADER_FORMAT, buffer, offset)
+            offset += self.EVENT_HEADER_SIZE
+            name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            dir_path = self.watched_dirs.get(watch_descriptor)
+            if dir_path is None:
+                continue
+            if mask & self.IN_DELETE_SELF:
+                del self.watched_dirs[watch_descriptor]
+                continue
+            is_new_directory = bool(mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO))
+            events.append((os.path.join(dir_path, name), is_new_directory))
+        return events
+
+    def close(self):
+        os.close(self.inotify_fd)
+
+class LogFileTailer(threading.Thread):
+    ''' Follows one log file from a starting (inode, offset) position,
+        passing each batch of complete lines to ship(log_file_path, lines, position),
+        where position is the (inode, offset) just after the batch.
+        position is the inode and the offset of the first byte not yet read as a line.
+        Rotation is detected when the path refers to a different inode,
+        and truncation when the file becomes smaller than the read position.
+        The thread ends once its file has been removed and fully read.
+    '''
+    READ_SIZE = 64 * 1024
+    # A line longer than this is shipped in pieces.
+    MAX_LINE_SIZE = 64 * 1024
+
+    def __init__(self, log_file_path, ship, position, check_interval):
+        super().__init__(name='tail ' + os.path.basename(log_file_path), daemon=True)
+        self.log_file_path = log_file_path
+        self.ship = ship
+        self.position = position
+        self.check_interval = check_interval
+        self.log_file = None
+        self.partial_line = b''
+        self.changed = threading.Event()
+        self.running = True
+        self.removed = False
+
+    def wake(self):
+        self.changed.set()
+
+    def stop(self):
+        self.running = False
+        self.changed.set()
+
+    def run(self):
+        while self.running:
+            self.changed.clear()
+            try:
+                if not self.follow():
+                    self.removed = True
+                    break
+            except OSError as err:
+                print('Unable to read {0}: {1}'.format(self.log_file_path, err), file=sys.stderr)
+            self.changed.wait(self.check_interval)
+        if self.log_file:
+            self.log_file.close()
+
+    def follow(self):
+        ''' Ships everything written since the last call.
+            Returns False once the file has been removed.
+        '''
+        if self.log_file is None and not self.open():
+            return False
+        self.read_to_end()
+        try:
+            path_inode = os.stat(self.log_file_path).st_ino
+        except FileNotFoundError:
+            # Removed, or renamed by rotation. A file created in its place is followed by a new tailer.
+            self.ship_partial_line()
+            return False
+        if path_inode != self.position[0]:
+            # Rotated. Everything written before rotation has now been read.
+            self.ship_partial_line()
+            self.log_file.close()
+            self.log_file = None
+            if not self.open():
+                return False
+            self.read_to_end()
+        return True
+
+    def open(self):
+        try:
+            log_file = open(self.log_file_path, 'rb')
+        except FileNotFoundError:
+            return False
+        file_stat = os.fstat(log_file.fileno())
+        inode, offset = self.position
+        if file_stat.st_ino == inode and file_stat.st_size >= offset:
+            log_file.seek(offset)
+        else:
+            self.position = (file_stat.st_ino, 0)
+        self.log_file = log_file
+        return True
+
+    def read_to_end(self):
+        if os.fstat(self.log_file.fileno()).st_size < self.log_file.tell():
+            # Truncated in place, e.g. by copytruncate rotation.
+            self.log_file.seek(0)
+            self.partial_line = b''
+            self.position = (self.position[0], 0)
+        while self.running:
+            data = self.log_file.read(self.READ_SIZE)
+            if not data:
+                return
+            lines = (self.partial_line + data).split(b'\n')
+            self.partial_line = lines.pop()
+            if len(self.partial_line) > self.MAX_LINE_SIZE:
+                lines.append(self.partial_line)
+                self.partial_line = b''
+            position = (self.position[0], self.log_file.tell() - len(self.partial_line))
+            if lines:
+                self.ship(self.log_file_path, [line.decode('utf-8', 'replace') for line in lines], position)
+            self.position = position
+
+    def ship_partial_line(self):
+        if self.partial_line:
+            position = (self.position[0], self.position[1] + len(self.partial_line))
+            self.ship(self.log_file_path, [self.partial_line.decode('utf-8', 'replace')], position)
+            self.position = position
+            self.partial_line = b''
+
+class TokenBucket():
+    ''' Allows rate lines a second on average, in bursts of up to burst lines. '''
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, count):
+        ''' Takes up to count tokens and returns the number taken. '''
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            taken = min(count, int(self.tokens))
+            self.tokens -= taken
+            return taken
+
+    def give_back(self, count):
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + count)
+
+class LogFileCounters():
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.shipped = 0
+        self.suppressed = 0
+        self.sampled = 0
+        self.unreported_suppressed = 0
+        self.over_budget = 0
+
+class RateLimiter():
+    ''' Limits the lines shipped from each log file, and from all log files together,
+        using token buckets. Once a file is over budget, one line in sample_interval
+        is still shipped so that the cause of a flood can be seen.
+        The rest are suppressed and counted, and take_unreported() returns
+        the number suppressed for each file since it was last called.
+        A rate of 0 disables that limit.
+    '''
+    def __init__(self, file_rate, file_burst, global_rate, global_burst, sample_interval):
+        self.file_rate = file_rate
+        self.file_burst = file_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate else None
+        self.sample_interval = sample_interval
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def admit(self, log_file_path, lines):
+        ''' Returns the lines which may be shipped. '''
+        counters = self.counters_for(log_file_path)
+        allowed = len(lines)
+        if counters.bucket:
+            allowed = counters.bucket.take(allowed)
+        if self.global_bucket:
+            globally_allowed = self.global_bucket.take(allowed)
+            if counters.bucket:
+                counters.bucket.give_back(allowed - globally_allowed)
+            allowed = globally_allowed
+        admitted = lines[:allowed]
+        with self.lock:
+            for line in lines[allowed:]:
+                if self.sample_interval and counters.over_budget % self.sample_interval == 0:
+                    admitted.append(line)
+                    counters.sampled += 1
+                else:
+                    counters.suppressed += 1
+                    counters.unreported_suppressed += 1
+                counters.over_budget += 1
+            counters.shipped += len(admitted)
+        return admitted
+
+    def counters_for(self, log_file_path):
+        with self.lock:
+            counters = self.counters.get(log_file_path)
+            if counters is None:
+                bucket = TokenBucket(self.file_rate, self.file_burst) if self.file_rate else None
+                counters = LogFileCounters(bucket)
+                self.counters[log_file_path] = counters
+            return counters
+
+    def take_unreported(self):
+        ''' Returns a dict mapping log file path to the number of lines suppressed since the last call. '''
+        with self.lock:
+            unreported = {}
+            for log_file_path, counters in self.counters.items():
+                if counters.unreported_suppressed:
+                    unreported[log_file_path] = counters.unreported_suppressed
+                    counters.unreported_suppressed = 0
+            return unreported
+
+    def stats(self):
+        with self.lock:
+            return {log_file_path: {'shipped': counters.shipped, 'suppressed': counters.suppressed,
+                                    'sampled': counters.sampled}
+                    for log_file_path, counters in self.counters.items()}
+
+class SyslogShipper(threading.Thread):
+    ''' Sends log lines as LEEF events to a syslog receiver from a background thread.
+        Once MAX_QUEUED_LINES are waiting, submit() either waits for room, which
+        suits a caller that can read its lines again later, or drops the lines that
+        don't fit and counts them. An event reporting how many lines were dropped
+        is sent once the queue has room again.
+        Over UDP each event is one datagram, framed as by logging's SysLogHandler,
+        and an event too long for a datagram is truncated.
+        Over TCP events are framed by octet counting (RFC 6587),
+        and each batch is written with one send.
+        Lines may be submitted with a confirmation, which is passed to on_sent
+        once all the lines up to and including them have been sent.
+    '''
+    PROTOCOL_UDP = 'udp'
+    PROTOCOL_TCP = 'tcp'
+    PROTOCOLS = (PROTOCOL_UDP, PROTOCOL_TCP)
+    # Facility user, severity info.
+    PRIORITY = b'<14>'
+    MAX_QUEUED_LINES = 10000
+    BATCH_SIZE = 500
+    # Largest UDP payload over IPv4, including the trailing NUL.
+    MAX_DATAGRAM_SIZE = 65507
+    # Delay before reconnecting after a TCP connection fails.
+    RECONNECT_DELAY = 5
+    # How long stop() waits for queued lines to be sent.
+    DRAIN_TIMEOUT = 2
+    DROPPED_MESSAGE = '{0} lines were dropped because the syslog queue was full'
+
+    def __init__(self, address, protocol, leef_template, app_id, on_sent=None):
+        super().__init__(name='syslog shipper', daemon=True)
+        self.on_sent = on_sent
+        self.address = address
+        self.protocol = protocol
+        self.leef_template = leef_template
+        self.app_id = app_id
+        self.prefixes = {}
+        self.queue = collections.deque()
+        self.queued_lines = 0
+        self.condition = threading.Condition()
+        self.room_available = threading.Condition(self.condition)
+        self.running = True
+        self.sock = None
+        self.sockaddr = None
+        self.reconnect_time = 0
+        self.unreported_drops = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, log_file, lines, block=False, confirmation=None):
+        with self.condition:
+            if block:
+                while self.running and self.queued_lines + len(lines) > self.MAX_QUEUED_LINES:
+                    self.room_available.wait()
+            room = self.MAX_QUEUED_LINES - self.queued_lines
+            if len(lines) > room:
+                self.dropped += len(lines) - room
+                self.unreported_drops += len(lines) - room
+                lines = lines[:room]
+            if lines:
+                self.queue.append((log_file, lines, confirmation))
+                self.queued_lines += len(lines)
+                self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+            self.room_available.notify_all()
+        self.join(self.DRAIN_TIMEOUT)
+
+    def stats(self):
+        with self.condition:
+            return {'sent': self.sent, 'dropped': self.dropped, 'failed': self.failed,
+                    'queued': self.queued_lines}
+
+    def run(self):
+        drain_deadline = None
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    drain_deadline = drain_deadline or time.monotonic() + self.DRAIN_TIMEOUT
+                    if not self.queue or time.monotonic() > drain_deadline:
+                        break
+                batch = self.take_batch()
+                if self.unreported_drops and self.queued_lines < self.MAX_QUEUED_LINES // 2:
+                    batch.append(('log_collector.py', [self.DROPPED_MESSAGE.format(self.unreported_drops)], None))
+                    self.unreported_drops = 0
+            self.send(batch)
+        self.close()
+
+    def take_batch(self):
+        ''' Removes up to BATCH_SIZE lines from the queue. The caller must hold the condition. '''
+        batch = []
+        batch_lines = 0
+        while self.queue and batch_lines < self.BATCH_SIZE:
+            log_file, lines, confirmation = self.queue.popleft()
+            room = self.BATCH_SIZE - batch_lines
+            if len(lines) > room:
+                # The confirmation stays with the last of the lines.
+                self.queue.appendleft((log_file, lines[room:], confirmation))
+                lines = lines[:room]
+                confirmation = None
+            batch.append((log_file, lines, confirmation))
+            batch_lines += len(lines)
+        self.queued_lines -= batch_lines
+        self.room_available.notify_all()
+        return batch
+
+    def send(self, batch):
+        messages = []
+        # Each confirmation, with the number of messages which must be sent to confirm it.
+        confirmations = []
+        for log_file, lines, confirmation in batch:
+            prefix = self.prefixes.get(log_file)
+            if prefix is None:
+                prefix = self.PRIORITY + self.leef_template.format(self.app_id, log_file, '').encode('utf-8')
+                self.prefixes[log_file] = prefix
+            messages.extend(prefix + line.encode('utf-8', 'replace') for line in lines)
+            if confirmation:
+                confirmations.append((len(messages), confirmation))
+        try:
+            self.connect()
+            if self.protocol == self.PROTOCOL_TCP:
+                self.sock.sendall(b''.join(str(len(message)).encode() + b' ' + message for message in messages))
+                sent = sent_in_order = len(messages)
+            else:
+                sent, sent_in_order = self.send_datagrams(messages)
+        except OSError as err:
+            self.report_send_error(len(messages), err)
+            self.close()
+            if self.protocol == self.PROTOCOL_TCP:
+                self.reconnect_time = time.monotonic() + self.RECONNECT_DELAY
+            sent = sent_in_order = 0
+        with self.condition:
+            self.sent += sent
+            self.failed += len(messages) - sent
+        if self.on_sent:
+            for required, confirmation in confirmations:
+                if required > sent_in_order:
+                    break
+                self.on_sent(*confirmation)
+
+    def send_datagrams(self, messages):
+        ''' Sends each message in its own datagram, so that one which cannot be sent
+            does not stop the others. Returns the number of messages sent, and the
+            number sent before the first which could not be.
+        '''
+        sent = 0
+        sent_in_order = None
+        first_error = None
+        for message in messages:
+            if len(message) >= self.MAX_DATAGRAM_SIZE:
+                message = self.truncate(message, self.MAX_DATAGRAM_SIZE - 1)
+            try:
+                self.sock.sendto(message + b'\0', self.sockaddr)
+                sent += 1
+            except OSError as err:
+                if first_error is None:
+                    first_error = err
+                    sent_in_order = sent
+        if first_error is not None:
+            self.report_send_error(len(messages) - sent, first_error)
+            return sent, sent_in_order
+        return sent, sent
+
+    @staticmethod
+    def truncate(message, size):
+        ''' Shortens UTF-8 encoded message to at most size bytes without splitting a character. '''
+        while size > 0 and message[size] & 0xC0 == 0x80:
+            size -= 1
+        return message[:size]
+
+    def report_send_error(self, line_count, err):
+        print('Unable to send {0} lines to syslog at {1}:{2}: {3}'
+              .format(line_count, self.address[0], self.address[1], err), file=sys.stderr)
+
+    def connect(self):
+        if self.sock:
+            return
+        if time.monotonic() < self.reconnect_time:
+            raise OSError('waiting to reconnect')
+        socket_type = socket.SOCK_STREAM if self.protocol == self.PROTOCOL_TCP else socket.SOCK_DGRAM
+        family, _, _, _, sockaddr = socket.getaddrinfo(self.address[0], self.address[1], 0, socket_type)[0]
+        sock = socket.socket(family, socket_type)
+        if self.protocol == self.PROTOCOL_TCP:
+            try:
+                sock.connect(sockaddr)
+            except OSError:
+                sock.close()
+                raise
+        self.sock = sock
+        self.sockaddr = sockaddr
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
 class AppLogCollector():
     LOGGER_NAME = 'QRadarAppLog'
     LOG_SUFFIXES = ('.log', '.error')
 
-    STDOUT_FORMAT = 'logfile={0}: {1}'
-    SYSLOG_FORMAT = '%(message)s'
+    STDOUT_FORMAT = 'logfile={0}: {1}\n'
     LEEF_TEMPLATE = 'LEEF:1.0|QRadar|QRadarAppLogger|1.0|QRadarAppLog|APP_ID={0} LOG_FILE={1} LOG_MESSAGE={2}'
 
     STRATEGY_STDOUT = 'stdout'
@@ -23,19 +506,45 @@ class AppLogCollector():
 
     APP_ID = os.getenv('QRADAR_APP_ID', '0')
 
+    # Records how far each log file has been written to stdout or sent to syslog,
+    # so that a restarted container neither loses nor repeats lines.
+    # Lines only queued for syslog are not counted.
+    OFFSETS_FILE = '.log_collector_offsets.json'
+    SAVE_INTERVAL = 2
+    # With inotify, files and the directory are still checked this often in case a change was missed.
+    # Without inotify, this is how often they are checked.
+    INOTIFY_CHECK_INTERVAL = 10
+    POLL_INTERVAL = 1
+    # Counters for each log file and for syslog, rewritten every SAVE_INTERVAL.
+    STATS_FILE = 'log_collector_stats.json'
+    SUMMARY_INTERVAL = 10
+    SUPPRESSED_MESSAGE = '{0} lines suppressed by the log collector rate limit'
+
     def __init__(self):
         self.running = False
         self.directory = None
         self.strategy = self.STRATEGY_SYSLOG
         self.log_files = {}
-        self.logger = None
+        self.positions = {}
+        self.positions_lock = threading.Lock()
+        self.watcher = None
+        self.check_interval = self.POLL_INTERVAL
+        self.syslog_address = None
+        self.syslog_protocol = SyslogShipper.PROTOCOL_UDP
+        self.shipper = None
+        self.rate_limiter = None
+        self.output_lock = threading.Lock()
+        self.excluded_inode = None
 
     def boot(self):
         self.parse_args()
         if self.strategy == self.STRATEGY_SYSLOG:
-            self.create_logger()
+            self.create_shipper()
+        else:
+            self.exclude_own_output()
         signal.signal(signal.SIGINT, self.shutdown)
         signal.signal(signal.SIGQUIT, self.shutdown)
+        signal.signal(signal.SIGTERM, self.shutdown)
         self.run()
 
     # pylint: disable=unused-argument
@@ -49,6 +558,27 @@ class AppLogCollector():
                             help='Directory to collect logs from. Defaults to {0}'.format(log_dir))
         parser.add_argument('-l', '--log-strategy', dest='strategy', default='syslog',
                             help='Logging strategy to use. Possible values: syslog (default), stdout')
+        parser.add_argument('--syslog-host', default=os.getenv('QRADAR_CONSOLE_FQDN'),
+                            help='Host to send syslog events to. Defaults to QRADAR_CONSOLE_FQDN')
+        parser.add_argument('--syslog-port', type=int, default=514,
+                            help='Port to send syslog events to. Defaults to 514')
+        parser.add_argument('--syslog-protocol', choices=SyslogShipper.PROTOCOLS, default=SyslogShipper.PROTOCOL_UDP,
+                            help='Protocol to send syslog events with. Defaults to udp')
+        # Lines written to stdout are collected by the container runtime,
+        # so by default they are not limited.
+        parser.add_argument('--file-rate', type=float,
+                            help=('Lines a second shipped from each log file on average. '
+                                  'Defaults to 100 for syslog, 0 for stdout. 0 for no limit'))
+        parser.add_argument('--file-burst', type=int, default=1000,
+                            help='Lines which may be shipped at once from each log file. Defaults to 1000')
+        parser.add_argument('--global-rate', type=float,
+                            help=('Lines a second shipped from all log files on average. '
+                                  'Defaults to 500 for syslog, 0 for stdout. 0 for no limit'))
+        parser.add_argument('--global-burst', type=int, default=5000,
+                            help='Lines which may be shipped at once from all log files. Defaults to 5000')
+        parser.add_argument('--sample-interval', type=int, default=100,
+                            help=('Once over a limit, ship one line in this many. '
+                                  'Defaults to 100, 0 to suppress every line'))
 
         args = parser.parse_args()
 
@@ -62,56 +592,184 @@ class AppLogCollector():
 
         self.directory = args.directory
         self.strategy = args.strategy
+        self.syslog_address = (args.syslog_host, args.syslog_port)
+        self.syslog_protocol = args.syslog_protocol
+        if args.file_rate is None:
+            args.file_rate = 100 if self.strategy == self.STRATEGY_SYSLOG else 0
+        if args.global_rate is None:
+            args.global_rate = 500 if self.strategy == self.STRATEGY_SYSLOG else 0
+        self.rate_limiter = RateLimiter(args.file_rate, args.file_burst, args.global_rate, args.global_burst,
+                                        args.sample_interval)
+
+    def exclude_own_output(self):
+        # If stdout is a file in the log directory, following it would repeat every line forever.
+        stdout_stat = os.fstat(sys.stdout.fileno())
+        if stat.S_ISREG(stdout_stat.st_mode):
+            self.excluded_inode = stdout_stat.st_ino
 
     def run(self):
         self.running = True
+        self.positions = self.load_offsets()
+        try:
+            self.watcher = InotifyWatcher(self.directory)
+            self.check_interval = self.INOTIFY_CHECK_INTERVAL
+        except OSError:
+            pass
+        for path in self.find_log_files():
+            self.start_handling_log_file(path)
+
+        last_save_time = last_scan_time = last_summary_time = time.monotonic()
         while self.running:
-            log_file_paths = self.find_log_files()
-            for path in log_file_paths:
-                if path not in self.log_files.keys():
+            if self.watcher:
+                self.handle_events(self.watcher.read_events(self.POLL_INTERVAL))
+            else:
+                time.sleep(self.POLL_INTERVAL)
+            if time.monotonic() - last_scan_time >= self.check_interval:
+                for path in self.find_log_files():
                     self.start_handling_log_file(path)
-            time.sleep(60)
+                last_scan_time = time.monotonic()
+            if time.monotonic() - last_summary_time >= self.SUMMARY_INTERVAL:
+                self.report_suppressed_lines()
+                last_summary_time = time.monotonic()
+            if time.monotonic() - last_save_time >= self.SAVE_INTERVAL:
+                self.save_offsets()
+                self.save_stats()
+                last_save_time = time.monotonic()
+
+        for tailer in self.log_files.values():
+            tailer.stop()
+        for tailer in self.log_files.values():
+            tailer.join(self.SAVE_INTERVAL)
+        self.report_suppressed_lines()
+        if self.shipper:
+            self.shipper.stop()
+        self.save_offsets()
+        self.save_stats()
+        if self.watcher:
+            self.watcher.close()
 
-    def find_log_files(self):
+    def handle_events(self, events):
+        for path, is_new_directory in events:
+            if is_new_directory:
+                self.watcher.add_tree(path)
+                for log_file_path in self.find_log_files(path):
+                    self.start_handling_log_file(log_file_path)
+            elif path in self.log_files and not self.log_files[path].removed:
+                self.log_files[path].wake()
+            elif path.endswith(self.LOG_SUFFIXES) and os.path.isfile(path):
+                self.start_handling_log_file(path)
+
+    def find_log_files(self, directory=None):
         log_file_paths = []
-        # Python3: use pathlib.Path.rglob() instead of os.walk?
-        for _, _, files in os.walk(self.directory):
-            for log_file_path in files:
-                if log_file_path.endswith(self.LOG_SUFFIXES):
-                    log_file_paths.append(os.path.join(self.directory, log_file_path))
+        for dir_path, _, files in os.walk(directory or self.directory):
+            for log_file_name in files:
+                if log_file_name.endswith(self.LOG_SUFFIXES):
+                    log_file_paths.append(os.path.join(dir_path, log_file_name))
         return log_file_paths
 
     def start_handling_log_file(self, log_file_path):
-        log_files_entry = {}
-        self.log_files[log_file_path] = log_files_entry
-        # Start new thread.
-        # Send logs based on self.strategy.
-        # Populate log_files_entry.
-        # Need to handle rotating logs, container stop/start.
-
-    def send_logs_to_stdout(self, log_file_path):
-        with open(log_file_path) as log_file:
-            for line in log_file:
-                print(self.STDOUT_FORMAT.format(log_file_path, line.rstrip()))
-
-    def send_logs_to_syslog(self, log_file_path):
-        log_file_basename = os.path.basename(log_file_path)
-        with open(log_file_path) as log_file:
-            for line in log_file:
-                self.log(line.rstrip(), log_file_basename)
-
-    def create_logger(self):
-        syslog_handler = logging.handlers.SysLogHandler(address=(os.getenv('QRADAR_CONSOLE_FQDN'), 514))
-        syslog_handler.setFormatter(logging.Formatter(self.SYSLOG_FORMAT))
-        self.logger = logging.getLogger(self.LOGGER_NAME)
-        self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(syslog_handler)
+        tailer = self.log_files.get(log_file_path)
+        if tailer and not tailer.removed:
+            return
+        try:
+            if os.stat(log_file_path).st_ino == self.excluded_inode:
+                return
+        except FileNotFoundError:
+            return
+        with self.positions_lock:
+            if tailer:
+                # The previous file at this path was removed, so this one is new.
+                del self.log_files[log_file_path]
+                self.positions.pop(log_file_path, None)
+            position = self.positions.get(log_file_path, (None, 0))
+        tailer = LogFileTailer(log_file_path, self.ship, position, self.check_interval)
+        self.log_files[log_file_path] = tailer
+        tailer.start()
+
+    def load_offsets(self):
+        try:
+            with open(os.path.join(self.directory, self.OFFSETS_FILE)) as offsets_file:
+                offsets = json.load(offsets_file)
+            return {path: (entry['inode'], entry['offset']) for path, entry in offsets.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def confirm_position(self, log_file_path, inode, offset):
+        ''' Records that everything before offset in the file with inode has been shipped. '''
+        with self.positions_lock:
+            self.positions[log_file_path] = (inode, offset)
+
+    def save_offsets(self):
+        with self.positions_lock:
+            for log_file_path, tailer in list(self.log_files.items()):
+                if tailer.removed:
+                    del self.log_files[log_file_path]
+                    self.positions.pop(log_file_path, None)
+            offsets = {path: {'inode': inode, 'offset': offset}
+                       for path, (inode, offset) in self.positions.items() if inode is not None}
+        self.write_json_file(self.OFFSETS_FILE, offsets)
+
+    def save_stats(self):
+        file_stats = self.rate_limiter.stats()
+        stats = {'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'total': {name: sum(counters[name] for counters in file_stats.values())
+                           for name in ('shipped', 'suppressed', 'sampled')},
+                 'files': file_stats}
+        if self.shipper:
+            stats['syslog'] = self.shipper.stats()
+        self.write_json_file(self.STATS_FILE, stats)
+
+    def write_json_file(self, file_name, content):
+        # Written to a temporary file then renamed, so that a reader never sees part of a file.
+        file_path = os.path.join(self.directory, file_name)
+        try:
+            with open(file_path + '.tmp', 'w') as json_file:
+                json.dump(content, json_file, indent=2)
+            os.replace(file_path + '.tmp', file_path)
+        except OSError as err:
+            print('Unable to save {0}: {1}'.format(file_path, err), file=sys.stderr)
+
+    def ship(self, log_file_path, lines, position):
+        # Called by tailer threads, which may wait for room in the syslog queue
+        # because their lines can be read again from the log file.
+        lines = self.rate_limiter.admit(log_file_path, lines)
+        if lines:
+            self.send_logs(log_file_path, lines, block=True, position=position)
+        else:
+            self.confirm_position(log_file_path, *position)
+
+    def report_suppressed_lines(self):
+        for log_file_path, count in self.rate_limiter.take_unreported().items():
+            self.send_logs(log_file_path, [self.SUPPRESSED_MESSAGE.format(count)])
+
+    def send_logs(self, log_file_path, lines, block=False, position=None):
+        if self.strategy == self.STRATEGY_STDOUT:
+            self.send_logs_to_stdout(log_file_path, lines)
+            if position:
+                self.confirm_position(log_file_path, *position)
+        else:
+            confirmation = (log_file_path,) + position if position else None
+            self.send_logs_to_syslog(log_file_path, lines, block, confirmation)
+
+    def send_logs_to_stdout(self, log_file_path, lines):
+        output = ''.join(self.STDOUT_FORMAT.format(log_file_path, line.rstrip()) for line in lines)
+        with self.output_lock:
+            sys.stdout.write(output)
+            sys.stdout.flush()
+
+    def send_logs_to_syslog(self, log_file_path, lines, block=False, confirmation=None):
+        self.shipper.submit(os.path.basename(log_file_path), [line.rstrip() for line in lines], block,
+                            confirmation)
+
+    def create_shipper(self):
+        self.shipper = SyslogShipper(self.syslog_address, self.syslog_protocol, self.LEEF_TEMPLATE, self.APP_ID,
+                                     self.confirm_position)
+        self.shipper.start()
         self.log('Created log ' + self.LOGGER_NAME, 'log_collector.py')
 
     def log(self, message, log_file):
         # For now, log every message as INFO.
-        log_message = self.LEEF_TEMPLATE.format(self.APP_ID, log_file, message)
-        self.logger.info(log_message)
+        self.shipper.submit(log_file, [message])
 
 if __name__ == '__main__':
     AppLogCollector().boot()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+'''QRadar App Log Rotator
+
+Rotates the logs which the SDK writes to store/log, and compresses rotated segments.
+  + startup.log and the startup.d script logs are held open by their writers,
+    e.g. tee in start_flask.sh, so they are rotated by copying their content
+    to a compressed segment, then truncating them. Their writers append to them,
+    so writing continues from the start of a truncated log.
+    While the log collector is running, a log is not truncated until the collector
+    has shipped all of it, or until MAX_SHIPPING_WAIT seconds have passed.
+  + supervisord rotates its own log and program logs by renaming them to
+    <log>.1, <log>.2 etc. Those segments are compressed here.
+Compressed segments are named <log>.<YYYYmmdd-HHMMSS>.gz so that neither kind of
+rotation overwrites them, and so that the log collector does not follow them.
+The log collector reads a renamed log to its end and starts again from the
+beginning of a truncated log, so it handles both kinds of rotation.
+'''
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import signal
+import sys
+import time
+
+class AppLogRotator():
+    # Logs rotated here rather than by supervisord.
+    ACTIVE_LOG_PATTERN = re.compile(r'^(startup\.log|A\w+\.sh\.log)$')
+    # Segments left by supervisord, or by another rename-based rotation.
+    # A .compressing segment was being compressed when the rotator stopped.
+    SEGMENT_PATTERN = re.compile(r'^(.+\.(?:log|error))\.\d+(?:\.compressing)?$')
+    COMPRESSED_SEGMENT_PATTERN = re.compile(r'^(.+\.(?:log|error))\.\d{8}-\d{6}(?:-\d+)?\.gz$')
+    TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+    COPY_SIZE = 1024 * 1024
+    # Written by log_collector.py, mapping each log path to the inode and offset shipped up to.
+    COLLECTOR_OFFSETS_FILE = '.log_collector_offsets.json'
+    MAX_SHIPPING_WAIT = 600
+
+    def __init__(self):
+        self.running = False
+        self.directory = None
+        self.max_bytes = 0
+        self.rotate_seconds = 0
+        self.backups = 0
+        self.max_age_seconds = 0
+        self.interval = 0
+        self.last_rotation_times = {}
+        self.shipping_wait_start_times = {}
+
+    def boot(self):
+        self.parse_args()
+        signal.signal(signal.SIGINT, self.shutdown)
+        signal.signal(signal.SIGQUIT, self.shutdown)
+        signal.signal(signal.SIGTERM, self.shutdown)
+        self.run()
+
+    # pylint: disable=unused-argument
+    def shutdown(self, signal_number, frame):
+        self.running = False
+
+    def parse_args(self):
+        log_dir = os.path.join(os.getenv('APP_ROOT'), 'store', 'log')
+        parser = argparse.ArgumentParser(description='QRadar App Log Rotator')
+        parser.add_argument('-d', '--directory', default=log_dir,
+                            help='Directory holding the logs to rotate. Defaults to {0}'.format(log_dir))
+        parser.add_argument('--max-bytes', type=int, default=10 * 1024 * 1024,
+                            help='Rotate a log once it reaches this size. Defaults to 10MB')
+        parser.add_argument('--rotate-hours', type=float, default=24,
+                            help='Rotate a log this many hours after it was last rotated. Defaults to 24')
+        parser.add_argument('--backups', type=int, default=5,
+                            help='Number of compressed segments kept for each log. Defaults to 5')
+        parser.add_argument('--max-age-days', type=float, default=7,
+                            help='Remove compressed segments older than this. Defaults to 7')
+        parser.add_argument('--interval', type=float, default=60,
+                            help='Seconds between checks. Defaults to 60')
+
+        args = parser.parse_args()
+
+        if not os.path.isdir(args.directory):
+            print('Directory {} does not exist'.format(args.directory))
+            sys.exit(1)
+
+        self.directory = args.directory
+        self.max_bytes = args.max_bytes
+        self.rotate_seconds = args.rotate_hours * 3600
+        self.backups = args.backups
+        self.max_age_seconds = args.max_age_days * 86400
+        self.interval = args.interval
+
+    def run(self):
+        self.running = True
+        while self.running:
+            try:
+                file_names = os.listdir(self.directory)
+                for file_name in file_names:
+                    if self.ACTIVE_LOG_PATTERN.match(file_name):
+                        self.rotate_if_due(file_name)
+                    elif self.SEGMENT_PATTERN.match(file_name):
+                        self.compress_segment(file_name)
+                self.remove_old_segments()
+            except OSError as err:
+                print('Unable to rotate logs: {0}'.format(err), file=sys.stderr)
+            deadline = time.monotonic() + self.interval
+            while self.running and time.monotonic() < deadline:
+                time.sleep(1)
+
+    def rotate_if_due(self, file_name):
+        log_path = os.path.join(self.directory, file_name)
+        log_stat = os.stat(log_path)
+        size = log_stat.st_size
+        last_rotation_time = self.last_rotation_times.setdefault(file_name, time.time())
+        if size == 0:
+            return
+        if size < self.max_bytes and time.time() - last_rotation_time < self.rotate_seconds:
+            return
+        if self.collector_is_behind(log_path, log_stat.st_ino, size):
+            wait_start_time = self.shipping_wait_start_times.setdefault(file_name, time.time())
+            if time.time() - wait_start_time < self.MAX_SHIPPING_WAIT:
+                return
+            print('Rotating {0} before the log collector has shipped all of it'.format(log_path),
+                  file=sys.stderr)
+        self.shipping_wait_start_times.pop(file_name, None)
+        with open(log_path, 'rb') as log_file:
+            with gzip.open(self.new_segment_path(file_name, time.time()), 'wb') as segment_file:
+                shutil.copyfileobj(log_file, segment_file, self.COPY_SIZE)
+            # Anything written between the copy and this truncation is lost,
+            # as with logrotate's copytruncate.
+            os.truncate(log_path, 0)
+        self.last_rotation_times[file_name] = time.time()
+
+    def collector_is_behind(self, log_path, inode, size):
+        ''' Returns True if the log collector has saved offsets, but has not saved
+            the end of the log at log_path as shipped.
+        '''
+        try:
+            with open(os.path.join(self.directory, self.COLLECTOR_OFFSETS_FILE)) as offsets_file:
+                offsets = json.load(offsets_file)
+        except (OSError, ValueError):
+            # The log collector is not running, or has not yet saved its offsets.
+            return False
+        real_log_path = os.path.realpath(log_path)
+        for path, position in offsets.items():
+            if os.path.realpath(path) == real_log_path:
+                try:
+                    return position['inode'] != inode or position['offset'] < size
+                except (TypeError, KeyError):
+                    return True
+        return True
+
+    def compress_segment(self, file_name):
+        segment_path = os.path.join(self.directory, file_name)
+        log_name = self.SEGMENT_PATTERN.match(file_name).group(1)
+        modified_time = os.path.getmtime(segment_path)
+        # The segment is renamed first, so that a rotation which replaces it
+        # while it is being compressed does not cause the replacement to be removed.
+        compressing_path = segment_path
+        if not segment_path.endswith('.compressing'):
+            compressing_path = segment_path + '.compressing'
+            os.rename(segment_path, compressing_path)
+        compressed_path = self.new_segment_path(log_name, modified_time)
+        with open(compressing_path, 'rb') as segment_file:
+            with gzip.open(compressed_path, 'wb') as compressed_file:
+                shutil.copyfileobj(segment_file, compressed_file, self.COPY_SIZE)
+        # Keeps the segment's age, which decides when it is removed.
+        os.utime(compressed_path, (modified_time, modified_time))
+        os.remove(compressing_path)
+
+    def new_segment_path(self, log_name, segment_time):
+        segment_path = os.path.join(self.directory, '{0}.{1}'.format(
+            log_name, time.strftime(self.TIMESTAMP_FORMAT, time.localtime(segment_time))))
+        suffix = ''
+        count = 0
+        while os.path.exists(segment_path + suffix + '.gz'):
+            count += 1
+            suffix = '-{0}'.format(count)
+        return segment_path + suffix + '.gz'
+
+    def remove_old_segments(self):
+        segments_by_log = {}
+        for file_name in os.listdir(self.directory):
+            match = self.COMPRESSED_SEGMENT_PATTERN.match(file_name)
+            if match:
+                segment_path = os.path.join(self.directory, file_name)
+                segments_by_log.setdefault(match.group(1), []).append(
+                    (os.path.getmtime(segment_path), segment_path))
+        oldest_kept_time = time.time() - self.max_age_seconds
+        for segments in segments_by_log.values():
+            segments.sort(reverse=True)
+            for index, (modified_time, segment_path) in enumerate(segments):
+                if index >= self.backups or modified_time < oldest_kept_time:
+                    os.remove(segment_path)
+
+if __name__ == '__main__':
+    AppLogRotator().boot()
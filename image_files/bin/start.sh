@@ -3,8 +3,13 @@ set -e
 
 trap 'cleanup; exit 143' SIGINT SIGTERM
 
+# /proc/uptime is a monotonic clock, read without starting a process.
+read -r boot_mono _ < /proc/uptime
+
 as_root chown -R "${APP_USER_ID}":"${APP_GROUP_ID}" "$APP_ROOT"
 
+read -r chown_end_mono _ < /proc/uptime
+
 logdir="$APP_ROOT"/store/log
 
 if [ ! -d "$logdir" ]
@@ -22,6 +27,26 @@ then
 fi
 chmod 644 "$STARTLOG"
 
+# The startup timeline is recreated on each container start.
+# Each line is a JSON object recording the start or end of one startup step.
+STARTUP_TIMELINE="$logdir/startup_timeline.jsonl"
+export STARTUP_TIMELINE
+
+echo "{\"mono\": $boot_mono, \"event\": \"start\", \"phase\": \"boot\", \"name\": \"start.sh\"}" > "$STARTUP_TIMELINE"
+echo "{\"mono\": $boot_mono, \"event\": \"start\", \"phase\": \"boot\", \"name\": \"chown\"}" >> "$STARTUP_TIMELINE"
+echo "{\"mono\": $chown_end_mono, \"event\": \"end\", \"phase\": \"boot\", \"name\": \"chown\", \"status\": 0}" >> "$STARTUP_TIMELINE"
+chmod 644 "$STARTUP_TIMELINE"
+
+# Usage: Timeline start|end <phase> <name> [exit status]
+Timeline() {
+  local mono name
+  read -r mono _ < /proc/uptime
+  name=${3//\\/\\\\}
+  name=${name//\"/\\\"}
+  echo "{\"mono\": $mono, \"event\": \"$1\", \"phase\": \"$2\", \"name\": \"$name\"${4:+, \"status\": $4}}" >> "$STARTUP_TIMELINE"
+}
+export -f Timeline
+
 Log() {
   NOW=$(date +"%Y-%m-%d %H:%M:%S")
   echo "$NOW $*" >> "$STARTLOG"
@@ -34,6 +59,28 @@ Run() {
 }
 export -f Run
 
+# Written by A0000_start_container.sh when it starts the log collector.
+LOG_COLLECTOR_PIDFILE=/tmp/log_collector.pid
+export LOG_COLLECTOR_PIDFILE
+
+# The log collector saves how far it has shipped each log when it receives SIGTERM,
+# so it is given a few seconds to do that before the container stops.
+stop_log_collector() {
+  local collector_pid waited=0
+  if ! collector_pid=$(cat "$LOG_COLLECTOR_PIDFILE" 2> /dev/null)
+  then
+    return 0
+  fi
+  kill -TERM "$collector_pid" 2> /dev/null || return 0
+  while kill -0 "$collector_pid" 2> /dev/null && [ $waited -lt 50 ]
+  do
+    sleep 0.1
+    waited=$((waited + 1))
+  done
+  rm -f "$LOG_COLLECTOR_PIDFILE"
+}
+export -f stop_log_collector
+
 cleanup() {
   cleanup_script="$APP_ROOT"/container/clean/cleanup.sh
   if [ -e "${cleanup_script}" ]
@@ -43,6 +90,7 @@ cleanup() {
   else
     Log "No ${cleanup_script} script found, skipping cleanup"
   fi
+  stop_log_collector
   kill -TERM "${CHILD_PID}"
 }
 export -f cleanup
@@ -57,10 +105,13 @@ for script in "$APP_ROOT"/startup.d/A[0-9][0-9[0-9[0-9]*
 do
   scriptfile=$(basename "$script")
   set +e
+  Timeline start startup.d "$scriptfile"
   if script_uses_log "$scriptfile"
   then
     scriptlog="$logdir"/"$scriptfile".log
-    $script > "$scriptlog" 2>&1 &
+    # The log is opened for appending so that log_rotator.py can truncate it.
+    : > "$scriptlog"
+    $script >> "$scriptlog" 2>&1 &
   else
     $script &
   fi
@@ -69,6 +120,7 @@ do
   wait "${CHILD_PID}"
   exit_code=$?
   set -e
+  Timeline end startup.d "$scriptfile" $exit_code
   Log "$scriptfile exited with status $exit_code"
 
   if [ $exit_code -ne 0 ]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+'''QRadar App Startup Probe
+
+Started alongside supervisord. Adds to the startup timeline the time at which
+supervisord first accepts commands, the time at which each Supervisor program
+first reaches RUNNING, and, for a Flask app, the time
+at which the /debug endpoint first returns HTTP 200.
+Exits once everything has been recorded, or after TIMEOUT seconds.
+'''
+
+import json
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+TIMELINE_PATH = os.environ.get('STARTUP_TIMELINE', '/opt/app-root/store/log/startup_timeline.jsonl')
+SUPERVISORD_CONF_PATH = '/etc/supervisord.conf'
+FLASK_PROGRAM = 'startflask'
+DEBUG_URL = 'http://localhost:5000/debug'
+POLL_INTERVAL = 0.2
+TIMEOUT = 300
+# Supervisor states from which a program will not reach RUNNING without intervention.
+FAILED_STATES = ('FATAL', 'EXITED', 'STOPPED')
+
+def monotonic():
+    ''' Same clock as the start.sh Timeline function. '''
+    with open('/proc/uptime') as uptime_file:
+        return float(uptime_file.read().split()[0])
+
+def record(event, phase, name, mono, status=None):
+    line = {'mono': mono, 'event': event, 'phase': phase, 'name': name}
+    if status is not None:
+        line['status'] = status
+    with open(TIMELINE_PATH, 'a') as timeline_file:
+        timeline_file.write(json.dumps(line) + '\n')
+
+def uses_flask():
+    try:
+        with open(SUPERVISORD_CONF_PATH) as conf_file:
+            return '[program:{0}]'.format(FLASK_PROGRAM) in conf_file.read()
+    except OSError:
+        return False
+
+def retrieve_program_states():
+    ''' Returns a dict mapping program name to Supervisor state,
+        empty if supervisord is not yet accepting commands.
+    '''
+    try:
+        output = subprocess.run(['supervisorctl', 'status'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return {}
+    states = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[1].isupper():
+            states[fields[0]] = fields[1]
+    return states
+
+def debug_endpoint_ready():
+    try:
+        with urllib.request.urlopen(DEBUG_URL, timeout=1) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+def main():
+    start_mono = monotonic()
+    record('start', 'supervisor', 'supervisord', start_mono)
+    deadline = time.monotonic() + TIMEOUT
+    pending_programs = None
+    awaiting_debug = uses_flask()
+    if awaiting_debug:
+        record('start', 'http', 'GET /debug', start_mono)
+
+    while time.monotonic() < deadline:
+        states = retrieve_program_states()
+        if states and pending_programs is None:
+            record('end', 'supervisor', 'supervisord', monotonic(), 0)
+            pending_programs = set(states)
+            for program in pending_programs:
+                record('start', 'supervisor', program, start_mono)
+        for program in list(pending_programs or []):
+            if states.get(program) == 'RUNNING':
+                record('end', 'supervisor', program, monotonic(), 0)
+                pending_programs.discard(program)
+            elif states.get(program) in FAILED_STATES:
+                record('end', 'supervisor', program, monotonic(), 1)
+                pending_programs.discard(program)
+        if awaiting_debug and debug_endpoint_ready():
+            record('end', 'http', 'GET /debug', monotonic(), 0)
+            awaiting_debug = False
+        if pending_programs is not None and not pending_programs and not awaiting_debug:
+            return
+        time.sleep(POLL_INTERVAL)
+
+if __name__ == '__main__':
+    main()
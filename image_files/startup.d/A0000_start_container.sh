@@ -39,10 +39,155 @@ updateHostsFileWithFQDN() {
   fi
 }
 
+# Executes the commands listed in an ordering.txt file. Each line is one of:
+#   <command>
+#       Runs once every earlier command has finished,
+#       and every later command waits for it to finish.
+#   @<name>: <command>
+#       Runs in parallel with the other named commands listed since the last unnamed command.
+#   @<name> < <name> <name> ...: <command>
+#       Also waits for the named commands listed after <, which must appear on earlier lines.
+# Blank lines and lines starting with # are ignored.
+# At most RUN_PARALLELISM commands, by default 4, run at once.
+# The output of each command is added to STARTLOG when the command finishes.
+# If a command fails, no more commands are started, and once the running commands
+# have finished this function returns the status of the first failed command.
+runOrderedCommands() {
+  local ordering_file=$1
+  local max_parallel=${RUN_PARALLELISM:-4}
+  local named_pattern='^@([A-Za-z0-9_.-]+)[[:space:]]*(<([^:]*))?:[[:space:]]*(.+)$'
+  local -a commands deps states
+  local -A name_indexes
+  local line name dep_name dep index ready status workdir
+  local count=0 barrier_deps="" named_since_barrier="" running=0 failed_status=0
+
+  if ! [[ "$max_parallel" =~ ^[1-9][0-9]*$ ]]
+  then
+    Log "A0000 Ignoring invalid RUN_PARALLELISM value $max_parallel"
+    max_parallel=4
+  fi
+
+  while read -r line || [[ -n "$line" ]];
+  do
+    if [[ -z "$line" || "$line" == \#* ]]
+    then
+      continue
+    fi
+    index=$count
+    if [[ "$line" =~ $named_pattern ]]
+    then
+      name=${BASH_REMATCH[1]}
+      commands[index]=${BASH_REMATCH[4]}
+      deps[index]=$barrier_deps
+      for dep_name in ${BASH_REMATCH[3]}
+      do
+        if [ -z "${name_indexes[$dep_name]}" ]
+        then
+          Log "A0000 $ordering_file: $name waits for $dep_name, which is not named on an earlier line"
+          return 1
+        fi
+        deps[index]+=" ${name_indexes[$dep_name]}"
+      done
+      if [ -n "${name_indexes[$name]}" ]
+      then
+        Log "A0000 $ordering_file: $name is named on more than one line"
+        return 1
+      fi
+      name_indexes[$name]=$index
+      named_since_barrier+=" $index"
+    else
+      commands[index]=$line
+      deps[index]="$barrier_deps $named_since_barrier"
+      barrier_deps=$index
+      named_since_barrier=""
+    fi
+    states[index]=pending
+    count=$((count + 1))
+  done < "$ordering_file"
+
+  workdir=$(mktemp -d)
+  while true
+  do
+    if [ $failed_status -eq 0 ]
+    then
+      for ((index = 0; index < count && running < max_parallel; index++))
+      do
+        if [ "${states[index]}" != pending ]
+        then
+          continue
+        fi
+        ready=true
+        for dep in ${deps[index]}
+        do
+          if [ "${states[dep]}" != succeeded ]
+          then
+            ready=false
+          fi
+        done
+        if $ready
+        then
+          Log "A0000 Starting ${commands[index]}"
+          Timeline start run "${commands[index]}"
+          (
+            set +e
+            # shellcheck disable=SC2086
+            # Don't quote the command. If it contains space-separated words,
+            # it won't be possible to execute it.
+            ${commands[index]} > "$workdir/$index.log" 2>&1
+            echo $? > "$workdir/$index.tmp"
+            mv "$workdir/$index.tmp" "$workdir/$index.status"
+          ) &
+          states[index]=running
+          running=$((running + 1))
+        fi
+      done
+    fi
+
+    if [ $running -eq 0 ]
+    then
+      break
+    fi
+    wait -n || true
+
+    for ((index = 0; index < count; index++))
+    do
+      if [ "${states[index]}" = running ] && [ -f "$workdir/$index.status" ]
+      then
+        status=$(< "$workdir/$index.status")
+        cat "$workdir/$index.log" >> "$STARTLOG"
+        Timeline end run "${commands[index]}" "$status"
+        Log "A0000 ${commands[index]} exited with status $status"
+        running=$((running - 1))
+        if [ "$status" -eq 0 ]
+        then
+          states[index]=succeeded
+        else
+          states[index]=failed
+          if [ $failed_status -eq 0 ]
+          then
+            failed_status=$status
+          fi
+        fi
+      fi
+    done
+  done
+  rm -rf "$workdir"
+
+  if [ $failed_status -ne 0 ]
+  then
+    Log "A0000 Not starting the remaining commands in $ordering_file because a command failed"
+  fi
+  return $failed_status
+}
+
+# Rotate and compress logs in store/log in the background
+"$APP_ROOT"/bin/log_rotator.py >> "$STARTLOG" 2>&1 &
+
 if [ "${LOG_STRATEGY}" = "stdout" ]
 then
-    # Dispatch logs to STDOUT in the background
-    "$APP_ROOT"/bin/log_collector.py &
+    # Dispatch logs to the container's STDOUT in the background
+    "$APP_ROOT"/bin/log_collector.py --log-strategy stdout > /proc/1/fd/1 &
+    echo $! > "$LOG_COLLECTOR_PIDFILE"
 fi
 
 if [ "${HOST_STRATEGY}" != "kubernetes" ]
@@ -65,11 +210,5 @@ fi
 if [ -f "$APP_ROOT"/container/run/ordering.txt ]
 then
   Log "A0000 Executing commands from $APP_ROOT/container/run/ordering.txt"
-  while read -r line || [[ -n "$line" ]];
-  do
-    # shellcheck disable=SC2086
-    # Don't quote $line. If it contains space-separated words,
-    # Run won't be able to execute the command.
-    Run $line;
-  done < "$APP_ROOT"/container/run/ordering.txt
+  runOrderedCommands "$APP_ROOT"/container/run/ordering.txt
 fi
@@ -3,5 +3,7 @@
 trap 'cleanup; exit 143' SIGINT SIGTERM
 
 Log "A9900 Starting supervisord"
+# Records in the startup timeline when each program is running and when Flask is serving.
+"$APP_ROOT"/bin/startup_probe.py &
 supervisord -c /etc/supervisord.conf &
 wait $!
@@ -4,20 +4,27 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
+import collections
 import os
 import sys
 import sdk_certificates
+from sdk_compression import SdkCompressionPolicy
 from sdk_container import SdkContainer
 from sdk_developerapp import SdkDeveloperApp
+from sdk_devloop import SdkDevLoop
 from sdk_docker import SdkDockerClient
 from sdk_image import SdkImage
+from sdk_imagebatch import SdkImageBatch, BUILD_STATUS_FAILED
 from sdk_manifest import SdkManifest
 import sdk_package
-from sdk_rest import SdkRestClient
+from sdk_httpclient import SdkHttpClient
+from sdk_rest import SdkRestClient, STATUS_ERROR
 from sdk_server import SdkServer
+from sdk_timeline import SdkStartupTimeline
 import sdk_util
+from sdk_warmpool import SdkWarmPool
 from sdk_workspace import SdkWorkspace
-from sdk_exceptions import (SdkContainerError, SdkFatalError,
+from sdk_exceptions import (SdkContainerError, SdkFatalError, SdkManifestException,
                             SdkServerSslError, SdkWorkspaceError)
 
 # SDK action entry points
@@ -32,42 +39,93 @@ def create_workspace(qapp_args):
 def package(qapp_args):
     try:
         workspace = SdkWorkspace(qapp_args.workspace, check_dir_name=False)
-        sdk_package.create_zip(workspace, qapp_args.package)
+        compression_policy = SdkCompressionPolicy(qapp_args.compression, qapp_args.compression_level)
+        sdk_package.create_zip(workspace, qapp_args.package, qapp_args.incremental, qapp_args.jobs,
+                               compression_policy, qapp_args.verbose)
     except (ValueError, OSError, SdkFatalError) as err:
         _handle_fatal_error(err)
 
 def build_image(qapp_args):
+    if len(qapp_args.workspaces) > 1:
+        _build_image_batch(qapp_args)
+        return
     try:
-        workspace = SdkWorkspace(qapp_args.workspace)
+        workspace = SdkWorkspace(qapp_args.workspaces[0])
         docker = SdkDockerClient()
         image = SdkImage(docker, workspace)
-        image.build()
+        image.build(qapp_args.force)
+    except (ValueError, OSError, SdkFatalError) as err:
+        _handle_fatal_error(err)
+
+def _build_image_batch(qapp_args):
+    try:
+        docker = SdkDockerClient(max_pool_size=qapp_args.jobs)
+        print('Building {0} images using {1} workers'.format(len(qapp_args.workspaces), qapp_args.jobs))
+        results = SdkImageBatch(docker, qapp_args.jobs).build(qapp_args.workspaces, qapp_args.force)
     except (ValueError, OSError, SdkFatalError) as err:
         _handle_fatal_error(err)
+    _print_build_summary(results)
+    if [result for result in results if result.status == BUILD_STATUS_FAILED]:
+        sys.exit(1)
 
 def run_app(qapp_args):
     try:
         workspace = SdkWorkspace(qapp_args.workspace, check_secret_uuid=True)
         docker = SdkDockerClient()
-
-        dev_app_instance_id = None
-        qconsole = None
-        if qapp_args.qradar_console:
-            qconsole = qapp_args.qradar_console
-            sdk_certificates.check_host_bundle_status(qconsole)
-            dev_app_instance_id = workspace.retrieve_dev_app_instance_id(qconsole)
+        qconsole, dev_app_instance_id = _retrieve_dev_app_details(qapp_args, workspace)
 
         image = SdkImage(docker, workspace)
         if not image.is_in_registry():
             image.build()
 
         container = SdkContainer(docker, workspace, running=False)
+        warm_pool = SdkWarmPool(docker, workspace, container.name)
+        if not qapp_args.use_warm_pool:
+            # A warm container would share the store with the new container.
+            warm_pool.empty()
+            warm_pool = None
         container.run(qapp_args.host_port, qapp_args.show_logs,
-                      qapp_args.use_dev_env, qconsole, dev_app_instance_id)
+                      qapp_args.use_dev_env, qconsole, dev_app_instance_id, warm_pool)
+        if warm_pool:
+            print('Use qapp warm to start a replacement warm container')
+
+        if qapp_args.watch:
+            SdkDevLoop(docker, workspace, container, qapp_args.use_dev_env,
+                       qconsole, dev_app_instance_id).watch()
+
+    except (ValueError, OSError, SdkFatalError) as err:
+        _handle_fatal_error(err)
+
+def warm(qapp_args):
+    try:
+        workspace = SdkWorkspace(qapp_args.workspace, check_secret_uuid=True)
+        docker = SdkDockerClient()
+        qconsole, dev_app_instance_id = _retrieve_dev_app_details(qapp_args, workspace)
 
+        image = SdkImage(docker, workspace)
+        if not image.is_in_registry():
+            image.build()
+
+        container = SdkContainer(docker, workspace, retrieve=False)
+        warm_pool = SdkWarmPool(docker, workspace, container.name)
+        if qapp_args.pool_size == 0:
+            warm_pool.empty()
+        else:
+            run_settings = container.build_run_settings(None, qapp_args.use_dev_env, qconsole, dev_app_instance_id)
+            warm_pool.fill(run_settings, qapp_args.pool_size)
     except (ValueError, OSError, SdkFatalError) as err:
         _handle_fatal_error(err)
 
+def _retrieve_dev_app_details(qapp_args, workspace):
+    ''' Returns a (QRadar console, development app instance ID) tuple,
+        both None if no console was supplied.
+    '''
+    if not qapp_args.qradar_console:
+        return None, None
+    qconsole = qapp_args.qradar_console
+    sdk_certificates.check_host_bundle_status(qconsole)
+    return qconsole, workspace.retrieve_dev_app_instance_id(qconsole)
+
 def clean(qapp_args):
     try:
         workspace = SdkWorkspace(qapp_args.workspace, check_content=False)
@@ -81,6 +139,8 @@ def clean(qapp_args):
         else:
             container.remove()
 
+        SdkWarmPool(docker, workspace, SdkContainer(docker, workspace, retrieve=False).name).empty()
+
         if qapp_args.image_remove:
             image = SdkImage(docker, workspace)
             if image.is_in_registry():
@@ -94,6 +154,13 @@ def clean(qapp_args):
     if lookup_error:
         sys.exit(1)
 
+def show_startup_timeline(qapp_args):
+    try:
+        workspace = SdkWorkspace(qapp_args.workspace, check_content=False)
+        SdkStartupTimeline(workspace.path).print_waterfall()
+    except (ValueError, OSError, SdkFatalError) as err:
+        _handle_fatal_error(err)
+
 def server_details(qapp_args):
     try:
         server = SdkServer.resolve(qapp_args, print_details=True)
@@ -206,25 +273,57 @@ def check_app_status(qapp_args):
         _handle_fatal_error(sfe)
 
 def deploy(qapp_args):
+    if len(qapp_args.packages) > 1:
+        _deploy_batch(qapp_args)
+        return
+    package_path = qapp_args.packages[0]
+    rest_client = None
     try:
-        SdkManifest.validate_zip_manifest(qapp_args.package)
+        SdkManifest.validate_zip_manifest(package_path)
         server = SdkServer.resolve(qapp_args)
         rest_client = _create_rest_client(server)
-        rest_client.deploy_app(qapp_args.package, qapp_args.auth_user, qapp_args.upload_timeout)
+        result = rest_client.deploy_app(package_path, qapp_args.auth_user, qapp_args.upload_timeout)
     except SdkServerSslError as sse:
         _handle_ssl_error(sse, server)
     except (KeyError, ValueError, SdkFatalError, OSError) as err:
         _handle_fatal_error(err)
+    finally:
+        if rest_client:
+            rest_client.close()
+    if result.status == STATUS_ERROR:
+        sys.exit(1)
+
+def _deploy_batch(qapp_args):
+    rest_client = None
+    try:
+        _validate_package_manifests(qapp_args.packages)
+        server = SdkServer.resolve(qapp_args)
+        rest_client = _create_rest_client(server, pool_size=qapp_args.jobs)
+        print('Deploying {0} packages using {1} workers'.format(len(qapp_args.packages), qapp_args.jobs))
+        results = rest_client.deploy_apps(qapp_args.packages, qapp_args.auth_user,
+                                          qapp_args.upload_timeout, qapp_args.jobs)
+    except SdkServerSslError as sse:
+        _handle_ssl_error(sse, server)
+    except (KeyError, ValueError, SdkFatalError, OSError) as err:
+        _handle_fatal_error(err)
+    finally:
+        if rest_client:
+            rest_client.close()
+    _print_deploy_summary(results)
+    if [result for result in results if result.status == STATUS_ERROR]:
+        sys.exit(1)
 
 def authorize(qapp_args):
     try:
         server = SdkServer.resolve(qapp_args)
         rest_client = _create_rest_client(server)
-        rest_client.authorize_app(qapp_args.application_id, qapp_args.auth_user)
+        app_status = rest_client.authorize_app(qapp_args.application_id, qapp_args.auth_user)
     except SdkServerSslError as sse:
         _handle_ssl_error(sse, server)
     except SdkFatalError as sfe:
         _handle_fatal_error(sfe)
+    if app_status == STATUS_ERROR:
+        sys.exit(1)
 
 def cancel_app_install(qapp_args):
     try:
@@ -248,8 +347,43 @@ def delete_app(qapp_args):
 
 # Utility functions
 
-def _create_rest_client(server):
-    return SdkRestClient(server.qserver_ip, server.quser_id)
+def _create_rest_client(server, pool_size=SdkHttpClient.POOL_SIZE):
+    return SdkRestClient(server.qserver_ip, server.quser_id, pool_size)
+
+def _validate_package_manifests(package_paths):
+    ''' Validates every package manifest before any package is uploaded.
+        Raises SdkManifestException listing all invalid packages.
+    '''
+    errors = []
+    for package_path in package_paths:
+        try:
+            SdkManifest.validate_zip_manifest(package_path)
+        except SdkFatalError as sfe:
+            errors.append('{0}: {1}'.format(package_path, sfe))
+    if errors:
+        raise SdkManifestException('\n'.join(errors))
+
+def _print_deploy_summary(results):
+    package_width = max([len('Package')] + [len(result.package) for result in results])
+    row_format = '{0:<' + str(package_width) + '}  {1:<8}  {2:<14}  {3:>8}'
+    print('')
+    print(row_format.format('Package', 'App ID', 'Status', 'Time (s)'))
+    for result in results:
+        print(row_format.format(result.package, str(result.app_id or '-'),
+                                result.status, '{0:.1f}'.format(result.seconds)))
+    status_counts = collections.Counter(result.status for result in results)
+    print(', '.join('{0}: {1}'.format(status, count) for status, count in sorted(status_counts.items())))
+
+def _print_build_summary(results):
+    workspace_width = max([len('Workspace')] + [len(result.workspace) for result in results])
+    row_format = '{0:<' + str(workspace_width) + '}  {1:<10}  {2:>8}  {3}'
+    print('')
+    print(row_format.format('Workspace', 'Status', 'Time (s)', 'Log'))
+    for result in results:
+        print(row_format.format(result.workspace, result.status,
+                                '{0:.1f}'.format(result.seconds), result.log_path or result.error))
+    status_counts = collections.Counter(result.status for result in results)
+    print(', '.join('{0}: {1}'.format(status, count) for status, count in sorted(status_counts.items())))
 
 def _handle_ssl_error(ssl_error, server):
     print(ssl_error)
@@ -83,3 +83,10 @@ class TimeoutAction(argparse.Action):
         if values <= 0:
             raise argparse.ArgumentError(self, 'invalid timeout value {0}'.format(values))
         setattr(namespace, self.dest, values)
+
+class WorkerCountAction(argparse.Action):
+    ''' Validates a worker count, raising ArgumentError if invalid. '''
+    def __call__(self, parser, namespace, values, option_string=None):
+        if values < 1:
+            raise argparse.ArgumentError(self, 'invalid worker count {0}'.format(values))
+        setattr(namespace, self.dest, values)
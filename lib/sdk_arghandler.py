@@ -5,12 +5,14 @@
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
 import argparse
+import os
 import uuid
-from sdk_actions import (create_workspace, build_image, run_app, clean, server_details,
-                         preregister, register, deregister, package, deploy,
+from sdk_actions import (create_workspace, build_image, run_app, warm, clean, show_startup_timeline,
+                         server_details, preregister, register, deregister, package, deploy,
                          authorize, check_app_status, cancel_app_install, delete_app)
 from sdk_argactions import (VersionAction, ReadmeAction, PortAction, UuidAction,
-                            IPAction, AppIdAction, TimeoutAction)
+                            IPAction, AppIdAction, TimeoutAction, WorkerCountAction)
+import sdk_compression
 from sdk_httpclient import SdkHttpClient
 
 
@@ -46,7 +48,9 @@ class SdkArgHandler():
         self._add_subparser_create()
         self._add_subparser_build()
         self._add_subparser_run()
+        self._add_subparser_warm()
         self._add_subparser_clean()
+        self._add_subparser_timeline()
         self._add_subparser_server()
         self._add_subparser_preregister()
         self._add_subparser_register()
@@ -68,7 +72,17 @@ class SdkArgHandler():
 
     def _add_subparser_build(self):
         parser = self._add_subparser('build', 'Build a Docker image for an app')
-        self._add_argument_workspace(parser)
+        parser.add_argument('-w', '--workspace', action='store', dest='workspaces', nargs='+', default=['.'],
+                            help=('Path to app workspace folder.\nDefaults to the current directory.\n'
+                                  'Supply several paths to build multiple images concurrently.\n'
+                                  'The build output for each workspace is then written to\n'
+                                  '.cache/qapp_build.log in that workspace.'))
+        parser.add_argument('-f', '--force', action='store_true', dest='force',
+                            help=('Build the image even if the workspace has not changed\n'
+                                  'since the image was last built.'))
+        parser.add_argument('-j', '--jobs', action=WorkerCountAction, dest='jobs', type=int, default=4,
+                            help=('Maximum number of images to build at the same time\n'
+                                  'when multiple workspaces are supplied. Defaults to 4.'))
         parser.set_defaults(function=build_image)
 
     def _add_subparser_run(self):
@@ -84,11 +98,41 @@ class SdkArgHandler():
         parser.add_argument('-d', '--development', action='store_true', dest='use_dev_env',
                             help=('Run Flask app in development mode.\n'
                                   'This is useful when developing a Flask-based app.'))
-        parser.add_argument('-l', '--log', action='store_true', dest='show_logs',
-                            help=('Show container logs.\n'
-                                  'This is useful for debugging container startup.'))
+        run_output = parser.add_mutually_exclusive_group()
+        run_output.add_argument('-l', '--log', action='store_true', dest='show_logs',
+                                help=('Show container logs.\n'
+                                      'This is useful for debugging container startup.'))
+        parser.add_argument('--warm', action='store_true', dest='use_warm_pool',
+                            help=('Use a paused container started earlier by qapp warm, if one was\n'
+                                  'started with the same settings, instead of starting a new container.'))
+        run_output.add_argument('--watch', action='store_true', dest='watch',
+                                help=('After starting the container, watch the workspace and apply changes:\n'
+                                      'app code is reloaded by Flask, or Flask is restarted if not in development mode,\n'
+                                      'service changes are copied in and applied with supervisorctl,\n'
+                                      'qenv.ini changes recreate the container, and dependency or\n'
+                                      'other container changes rebuild the image and recreate the container.'))
         parser.set_defaults(function=run_app)
 
+    def _add_subparser_warm(self):
+        parser = self._add_subparser('warm', 'Start paused app containers for qapp run --warm to use')
+        self._add_argument_workspace(parser)
+        self._add_argument_console(
+            parser, help_text=('Supply this option to identify a development app\'s QRadar server,\n'
+                               'and/or to mount the certificate bundle from that server into the container.\n'
+                               'Must match the value later supplied to qapp run.'))
+        parser.add_argument('-d', '--development', action='store_true', dest='use_dev_env',
+                            help=('Run Flask app in development mode.\n'
+                                  'Must match the value later supplied to qapp run.'))
+        parser.add_argument('-n', '--size', action='store', dest='pool_size', type=int, default=1,
+                            choices=range(0, 2), metavar='{0,1}',
+                            help=('Number of warm containers to keep. Defaults to 1.\n'
+                                  'Use 0 to remove the warm container.\n'
+                                  'A warm container uses the workspace store, so it cannot be\n'
+                                  'started while the app container exists.\n'
+                                  'Warm containers are assigned random host ports,\n'
+                                  'so they cannot be used by qapp run -p.'))
+        parser.set_defaults(function=warm)
+
     def _add_subparser_clean(self):
         parser = self._add_subparser('clean',
                                      'Remove the app Docker container and, optionally, the app image')
@@ -97,6 +141,12 @@ class SdkArgHandler():
                             help='Remove app image')
         parser.set_defaults(function=clean)
 
+    def _add_subparser_timeline(self):
+        parser = self._add_subparser('timeline',
+                                     'Show where the time went during the last app container startup')
+        self._add_argument_workspace(parser)
+        parser.set_defaults(function=show_startup_timeline)
+
     def _add_subparser_server(self):
         parser = self._add_subparser('server', 'Identify default QRadar server and user values for app development')
         self._add_argument_console(parser)
@@ -132,11 +182,34 @@ class SdkArgHandler():
         parser = self._add_subparser('package', 'Package app files into a zip archive')
         self._add_argument_workspace(parser)
         self._add_argument_package(parser)
+        parser.add_argument('-i', '--incremental', action='store_true', dest='incremental',
+                            help=('Reuse compressed files from the previous incremental package\n'
+                                  'of this workspace when they have not changed.\n'
+                                  'The cache is kept in the workspace .cache directory.'))
+        parser.add_argument('-j', '--jobs', action=WorkerCountAction, dest='jobs', type=int,
+                            default=os.cpu_count() or 1,
+                            help=('Number of threads used to compress files.\n'
+                                  'Defaults to the number of CPUs.'))
+        parser.add_argument('-c', '--compression', action='store', dest='compression',
+                            choices=sdk_compression.MODES, default=sdk_compression.MODE_AUTO,
+                            help=('auto: store already-compressed files, detected by extension\n'
+                                  '      or by a trial compression, and deflate the rest.\n'
+                                  'extension: store files by extension only.\n'
+                                  'deflate: deflate every file.\n'
+                                  'Defaults to auto.'))
+        parser.add_argument('-l', '--level', action='store', dest='compression_level', type=int,
+                            choices=range(1, 10), default=sdk_compression.DEFAULT_LEVEL, metavar='{1-9}',
+                            help=('DEFLATE compression level.\nDefaults to {0}.'
+                                  .format(sdk_compression.DEFAULT_LEVEL)))
+        parser.add_argument('--verbose', action='store_true', dest='verbose',
+                            help='Print each file and directory as it is added to the package.')
         parser.set_defaults(function=package)
 
     def _add_subparser_deploy(self):
         parser = self._add_subparser('deploy', 'Deploy app zip file to QRadar server')
-        self._add_argument_package(parser)
+        parser.add_argument('-p', '--package', action='store', dest='packages', nargs='+', required=True,
+                            help=('Path to app zip file\n'
+                                  'Supply several paths to deploy multiple apps concurrently.'))
         self._add_argument_console(parser)
         self._add_argument_user(parser)
         self._add_argument_auth_user(parser)
@@ -146,6 +219,9 @@ class SdkArgHandler():
                                   'Defaults to {0}.\n'
                                   'Use this when uploading a large zip archive.'
                                   .format(SdkHttpClient.UPLOAD_TIMEOUT)))
+        parser.add_argument('-j', '--jobs', action=WorkerCountAction, dest='jobs', type=int, default=4,
+                            help=('Maximum number of apps to deploy at the same time\n'
+                                  'when multiple packages are supplied. Defaults to 4.'))
         parser.set_defaults(function=deploy)
 
     def _add_subparser_authorize(self):
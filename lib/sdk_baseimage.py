@@ -4,10 +4,31 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
+import fcntl
+import json
+import lzma
+import os
+import shutil
+import subprocess
+import tempfile
+from sdk_exceptions import SdkDockerError
+from sdk_progressbar import ProgressBar
 import sdk_util
 
 BASE_IMAGE_NAME = 'qradar-app-base:{0}'
 BASE_IMAGE_ARCHIVE_FORMAT = 'qradar-app-base-{0}.xz'
+BASE_IMAGE_VERSIONS_FILE = 'versions.json'
+# Decompressed archives are kept under the SDK config directory, so that an image
+# removed from the registry can be reloaded without decompressing it again.
+BASE_IMAGE_CACHE_DIR = 'base_image'
+BASE_IMAGE_TAR_FORMAT = 'qradar-app-base-{0}.tar'
+# Held while the cache directory is updated, so that concurrent SDK commands
+# neither decompress into the same file nor remove each other's files.
+BASE_IMAGE_CACHE_LOCK_FILE = '.lock'
+PARTIAL_TAR_SUFFIX = '.partial'
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+# --threads=0 uses one thread per core where xz supports multi-threaded decompression.
+XZ_DECOMPRESS_COMMAND = ['xz', '--decompress', '--stdout', '--threads=0']
 
 class SdkBaseImage():
     def __init__(self):
@@ -15,17 +36,139 @@ class SdkBaseImage():
         self.manifest_image_name = BASE_IMAGE_NAME.format(self.image_tag)
 
     def load_if_missing(self, docker):
-        if docker.registry_contains_image(self.image_repo, self.image_tag):
-            print('Found base image {0}:{1}'.format(self.image_repo, self.image_tag))
+        ''' Loads the base image from its archive unless the registry already holds it.
+            If versions.json supplies the image ID for this base image, the registry
+            image must have that ID, and so must the image once it has been loaded.
+        '''
+        image_name = '{0}:{1}'.format(self.image_repo, self.image_tag)
+        expected_image_id = self.read_expected_image_id(self.image_tag)
+        image = docker.retrieve_image(image_name)
+        if image is None:
+            print('Base image {0} is not in your Docker registry'.format(image_name))
+        elif expected_image_id and image.id != expected_image_id:
+            print('Base image {0} has ID {1} but {2} was expected, reloading'
+                  .format(image_name, image.id, expected_image_id))
+        else:
+            print('Found base image {0}'.format(image_name))
             return
 
-        print('Base image {0}:{1} is not in your Docker registry'.format(self.image_repo, self.image_tag))
-        base_image_archive_path = sdk_util.build_sdk_path(
-            'base_image', BASE_IMAGE_ARCHIVE_FORMAT.format(self.image_tag))
-        print('Loading base image from {0}...'.format(base_image_archive_path))
-        docker.load_image_from_archive(base_image_archive_path)
+        tar_path = self.decompress_archive()
+        print('Loading base image from {0}...'.format(tar_path))
+        docker.load_image_from_archive(tar_path)
+        image = docker.retrieve_image(image_name)
+        if image is None:
+            raise SdkDockerError('Base image {0} was not found after loading {1}'.format(image_name, tar_path))
+        if expected_image_id and image.id != expected_image_id:
+            os.remove(tar_path)
+            raise SdkDockerError('Loaded base image {0} has ID {1} but {2} was expected'
+                                 .format(image_name, image.id, expected_image_id))
         print('Base image loaded successfully')
 
+    def decompress_archive(self):
+        ''' Returns the path of a decompressed copy of the base image archive.
+            The copy is reused while its mtime matches the archive's mtime.
+            The xz command is used if it is installed, because newer versions
+            decompress using several threads. Otherwise the lzma module is used.
+        '''
+        archive_path = sdk_util.build_sdk_path('base_image', BASE_IMAGE_ARCHIVE_FORMAT.format(self.image_tag))
+        cache_dir = sdk_util.build_config_path(BASE_IMAGE_CACHE_DIR)
+        tar_path = os.path.join(cache_dir, BASE_IMAGE_TAR_FORMAT.format(self.image_tag))
+        archive_stat = os.stat(archive_path)
+        if self._is_decompressed(tar_path, archive_stat):
+            return tar_path
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, BASE_IMAGE_CACHE_LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print('Waiting for another command to finish decompressing the base image archive')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self._is_decompressed(tar_path, archive_stat):
+                return tar_path
+            self._remove_cached_files(cache_dir)
+            tar_fd, partial_tar_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(tar_path) + '.',
+                                                        suffix=PARTIAL_TAR_SUFFIX)
+            try:
+                print('Decompressing base image archive {0}'.format(archive_path))
+                with open(archive_path, 'rb') as archive_file, os.fdopen(tar_fd, 'wb') as tar_file, \
+                        ProgressBar(ascii=True, unit='b', unit_scale=True, total=archive_stat.st_size) as progress_bar:
+                    if shutil.which(XZ_DECOMPRESS_COMMAND[0]):
+                        self._decompress_with_xz(archive_file, tar_file, progress_bar)
+                    else:
+                        self._decompress_with_lzma(archive_file, tar_file, progress_bar)
+                os.utime(partial_tar_path, ns=(archive_stat.st_atime_ns, archive_stat.st_mtime_ns))
+                os.replace(partial_tar_path, tar_path)
+            except BaseException:
+                if os.path.exists(partial_tar_path):
+                    os.remove(partial_tar_path)
+                raise
+        return tar_path
+
+    @staticmethod
+    def _is_decompressed(tar_path, archive_stat):
+        try:
+            return os.stat(tar_path).st_mtime_ns == archive_stat.st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _remove_cached_files(cache_dir):
+        ''' Only the current base image is kept, as each decompressed archive is large.
+            Also removes partial files left by interrupted commands.
+            The caller must hold the cache directory lock.
+        '''
+        for file_name in os.listdir(cache_dir):
+            file_path = os.path.join(cache_dir, file_name)
+            if file_name != BASE_IMAGE_CACHE_LOCK_FILE and os.path.isfile(file_path):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _decompress_with_xz(archive_file, tar_file, progress_bar):
+        # xz writes straight to tar_file, so only its input passes through this process.
+        xz_process = subprocess.Popen(XZ_DECOMPRESS_COMMAND, stdin=subprocess.PIPE, stdout=tar_file)
+        try:
+            for block in iter(lambda: archive_file.read(DECOMPRESS_CHUNK_SIZE), b''):
+                xz_process.stdin.write(block)
+                progress_bar.update(len(block))
+            xz_process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if xz_process.wait() != 0:
+            raise SdkDockerError('Failed to decompress base image archive {0}'.format(archive_file.name))
+
+    @staticmethod
+    def _decompress_with_lzma(archive_file, tar_file, progress_bar):
+        decompressor = lzma.LZMADecompressor()
+        try:
+            for block in iter(lambda: archive_file.read(DECOMPRESS_CHUNK_SIZE), b''):
+                tar_file.write(decompressor.decompress(block))
+                progress_bar.update(len(block))
+        except lzma.LZMAError as error:
+            raise SdkDockerError('Failed to decompress base image archive {0}: {1}'
+                                 .format(archive_file.name, error))
+
+    @staticmethod
+    def read_expected_image_id(image_tag):
+        ''' base_image/versions.json may map a base image tag to the ID of the image
+            in its archive, e.g. {"2.1.6": {"image_id": "sha256:..."}}.
+            Returns None if it does not supply an ID for image_tag.
+        '''
+        try:
+            with open(sdk_util.build_sdk_path('base_image', BASE_IMAGE_VERSIONS_FILE)) as versions_file:
+                versions = json.load(versions_file)
+        except (OSError, ValueError):
+            return None
+        version = versions.get(image_tag) if isinstance(versions, dict) else None
+        if isinstance(version, dict):
+            version = version.get('image_id')
+        if isinstance(version, str) and version.startswith('sha256:'):
+            return version
+        return None
+
     @staticmethod
     def read_name_components():
         ''' Image name format is repo:tag.
@@ -0,0 +1,131 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import hashlib
+import os
+import shutil
+from sdk_scanner import SdkWorkspaceScanner
+
+class SdkBuildContext():
+    ''' Describes the content of a Docker build directory, then brings an existing
+        directory into line with it by copying only what has changed.
+        Copied files keep their source mtime, so an unchanged source file is
+        recognised by size and mtime without being read. Generated files are
+        rewritten only if their content differs. Anything else found in the
+        build directory is removed.
+    '''
+    def __init__(self, build_root_path):
+        self.build_root_path = build_root_path
+        # Relative path -> ('copy', source path, mode) or ('content', bytes, mode) or ('dir',).
+        self.entries = {}
+
+    def add_directory(self, relative_path):
+        self.entries[relative_path] = ('dir',)
+
+    def add_file(self, source_path, relative_path, mode=None):
+        self.entries[relative_path] = ('copy', source_path, mode)
+
+    def add_tree(self, source_dir, relative_dir, mode=None):
+        ''' Adds every file and directory beneath source_dir, placed under relative_dir. '''
+        if relative_dir:
+            self.add_directory(relative_dir)
+        for entry in SdkWorkspaceScanner(source_dir, workspace_rules=False).scan():
+            relative_path = os.path.join(relative_dir, entry.path)
+            if entry.is_dir:
+                self.add_directory(relative_path)
+            else:
+                self.add_file(os.path.join(source_dir, entry.path), relative_path, mode)
+
+    def add_content(self, relative_path, content, mode=None):
+        self.entries[relative_path] = ('content', content.encode(), mode)
+
+    def digest(self, *extra_values):
+        ''' Returns a SHA-256 hex digest identifying the context content,
+            together with any extra values that affect the image build.
+        '''
+        sha256 = hashlib.sha256()
+        for value in extra_values:
+            sha256.update('{0}\0'.format(value).encode())
+        for relative_path in sorted(self.entries):
+            entry = self.entries[relative_path]
+            sha256.update('{0}\0{1}\0'.format(relative_path, entry[0]).encode())
+            if entry[0] == 'copy':
+                source_stat = os.stat(entry[1])
+                sha256.update('{0}\0{1}\0{2}\0'.format(source_stat.st_size, source_stat.st_mtime_ns,
+                                                       entry[2]).encode())
+            elif entry[0] == 'content':
+                sha256.update(entry[1])
+                sha256.update('\0{0}\0'.format(entry[2]).encode())
+        return sha256.hexdigest()
+
+    def sync(self):
+        ''' Returns the number of files and directories created, updated or removed. '''
+        os.makedirs(self.build_root_path, exist_ok=True)
+        changes = self._remove_stale_entries()
+        for relative_path in sorted(self.entries):
+            entry = self.entries[relative_path]
+            target_path = os.path.join(self.build_root_path, relative_path)
+            if entry[0] == 'dir':
+                if not os.path.isdir(target_path):
+                    os.makedirs(target_path)
+                    changes += 1
+            elif entry[0] == 'copy':
+                changes += self._sync_copied_file(entry[1], target_path, entry[2])
+            else:
+                changes += self._sync_content_file(entry[1], target_path, entry[2])
+        return changes
+
+    def _remove_stale_entries(self):
+        removed = 0
+        # Scan fully before removing anything, so the scanner never reads a removed directory.
+        existing_entries = list(SdkWorkspaceScanner(self.build_root_path, workspace_rules=False).scan())
+        for existing in existing_entries:
+            expected = self.entries.get(existing.path)
+            target_path = os.path.join(self.build_root_path, existing.path)
+            if expected and (expected[0] == 'dir') == existing.is_dir:
+                continue
+            if not os.path.lexists(target_path):
+                # Already removed along with a stale parent directory.
+                continue
+            if existing.is_dir and not os.path.islink(target_path):
+                shutil.rmtree(target_path)
+            else:
+                os.remove(target_path)
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _sync_copied_file(source_path, target_path, mode):
+        source_stat = os.stat(source_path)
+        try:
+            target_stat = os.stat(target_path)
+            if (target_stat.st_size == source_stat.st_size and
+                    target_stat.st_mtime_ns == source_stat.st_mtime_ns and
+                    (mode is None or target_stat.st_mode & 0o7777 == mode)):
+                return 0
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copy2(source_path, target_path)
+        if mode is not None:
+            os.chmod(target_path, mode)
+        return 1
+
+    @staticmethod
+    def _sync_content_file(content, target_path, mode):
+        try:
+            with open(target_path, 'rb') as target_file:
+                if target_file.read() == content:
+                    if mode is None or os.stat(target_path).st_mode & 0o7777 == mode:
+                        return 0
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with open(target_path, 'wb') as target_file:
+            target_file.write(content)
+        if mode is not None:
+            os.chmod(target_path, mode)
+        return 1
@@ -0,0 +1,76 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import fcntl
+import os
+import shutil
+import sdk_util
+
+# SDK_BUILD_DIR overrides the directory holding the per-image build directories.
+# SDK_BUILD_TMPFS=true places them on TMPFS_PATH instead, so build contexts are held in memory.
+BUILD_DIR_ENV_VAR = 'SDK_BUILD_DIR'
+BUILD_TMPFS_ENV_VAR = 'SDK_BUILD_TMPFS'
+TMPFS_PATH = '/dev/shm'
+TMPFS_BUILD_DIR = 'qradar_app_sdk_build'
+LOCK_FILE_SUFFIX = '.lock'
+
+class SdkBuildDirectory():
+    ''' The Docker build context directory for one app image.
+        Each image has its own directory, so builds for different workspaces
+        can run at the same time. While the directory is in use it is locked,
+        and a second build of the same image waits for the first to finish.
+        A persistent directory is kept between builds so that its content can be
+        synced incrementally. A tmpfs-backed directory is removed after use.
+    '''
+    def __init__(self, image_name):
+        self.root_path, self.is_tmpfs = self.build_root_path()
+        self.path = os.path.join(self.root_path, image_name)
+        self.lock_path = self.path + LOCK_FILE_SUFFIX
+        self.lock_file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @staticmethod
+    def build_root_path():
+        ''' Returns a (path, is_tmpfs) tuple for the directory holding the build directories. '''
+        if sdk_util.env_var_is_true(BUILD_TMPFS_ENV_VAR):
+            if os.path.isdir(TMPFS_PATH):
+                return os.path.join(TMPFS_PATH, TMPFS_BUILD_DIR), True
+            print('{0} is not available, using a disk-based build directory'.format(TMPFS_PATH))
+        build_dir = os.getenv(BUILD_DIR_ENV_VAR)
+        if build_dir:
+            return os.path.abspath(build_dir), False
+        return sdk_util.build_sdk_path('docker', 'build'), False
+
+    def acquire(self):
+        os.makedirs(self.root_path, exist_ok=True)
+        self.lock_file = open(self.lock_path, 'w')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print('Waiting for another build using {0} to finish'.format(self.path))
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+
+    def release(self):
+        if not self.lock_file:
+            return
+        try:
+            if self.is_tmpfs:
+                shutil.rmtree(self.path, ignore_errors=True)
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def remove(self):
+        ''' Deletes the build directory, waiting for any build using it to finish. '''
+        with self:
+            shutil.rmtree(self.path, ignore_errors=True)
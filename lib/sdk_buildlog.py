@@ -0,0 +1,78 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import re
+import time
+
+# Lines that aren't useful, e.g. "---> Running in 1a2b3c" and "---> 4d5e6f".
+SUPPRESSED_LINE_PATTERN = re.compile(
+    r"--->|Removing intermediate container|WARNING: Running pip as the 'root' user")
+STEP_LINE_PATTERN = re.compile(r'Step (\d+)/\d+ : ')
+COMMAND_SEPARATOR = ' && '
+COMMAND_SEPARATOR_AND_NEWLINE = ' && \\\n'
+STEP_SUMMARY_WIDTH = 70
+
+class SdkBuildLog():
+    ''' Processes the decoded chunks of a Docker build stream as they arrive.
+        Useful lines are printed immediately, and the time taken by each
+        Dockerfile step is recorded.
+        A stream chunk may hold part of a line or several lines,
+        so output is split into lines here.
+    '''
+    def __init__(self):
+        self.partial_line = ''
+        self.error = None
+        self.image_id = None
+        # List of [step number, instruction, start time, end time].
+        self.steps = []
+
+    def process(self, chunk):
+        if 'stream' in chunk:
+            lines = (self.partial_line + chunk['stream']).split('\n')
+            self.partial_line = lines.pop()
+            for line in lines:
+                self._process_line(line)
+        elif 'error' in chunk:
+            self.error = chunk['error']
+            self._print_line(chunk['error'])
+        elif 'aux' in chunk and 'ID' in chunk['aux']:
+            self.image_id = chunk['aux']['ID']
+
+    def finish(self):
+        if self.partial_line:
+            self._process_line(self.partial_line)
+            self.partial_line = ''
+        self._end_current_step()
+
+    def print_step_durations(self):
+        if not self.steps:
+            return
+        print('Build step durations:')
+        for step_number, instruction, start_time, end_time in self.steps:
+            if len(instruction) > STEP_SUMMARY_WIDTH:
+                instruction = instruction[:STEP_SUMMARY_WIDTH - 3] + '...'
+            print('{0:>4}  {1:>8.1f}s  {2}'.format(step_number, end_time - start_time, instruction))
+
+    def _process_line(self, line):
+        if not line or SUPPRESSED_LINE_PATTERN.search(line):
+            return
+        step_match = STEP_LINE_PATTERN.match(line)
+        if step_match:
+            self._end_current_step()
+            instruction = line[step_match.end():]
+            self.steps.append([int(step_match.group(1)), instruction, time.monotonic(), None])
+        self._print_line(line)
+
+    def _end_current_step(self):
+        if self.steps and self.steps[-1][3] is None:
+            self.steps[-1][3] = time.monotonic()
+
+    @staticmethod
+    def _print_line(line_text):
+        # To improve readability of long command lines, insert a newline after each '&&'.
+        if COMMAND_SEPARATOR in line_text:
+            line_text = line_text.replace(COMMAND_SEPARATOR, COMMAND_SEPARATOR_AND_NEWLINE)
+        print(line_text, flush=True)
@@ -0,0 +1,117 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from sdk_zip import BUFFER_SIZE, compress_file, set_compress_level
+
+# auto:      store files by extension, or when a trial compression of their start saves too little.
+# extension: store files by extension only.
+# deflate:   compress every file.
+MODE_AUTO = 'auto'
+MODE_EXTENSION = 'extension'
+MODE_DEFLATE = 'deflate'
+MODES = (MODE_AUTO, MODE_EXTENSION, MODE_DEFLATE)
+
+DEFAULT_LEVEL = 6
+
+# Formats that are already compressed, so deflating them again saves next to nothing.
+STORED_EXTENSIONS = ('.whl', '.rpm', '.jar', '.war', '.egg', '.zip', '.gz', '.tgz', '.xz', '.txz',
+                     '.bz2', '.tbz2', '.7z', '.lz4', '.zst', '.png', '.jpg', '.jpeg', '.gif',
+                     '.webp', '.ico', '.woff', '.woff2', '.mp3', '.mp4', '.pdf')
+
+# Files smaller than this are always deflated: a trial would cost more than it could save.
+TRIAL_MIN_FILE_SIZE = 16 * 1024
+TRIAL_SAMPLE_SIZE = 64 * 1024
+# A file is stored if the trial sample compresses to more than this fraction of its size.
+TRIAL_MAX_RATIO = 0.95
+
+class SdkCompressionPolicy():
+    ''' Decides whether each package file is deflated or stored,
+        and accumulates statistics on the work done.
+        Statistics may be recorded from several threads.
+    '''
+    def __init__(self, mode=MODE_AUTO, level=DEFAULT_LEVEL):
+        if mode not in MODES:
+            raise ValueError('Unknown compression mode {0}'.format(mode))
+        self.mode = mode
+        self.level = level
+        self.lock = threading.Lock()
+        self.deflated_count = 0
+        self.deflated_input_bytes = 0
+        self.deflated_output_bytes = 0
+        self.stored_count = 0
+        self.stored_bytes = 0
+        # Elapsed time spent compressing, summed over files, so it can exceed the wall time
+        # when files are compressed on several threads.
+        self.compress_seconds = 0.0
+
+    def signature(self):
+        ''' Identifies the settings that affect compressed output. '''
+        return '{0}:{1}'.format(self.mode, self.level)
+
+    def choose_compression(self, path):
+        ''' Returns zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED for the file at path. '''
+        if self.mode == MODE_DEFLATE:
+            return zipfile.ZIP_DEFLATED
+        if path.lower().endswith(STORED_EXTENSIONS):
+            return zipfile.ZIP_STORED
+        if self.mode == MODE_AUTO and self._fails_trial_compression(path):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def add_file_to_zip(self, target_zip, path):
+        ''' Writes the file at path to target_zip on the calling thread,
+            streaming it so that a large file is not held in memory.
+        '''
+        start_time = time.perf_counter()
+        zinfo = zipfile.ZipInfo.from_file(path)
+        zinfo.compress_type = self.choose_compression(path)
+        # ZipFile.write accepts compresslevel only from Python 3.7.
+        set_compress_level(zinfo, self.level)
+        with open(path, 'rb') as source_file, target_zip.open(zinfo, 'w') as entry_file:
+            shutil.copyfileobj(source_file, entry_file, BUFFER_SIZE)
+        self.record(zinfo, time.perf_counter() - start_time)
+
+    def compress_file(self, path, compute_digest=False):
+        ''' Compresses the file at path for a later sdk_zip.write_raw_entry.
+            Safe to call on worker threads.
+            Returns a (ZipInfo, data, SHA-256 hex digest or None) tuple.
+        '''
+        start_time = time.perf_counter()
+        compressed_file = compress_file(path, self.choose_compression(path), self.level, compute_digest)
+        self.record(compressed_file[0], time.perf_counter() - start_time)
+        return compressed_file
+
+    def record(self, zinfo, compress_seconds):
+        with self.lock:
+            self.compress_seconds += compress_seconds
+            if zinfo.compress_type == zipfile.ZIP_STORED:
+                self.stored_count += 1
+                self.stored_bytes += zinfo.file_size
+            else:
+                self.deflated_count += 1
+                self.deflated_input_bytes += zinfo.file_size
+                self.deflated_output_bytes += zinfo.compress_size
+
+    def report(self):
+        return ('Deflated {0} files (level {1}): {2} bytes to {3} bytes, saving {4} bytes '
+                'in {5:.2f}s of compression time\nStored {6} files ({7} bytes) without compression'
+                .format(self.deflated_count, self.level, self.deflated_input_bytes,
+                        self.deflated_output_bytes,
+                        self.deflated_input_bytes - self.deflated_output_bytes,
+                        self.compress_seconds, self.stored_count, self.stored_bytes))
+
+    def _fails_trial_compression(self, path):
+        if os.path.getsize(path) < TRIAL_MIN_FILE_SIZE:
+            return False
+        with open(path, 'rb') as sampled_file:
+            sample = sampled_file.read(TRIAL_SAMPLE_SIZE)
+        return len(zlib.compress(sample, 1)) > len(sample) * TRIAL_MAX_RATIO
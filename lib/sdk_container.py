@@ -4,6 +4,7 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
+import collections
 import os
 import sdk_util
 from sdk_certificates import build_cert_bundle_file_path
@@ -16,12 +17,19 @@ PATH_CONTAINER = APP_ROOT + '/container'
 PATH_STORE = APP_ROOT + '/store'
 PATH_CERTS = '/etc/qradar_pki/ca-bundle.crt'
 
+RunSettings = collections.namedtuple('RunSettings', ['env_vars', 'mounts', 'port_mappings', 'memory_limit'])
+
 class SdkContainer():
-    def __init__(self, docker, workspace, running=True):
+    def __init__(self, docker, workspace, running=True, retrieve=True):
+        ''' running=True requires the container to exist, running=False prompts to remove it if it does.
+            retrieve=False skips both checks, for callers that only need the container name and settings.
+        '''
         self.docker = docker
         self.name = 'qradar-{0}'.format(workspace.image_name)
         self.workspace = workspace
         self.container = None
+        if not retrieve:
+            return
         try:
             self.container = self.docker.retrieve_container(self.name)
         except SdkContainerError:
@@ -39,21 +47,33 @@ class SdkContainer():
                                  .format(self.name, self.container.short_id))
         self.remove()
 
-    def run(self, flask_host_port, show_logs, use_dev_env, qconsole, dev_app_instance_id):
+    def run(self, flask_host_port, show_logs, use_dev_env, qconsole, dev_app_instance_id, warm_pool=None):
+        ''' If warm_pool is supplied and holds a container started with the same
+            settings, that container is used instead of starting a new one.
+        '''
         print('Starting container [{0}] using image [{1}]'.format(self.name, self.workspace.image_name))
-        env_vars = self.workspace.generate_env_vars(dev_app_instance_id, use_dev_env,
-                                                    PATH_CERTS if qconsole else None)
-        app_mounts = self._build_app_container_mounts(qconsole)
-        requested_port_mappings = self._build_requested_port_mappings(flask_host_port)
-        memory_limit = self._determine_memory_limit()
+        run_settings = self.build_run_settings(flask_host_port, use_dev_env, qconsole, dev_app_instance_id)
 
-        self.container = self.docker.run(self.workspace.image_name, self.name, app_mounts, env_vars,
-                                         requested_port_mappings, memory_limit, show_logs)
+        self.container = warm_pool.claim(run_settings) if warm_pool else None
+        if self.container is None:
+            self.container = self.docker.run(self.workspace.image_name, self.name, run_settings.mounts,
+                                             run_settings.env_vars, run_settings.port_mappings,
+                                             run_settings.memory_limit, show_logs)
+        elif show_logs:
+            self.docker.print_container_logs(self.container)
 
         assigned_port_mappings = self.retrieve_assigned_port_mappings()
         flask_mode = self._determine_flask_mode(use_dev_env)
         self._print_run_status(assigned_port_mappings, flask_mode)
 
+    def build_run_settings(self, flask_host_port, use_dev_env, qconsole, dev_app_instance_id):
+        env_vars = self.workspace.generate_env_vars(dev_app_instance_id, use_dev_env,
+                                                    PATH_CERTS if qconsole else None)
+        app_mounts = self._build_app_container_mounts(qconsole)
+        requested_port_mappings = self._build_requested_port_mappings(flask_host_port)
+        memory_limit = self._determine_memory_limit()
+        return RunSettings(env_vars, app_mounts, requested_port_mappings, memory_limit)
+
     def _build_mount(self, source_path, target_path):
         print('Mounting {0} to {1}'.format(source_path, target_path))
         return self.docker.build_mount(source_path, target_path)
@@ -10,15 +10,23 @@ import sdk_util
 
 # All directories beneath the app's container directory, excluding pip and rpm.
 CONTAINER_DIRS = ['build', 'run', 'clean', 'service', 'conf']
+DEPENDENCY_DIRS = ['pip', 'rpm']
 
 CONCAT_CMD = ' && \\\n'
 CONTINUE_LINE = ' \\\n'
+COPY_INSTRUCTION = 'COPY ["{0}", "{1}"]\n'
+RUN_INSTRUCTION = 'RUN {0}\n'
 
 PIP_CMD = 'pip install --no-index --disable-pip-version-check '
 PIP_PATH = sdk_container.PATH_CONTAINER + '/pip'
 PIP_PACKAGE_PATH = PIP_PATH + '/{0}'
-PIP_CMD_PACKAGE_AND_CONCAT = PIP_CMD + PIP_PACKAGE_PATH + CONCAT_CMD
 PIP_PACKAGE_AND_CONTINUE = PIP_PACKAGE_PATH + CONTINUE_LINE
+COPY_PIP_GROUP_INSTRUCTION = 'COPY [{0}, "' + PIP_PATH + '/"]\n'
+# Packages listed in pip's ordering.txt are installed in groups of PIP_GROUP_SIZE,
+# with larger groups if needed to keep to MAX_PIP_GROUPS. Each group adds two image
+# layers, so apps with many packages stay well within Docker's limit of 127 layers.
+PIP_GROUP_SIZE = 4
+MAX_PIP_GROUPS = 10
 
 # The base image includes rpm and microdnf but not yum.
 # microdnf does not support installation of local packages
@@ -27,30 +35,48 @@ PIP_PACKAGE_AND_CONTINUE = PIP_PACKAGE_PATH + CONTINUE_LINE
 # clean up /var/cache/yum to save space. Without the yum command
 # we have to use microdnf for cleanup.
 RPM_CMD = 'rpm -Uv --replacepkgs --excludedocs '
-RPM_PACKAGE_AND_CONTINUE = sdk_container.PATH_CONTAINER + '/rpm/{0}' + CONTINUE_LINE
+RPM_PATH = sdk_container.PATH_CONTAINER + '/rpm'
+RPM_PACKAGE_AND_CONTINUE = RPM_PATH + '/{0}' + CONTINUE_LINE
 RPM_CLEANUP = 'microdnf clean all'
 
 def _workspace_container_path(workspace_path, container_dir):
     return os.path.join(workspace_path, 'container', container_dir)
 
 def generate_dependencies_command(workspace_path):
-    ''' Returns a string containing a single Dockerfile RUN command
-        for installing all package dependencies from the app
-        workspace's container/pip and container/rpm directories.
+    ''' Returns a string containing Dockerfile instructions for installing all
+        package dependencies from the app workspace's container/pip and container/rpm directories.
+        Each install is preceded by a COPY of only the packages it uses, so that
+        Docker reuses the cached layers until those packages change:
+          + one COPY/RUN pair for all rpms
+          + one COPY/RUN pair per group of consecutive packages listed in pip's ordering.txt,
+            or a single pair for all pip packages if there is no ordering.txt.
         If there are no dependencies, an empty string is returned.
     '''
     rpms_cmd = process_rpms(_workspace_container_path(workspace_path, 'rpm'))
     pip_cmd = process_pips(_workspace_container_path(workspace_path, 'pip'))
-
-    if rpms_cmd is None:
-        if pip_cmd is None:
-            return ''
-        full_cmd = pip_cmd
-    elif pip_cmd is None:
-        full_cmd = rpms_cmd
-    else:
-        full_cmd = rpms_cmd + CONCAT_CMD + pip_cmd
-    return 'RUN ' + full_cmd
+    return (rpms_cmd or '') + (pip_cmd or '')
+
+def generate_app_files_command(relative_paths, dockerignore_patterns):
+    ''' Returns a string containing Dockerfile COPY instructions for every top-level
+        build context entry in relative_paths, apart from the dependency directories
+        which are copied by the instructions from generate_dependencies_command.
+        container is copied one subdirectory at a time, to leave out pip and rpm.
+        Entries matching dockerignore_patterns, an SdkIgnorePatterns for the
+        context's .dockerignore, are not in the context and so are not copied.
+    '''
+    app_files = set()
+    for relative_path in relative_paths:
+        path_components = relative_path.split(os.sep)
+        if path_components[0] != 'container':
+            app_file = path_components[0]
+        elif len(path_components) > 1 and path_components[1] not in DEPENDENCY_DIRS:
+            app_file = 'container/' + path_components[1]
+        else:
+            continue
+        if not dockerignore_patterns.matches(app_file, os.path.basename(app_file), False):
+            app_files.add(app_file)
+    return ''.join(COPY_INSTRUCTION.format(app_file, sdk_container.APP_ROOT + '/' + app_file)
+                   for app_file in sorted(app_files))
 
 def process_pips(pip_path):
     # pylint: disable=too-many-return-statements, too-many-branches
@@ -97,16 +123,26 @@ def process_pips(pip_path):
     return _build_single_pip_command(sorted(directory_package_list))
 
 def _build_multi_pip_commands(package_list):
+    ''' Installs the packages in order, each group of consecutive packages in its own layers,
+        so a change to one package only reinstalls its group and the groups ordered after it.
+    '''
+    group_size = max(PIP_GROUP_SIZE, -(-len(package_list) // MAX_PIP_GROUPS))
     buf = ''
-    for package in package_list:
-        buf = buf + PIP_CMD_PACKAGE_AND_CONCAT.format(package)
-    return buf[:-6]
+    for start in range(0, len(package_list), group_size):
+        group = package_list[start:start + group_size]
+        buf = buf + COPY_PIP_GROUP_INSTRUCTION.format(
+            ', '.join('"container/pip/{0}"'.format(package) for package in group))
+        install_cmd = PIP_CMD
+        for package in group:
+            install_cmd = install_cmd + PIP_PACKAGE_AND_CONTINUE.format(package)
+        buf = buf + RUN_INSTRUCTION.format(install_cmd[:-3])
+    return buf
 
 def _build_single_pip_command(package_list):
     buf = PIP_CMD
     for package in package_list:
         buf = buf + PIP_PACKAGE_AND_CONTINUE.format(package)
-    return buf[:-3]
+    return COPY_INSTRUCTION.format('container/pip', PIP_PATH) + RUN_INSTRUCTION.format(buf[:-3])
 
 def process_rpms(rpms_path):
     if not os.path.isdir(rpms_path):
@@ -152,7 +188,8 @@ def _build_rpm_command(package_list):
     buf = RPM_CMD
     for package in package_list:
         buf = buf + RPM_PACKAGE_AND_CONTINUE.format(package)
-    return buf[:-3] + CONCAT_CMD + RPM_CLEANUP
+    return (COPY_INSTRUCTION.format('container/rpm', RPM_PATH) +
+            RUN_INSTRUCTION.format(buf[:-3] + CONCAT_CMD + RPM_CLEANUP))
 
 def generate_init_command(workspace_path):
     ''' Returns a string containing a single Dockerfile RUN command
@@ -217,34 +254,34 @@ def _check_ordering_against_directory(ordering_list, directory_package_list, ord
 
     return filtered_ordering_list
 
-def copy_dependencies_to_build_root(dependencies_cmd, workspace_path):
-    ''' Creates directories container/pip and container/rpm under the build root directory.
-        Copies to those locations any pip and rpm package files from the workspace.
+def add_dependencies_to_build_context(build_context, dependencies_cmd, workspace_path):
+    ''' Adds directories container/pip and container/rpm to the build context.
+        Adds to those locations any pip and rpm package files from the workspace
+        that are used by dependencies_cmd.
     '''
-    build_pip_path = sdk_util.build_sdk_path('docker', 'build', 'container', 'pip')
-    os.makedirs(build_pip_path)
+    build_pip_path = os.path.join('container', 'pip')
+    build_context.add_directory(build_pip_path)
     if PIP_CMD in dependencies_cmd:
-        print('Copying Python packages to {0}'.format(build_pip_path))
-        sdk_util.copy_tree(_workspace_container_path(workspace_path, 'pip'), build_pip_path)
+        print('Adding Python packages to build context')
+        build_context.add_tree(_workspace_container_path(workspace_path, 'pip'), build_pip_path)
 
-    build_rpms_path = sdk_util.build_sdk_path('docker', 'build', 'container', 'rpm')
-    os.makedirs(build_rpms_path)
+    build_rpms_path = os.path.join('container', 'rpm')
+    build_context.add_directory(build_rpms_path)
     if RPM_CMD in dependencies_cmd:
-        print('Copying rpm packages to {0}'.format(build_rpms_path))
-        sdk_util.copy_tree(_workspace_container_path(workspace_path, 'rpm'), build_rpms_path)
+        print('Adding rpm packages to build context')
+        build_context.add_tree(_workspace_container_path(workspace_path, 'rpm'), build_rpms_path)
 
-def copy_container_scripts_to_build_root(workspace_path):
+def add_container_scripts_to_build_context(build_context, workspace_path):
     for container_dir in CONTAINER_DIRS:
-        _copy_container_dir_to_build_root(workspace_path, container_dir)
+        _add_container_dir_to_build_context(build_context, workspace_path, container_dir)
 
-def _copy_container_dir_to_build_root(workspace_path, container_dir):
-    ''' Creates directory named container/<container_dir> under the build root directory.
-        Copies to that location any container/<container_dir> files from the workspace,
-        and sets executable permission on those files.
+def _add_container_dir_to_build_context(build_context, workspace_path, container_dir):
+    ''' Adds directory container/<container_dir> to the build context, containing
+        any container/<container_dir> files from the workspace with executable permission set.
     '''
-    build_container_path = sdk_util.build_sdk_path('docker', 'build', 'container', container_dir)
-    os.makedirs(build_container_path)
+    build_container_path = os.path.join('container', container_dir)
+    build_context.add_directory(build_container_path)
     workspace_container_path = _workspace_container_path(workspace_path, container_dir)
     if os.path.isdir(workspace_container_path):
-        print('Copying scripts to {0}'.format(build_container_path))
-        sdk_util.copy_tree(workspace_container_path, build_container_path, 0o755)
+        print('Adding scripts from {0} to build context'.format(workspace_container_path))
+        build_context.add_tree(workspace_container_path, build_container_path, 0o755)
@@ -0,0 +1,151 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+from sdk_container import PATH_CONTAINER
+from sdk_exceptions import SdkFatalError
+from sdk_image import SdkImage
+from sdk_manifest import SdkManifest
+import sdk_supervisor
+import sdk_util
+from sdk_watcher import create_watcher
+
+# Workspace paths watched for changes, relative to the workspace root.
+WATCHED_PATHS = ['app', 'manifest.json', 'qenv.ini', 'container']
+
+# How each kind of change reaches the running container, from least to most disruptive.
+CHANGE_APP = 'app'
+CHANGE_SERVICES = 'services'
+CHANGE_RESTART = 'restart'
+CHANGE_REBUILD = 'rebuild'
+
+# Paths beneath container whose files are copied into the running container.
+SERVICE_DIRS = {os.path.join('container', 'service'): PATH_CONTAINER + '/service',
+                os.path.join('container', 'conf', 'supervisord.d'): '/etc/supervisord.d'}
+SUPERVISORD_CONF_DIR = '/etc'
+SUPERVISORD_CONF_FILE = 'supervisord.conf'
+FLASK_PROGRAM_NAME = 'startflask'
+
+def classify_change(path):
+    ''' Returns the kind of change made by modifying path, relative to the workspace root.
+        app is bind-mounted into the container. manifest.json is also bind-mounted,
+        but its services are configured in supervisord.conf, so it is treated as
+        a service change and the Supervisor programs are compared later.
+        qenv.ini supplies environment variables, so the container must be recreated.
+        Anything else beneath container is part of the image.
+    '''
+    if path.startswith('app' + os.sep):
+        return CHANGE_APP
+    if path == 'manifest.json':
+        return CHANGE_SERVICES
+    if path == 'qenv.ini':
+        return CHANGE_RESTART
+    for service_dir in SERVICE_DIRS:
+        if path.startswith(service_dir + os.sep):
+            return CHANGE_SERVICES
+    return CHANGE_REBUILD
+
+class SdkDevLoop():
+    ''' Watches a workspace whose app is running in a container, and applies each
+        change in the cheapest way that brings the container up to date:
+          + app code: left to Flask's reloader in development mode,
+            otherwise the Flask program is restarted by Supervisor
+          + services: changed files are copied into the container, then
+            supervisorctl rereads its configuration and restarts changed programs
+          + qenv.ini: the container is recreated
+          + dependencies and other container files: the image is rebuilt,
+            reusing unchanged layers, and the container is recreated.
+    '''
+    def __init__(self, docker, workspace, container, use_dev_env, qconsole, dev_app_instance_id):
+        self.docker = docker
+        self.workspace = workspace
+        self.container = container
+        self.use_dev_env = use_dev_env
+        self.qconsole = qconsole
+        self.dev_app_instance_id = dev_app_instance_id
+        self.supervisord_programs = sdk_supervisor.generate_programs(workspace.manifest)
+
+    def watch(self):
+        watcher = create_watcher(self.workspace.path, WATCHED_PATHS)
+        print('Watching workspace [{0}] for changes using {1}. Press Ctrl+C to stop.'
+              .format(self.workspace.name, watcher.description))
+        try:
+            while True:
+                changes = watcher.wait_for_changes()
+                try:
+                    self.apply_changes(changes)
+                except (ValueError, OSError, SdkFatalError) as err:
+                    print('Unable to apply changes: {0}'.format(sdk_util.strip_errno_prefix(str(err))))
+                print('Watching for changes')
+        except KeyboardInterrupt:
+            print('\nStopped watching workspace [{0}]. Container [{1}] is still running.'
+                  .format(self.workspace.name, self.container.name))
+        finally:
+            watcher.close()
+
+    def apply_changes(self, changed_paths):
+        changes_by_kind = {}
+        for path in sorted(changed_paths):
+            changes_by_kind.setdefault(classify_change(path), []).append(path)
+        for kind, paths in sorted(changes_by_kind.items()):
+            print('Detected {0} change: {1}'.format(kind, ', '.join(paths)))
+
+        if CHANGE_REBUILD in changes_by_kind:
+            SdkImage(self.docker, self.workspace).build()
+            self._recreate_container()
+        elif CHANGE_RESTART in changes_by_kind:
+            self._recreate_container()
+        else:
+            if CHANGE_SERVICES in changes_by_kind:
+                self._update_services(changes_by_kind[CHANGE_SERVICES])
+            if CHANGE_APP in changes_by_kind:
+                self._reload_app()
+
+    def _reload_app(self):
+        if self.use_dev_env or not self.workspace.manifest.uses_flask:
+            print('App code is mounted into the container, no action needed')
+            return
+        print('Restarting Flask')
+        self._supervisorctl('restart', FLASK_PROGRAM_NAME)
+
+    def _update_services(self, changed_paths):
+        if 'manifest.json' in changed_paths:
+            self.workspace.manifest = SdkManifest.from_workspace(self.workspace.path)
+            supervisord_programs = sdk_supervisor.generate_programs(self.workspace.manifest)
+            if supervisord_programs != self.supervisord_programs:
+                self.supervisord_programs = supervisord_programs
+                supervisord_conf = sdk_supervisor.generate_supervisord_conf(
+                    self.workspace.manifest, sdk_util.build_sdk_path('image_files', 'init', SUPERVISORD_CONF_FILE))
+                print('Updating {0}/{1}'.format(SUPERVISORD_CONF_DIR, SUPERVISORD_CONF_FILE))
+                self.docker.copy_content_to_container(self.container.container, SUPERVISORD_CONF_DIR,
+                                                      {SUPERVISORD_CONF_FILE: supervisord_conf.encode()})
+        for service_dir, container_dir in SERVICE_DIRS.items():
+            file_contents = {}
+            for path in changed_paths:
+                if path.startswith(service_dir + os.sep) and os.path.isfile(os.path.join(self.workspace.path, path)):
+                    with open(os.path.join(self.workspace.path, path), 'rb') as changed_file:
+                        file_contents[os.path.relpath(path, service_dir)] = changed_file.read()
+            if file_contents:
+                print('Copying {0} files to {1}'.format(len(file_contents), container_dir))
+                self.docker.copy_content_to_container(self.container.container, container_dir, file_contents)
+        self._supervisorctl('reread')
+        self._supervisorctl('update')
+
+    def _supervisorctl(self, *arguments):
+        exit_code, output = self.docker.execute_in_container(self.container.container,
+                                                             ['supervisorctl'] + list(arguments))
+        for line in output.splitlines():
+            print('supervisorctl: {0}'.format(line))
+        if exit_code != 0:
+            print('supervisorctl {0} exited with status {1}'.format(' '.join(arguments), exit_code))
+
+    def _recreate_container(self):
+        flask_host_port = self.container.retrieve_assigned_port_mappings().get(
+            self.docker.CONTAINER_PORT) if self.workspace.manifest.uses_flask else None
+        self.container.remove()
+        self.workspace.manifest = SdkManifest.from_workspace(self.workspace.path)
+        self.supervisord_programs = sdk_supervisor.generate_programs(self.workspace.manifest)
+        self.container.run(flask_host_port, False, self.use_dev_env, self.qconsole, self.dev_app_instance_id)
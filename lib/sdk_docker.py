@@ -5,23 +5,31 @@
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
 import docker
+import io
 import os
-import re
 import requests
+import tarfile
 import time
+from sdk_buildlog import SdkBuildLog
 from sdk_exceptions import SdkDockerError, SdkContainerError
+from sdk_progressbar import ProgressBar
+from sdk_upload import SdkUploadStream
 import sdk_util
 
 DOCKER_CONNECT_ERROR = 'Unable to connect to Docker. Please check that Docker is running.'
+CONTAINER_REMOVE_TIMEOUT = 30
 
 class SdkDockerClient():
     CONTAINER_PORT = '5000/tcp'
 
-    def __init__(self):
+    def __init__(self, max_pool_size=docker.constants.DEFAULT_MAX_POOL_SIZE):
         try:
-            self.docker_client = docker.from_env(version='auto')
+            self.docker_client = docker.from_env(version='auto', max_pool_size=max_pool_size)
         except docker.errors.DockerException:
             raise SdkDockerError(DOCKER_CONNECT_ERROR)
+        # Disabled when several builds share this client, because pruning
+        # dangling images could remove layers of a build that is in progress.
+        self.prune_after_failed_build = True
 
     @staticmethod
     def _handle_connection_error():
@@ -31,43 +39,11 @@ class SdkDockerClient():
     def _handle_docker_error(error):
         raise SdkDockerError('Docker error: {0}'.format(error))
 
-    def _handle_docker_image_build_error(self, error):
-        self._print_build_log(error.build_log)
-        print('Cleaning up build remnants')
-        self.prune_containers()
-        self.prune_images()
+    def _handle_docker_image_build_error(self):
+        if self.prune_after_failed_build:
+            self.prune_build_remnants()
         raise SdkDockerError('Build failed: see DOCKER BUILD LOG above for error details')
 
-    @staticmethod
-    def _print_build_log(build_log):
-        print('DOCKER BUILD LOG: START')
-        # Each line in build_log is represented by an object.
-        # Lines without 'stream' or 'errorDetail' fields are ignored.
-        for line in build_log:
-            if 'stream' in line:
-                # Ignore lines that aren't useful.
-                if SdkDockerClient._suppress_stream_line(line['stream']):
-                    continue
-                # Remove newlines so that output is compact.
-                line_text = re.sub('\n', '', line['stream'])
-                # Ignore lines that are empty.
-                if len(line_text) == 0:
-                    continue
-            elif 'errorDetail' in line:
-                line_text = line['error']
-            else:
-                continue
-            # To improve readability of long command lines, insert a newline
-            # after each '&&'.
-            print(re.sub(' && ', ' && \\\n', line_text), flush=True)
-        print('DOCKER BUILD LOG: END')
-
-    @staticmethod
-    def _suppress_stream_line(line):
-        return '--->' in line or \
-            'Removing intermediate container' in line or \
-            "WARNING: Running pip as the 'root' user" in line
-
     def check_docker_is_running(self):
         try:
             self.docker_client.ping()
@@ -90,29 +66,59 @@ class SdkDockerClient():
         return self.retrieve_image(image_repo + ':' + image_tag) is not None
 
     def load_image_from_archive(self, image_archive_path):
-        with open(image_archive_path, 'rb') as image_data:
+        with ProgressBar(ascii=True, unit='b', unit_scale=True) as progress_bar:
             try:
-                self.docker_client.images.load(image_data)
+                self.docker_client.images.load(SdkUploadStream(image_archive_path, progress_bar.progress))
             except requests.ConnectionError:
                 self._handle_connection_error()
             except (docker.errors.DockerException) as de:
                 self._handle_docker_error(de)
 
-    def build_image(self, image_name, build_path):
-        user_id = str(os.getuid())
-        group_id = str(os.getgid())
-        args = {'APP_USER_ID': user_id, 'APP_GROUP_ID': group_id}
-        print('Using user ID {0} and group ID {1}'.format(user_id, group_id))
-        try:
-            _, build_log = self.docker_client.images.build(path=build_path, tag=image_name,
-                                                           buildargs=args, rm=True)
-            self._print_build_log(build_log)
-        except (docker.errors.BuildError) as be:
-            self._handle_docker_image_build_error(be)
+    @staticmethod
+    def build_args():
+        return {'APP_USER_ID': str(os.getuid()), 'APP_GROUP_ID': str(os.getgid())}
+
+    def retrieve_image_label(self, image_name, label):
+        ''' Returns the value of label on image_name, or None if
+            the image does not exist or does not have that label.
+        '''
+        image = self.retrieve_image(image_name)
+        if image is None:
+            return None
+        return (image.labels or {}).get(label)
+
+    def build_image(self, image_name, build_path, labels=None):
+        args = self.build_args()
+        print('Using user ID {0} and group ID {1}'.format(args['APP_USER_ID'], args['APP_GROUP_ID']))
+        build_log = SdkBuildLog()
+        try:
+            # The low-level API returns the build stream as it is produced,
+            # so each line is shown as soon as Docker emits it.
+            build_stream = self.docker_client.api.build(path=build_path, tag=image_name, buildargs=args,
+                                                        labels=labels, rm=True, decode=True)
+            print('DOCKER BUILD LOG: START')
+            for chunk in build_stream:
+                build_log.process(chunk)
+            build_log.finish()
+            print('DOCKER BUILD LOG: END')
         except requests.ConnectionError:
             self._handle_connection_error()
         except (docker.errors.DockerException) as de:
             self._handle_docker_error(de)
+        build_log.print_step_durations()
+        if build_log.error:
+            self._handle_docker_image_build_error()
+        if build_log.image_id:
+            # Confirms that the tag was applied to the image this build produced.
+            image = self.retrieve_image(image_name)
+            if image is None or image.id != build_log.image_id:
+                raise SdkDockerError('Image {0} was not tagged with the image built, {1}'
+                                     .format(image_name, build_log.image_id))
+
+    def prune_build_remnants(self):
+        print('Cleaning up build remnants')
+        self.prune_containers()
+        self.prune_images()
 
     def prune_containers(self):
         try:
@@ -155,22 +161,73 @@ class SdkDockerClient():
         '''
         try:
             container.stop()
-            self._wait_for_container_remove_complete(container.name)
+            self._wait_for_container_remove_complete(container)
         except requests.ConnectionError:
             self._handle_connection_error()
         except (docker.errors.DockerException) as de:
             self._handle_docker_error(de)
 
-    def _wait_for_container_remove_complete(self, container_name):
-        while True:
-            try:
-                self.retrieve_container(container_name)
-                time.sleep(5)
-            except SdkContainerError:
-                return
+    @staticmethod
+    def _wait_for_container_remove_complete(container):
+        ''' Blocks until Docker reports that the container has been removed,
+            which usually happens within milliseconds of it stopping.
+            If that has not happened after CONTAINER_REMOVE_TIMEOUT seconds,
+            e.g. because the container was not started with auto_remove,
+            the container is removed here instead.
+        '''
+        try:
+            container.wait(condition='removed', timeout=CONTAINER_REMOVE_TIMEOUT)
+            return
+        except docker.errors.NotFound:
+            # The container was removed before the wait began.
+            return
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+            # Docker sends the response headers as soon as the wait begins,
+            # so a timeout while waiting for the body surfaces as ConnectionError.
+            pass
+        print('Container {0} was not removed automatically, removing it now'.format(container.name))
+        try:
+            container.remove(force=True)
+            container.reload()
+        except docker.errors.NotFound:
+            return
+        raise SdkContainerError('Unable to remove container {0}'.format(container.name))
+
+    def copy_content_to_container(self, container, target_dir, file_contents, mode=0o755):
+        ''' Writes files into a running container. file_contents maps
+            a path relative to target_dir to the bytes to write there.
+        '''
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode='w') as tar:
+            for file_name, content in file_contents.items():
+                tarinfo = tarfile.TarInfo(file_name)
+                tarinfo.size = len(content)
+                tarinfo.mode = mode
+                tarinfo.mtime = time.time()
+                tarinfo.uid = os.getuid()
+                tarinfo.gid = os.getgid()
+                tar.addfile(tarinfo, io.BytesIO(content))
+        try:
+            container.put_archive(target_dir, tar_buffer.getvalue())
+        except requests.ConnectionError:
+            self._handle_connection_error()
+        except (docker.errors.DockerException) as de:
+            self._handle_docker_error(de)
+
+    def execute_in_container(self, container, command):
+        ''' Runs command in a running container.
+            Returns an (exit code, output string) tuple.
+        '''
+        try:
+            exit_code, output = container.exec_run(command)
+        except requests.ConnectionError:
+            self._handle_connection_error()
+        except (docker.errors.DockerException) as de:
+            self._handle_docker_error(de)
+        return exit_code, output.decode('utf-8', errors='ignore')
 
     def run(self, image_name, container_name, app_mounts, env_vars,
-            port_mappings, memory_limit, show_logs):
+            port_mappings, memory_limit, show_logs, labels=None):
         extra_hosts = self._generate_extra_hosts()
         try:
             container = self.docker_client.containers.run(image_name,
@@ -180,6 +237,7 @@ class SdkDockerClient():
                                                           mounts=app_mounts,
                                                           environment=env_vars,
                                                           extra_hosts=extra_hosts,
+                                                          labels=labels,
                                                           auto_remove=True,
                                                           detach=True)
         except requests.ConnectionError:
@@ -188,12 +246,43 @@ class SdkDockerClient():
             self._handle_docker_error(de)
 
         if show_logs:
-            self._print_container_logs(container)
+            self.print_container_logs(container)
         container.reload()
         return container
 
+    def retrieve_containers_with_label(self, label, name_prefix):
+        ''' Returns all containers, running or not, whose name starts
+            with name_prefix and which carry label with any value.
+        '''
+        try:
+            containers = self.docker_client.containers.list(all=True, filters={'label': label})
+        except requests.ConnectionError:
+            self._handle_connection_error()
+        except (docker.errors.DockerException) as de:
+            self._handle_docker_error(de)
+        return [container for container in containers if container.name.startswith(name_prefix)]
+
+    def pause_container(self, container):
+        self._apply_container_operation(container.pause)
+
+    def unpause_container(self, container):
+        self._apply_container_operation(container.unpause)
+
+    def rename_container(self, container, container_name):
+        self._apply_container_operation(container.rename, container_name)
+
+    def _apply_container_operation(self, operation, *args):
+        try:
+            operation(*args)
+        except docker.errors.NotFound:
+            raise SdkContainerError('Container not found')
+        except requests.ConnectionError:
+            self._handle_connection_error()
+        except (docker.errors.DockerException) as de:
+            self._handle_docker_error(de)
+
     @staticmethod
-    def _print_container_logs(container):
+    def print_container_logs(container):
         logs = container.logs(stream=True, follow=True)
         print('CONTAINER LOGS: START')
         try:
@@ -39,6 +39,9 @@ class SdkDockerError(SdkFatalError):
 class SdkContainerError(SdkFatalError):
     """An app container error occurred"""
 
+class SdkPollTimeoutError(SdkFatalError):
+    """A polled operation did not complete before its deadline"""
+
 class SdkQradarVersionError(SdkFatalError):
     """The requested action is not supported by the QRadar version"""
 
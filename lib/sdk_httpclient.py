@@ -5,6 +5,7 @@
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
 from requests import Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, SSLError
 import sdk_certificates
 from sdk_exceptions import SdkServerSslError, SdkServerRequestError, SdkApiResponseError
@@ -17,14 +18,18 @@ class SdkHttpClient():
     REQUESTS_TIMEOUT = (10, None)
     # POST and PUT requests that send a payload use this timeout.
     UPLOAD_TIMEOUT = 60
+    # Maximum number of keep-alive connections held open to the QRadar server.
+    POOL_SIZE = 10
 
-    def __init__(self, qradar_console, username, password, cert_path):
+    def __init__(self, qradar_console, username, password, cert_path, pool_size=POOL_SIZE):
         self.qradar_console = qradar_console
         self.username = username
         self.password = password
         self.cert_path = cert_path
         self.server_config = ServerConfig.from_host_json_file(qradar_console)
         self.upload_timeout = self.UPLOAD_TIMEOUT
+        self.pool_size = pool_size
+        self.session = None
 
     def set_upload_timeout(self, timeout):
         if timeout != self.UPLOAD_TIMEOUT:
@@ -32,16 +37,55 @@ class SdkHttpClient():
         self.upload_timeout = timeout
 
     @classmethod
-    def create_certified_client(cls, qradar_console, username):
+    def create_certified_client(cls, qradar_console, username, pool_size=POOL_SIZE):
         cert_path = sdk_certificates.verify_certificate_bundle(qradar_console)
         password = sdk_util.read_password(username)
-        return cls(qradar_console, username, password, cert_path)
+        return cls(qradar_console, username, password, cert_path, pool_size)
+
+    def close(self):
+        ''' Closes the pooled connections. If SDK_HTTP_STATS=true,
+            connection reuse statistics are printed first.
+        '''
+        if not self.session:
+            return
+        if sdk_util.env_var_is_true('SDK_HTTP_STATS'):
+            stats = self.connection_stats()
+            print('HTTP requests: {0}, connections opened: {1}'
+                  .format(stats['requests'], stats['connections']))
+        self.session.close()
+        self.session = None
+
+    def connection_stats(self):
+        ''' Returns a dict containing the number of requests sent and the number
+            of connections opened by this client's session. When requests exceeds
+            connections, keep-alive connections are being reused.
+        '''
+        stats = {'requests': 0, 'connections': 0}
+        if not self.session:
+            return stats
+        adapter = self.session.get_adapter('https://')
+        pool_managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+        for pool_manager in pool_managers:
+            for pool_key in pool_manager.pools.keys():
+                pool = pool_manager.pools[pool_key]
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+        return stats
 
     # Helper functions
     def _get_requests_session(self):
+        ''' Returns the session shared by all requests made by this client.
+            The session is created on first use and holds a pool of keep-alive
+            connections, so TLS (and SOCKS) negotiation is not repeated per request.
+        '''
+        if self.session:
+            return self.session
         session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
         if self.server_config.has_socks_proxy():
             session.proxies.update(self.server_config.get_socks_config())
+        self.session = session
         return session
 
     def _server_host(self):
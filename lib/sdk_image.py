@@ -6,12 +6,17 @@
 
 import os
 import re
-import shutil
 from sdk_baseimage import SdkBaseImage
+from sdk_builddir import SdkBuildDirectory
+from sdk_buildcontext import SdkBuildContext
 import sdk_dependencies
 import sdk_supervisor
 import sdk_util
 from sdk_exceptions import SdkWorkspaceError
+from sdk_scanner import SdkIgnorePatterns
+
+# Image label recording the digest of the build context the image was built from.
+LABEL_CONTEXT_DIGEST = 'com.ibm.si.app.sdk.context-digest'
 
 class SdkImage():
     def __init__(self, docker, workspace):
@@ -46,42 +51,77 @@ class SdkImage():
         if not re.match(r'^[a-z0-9]+(?:(?:[._]|__|[-]*)?[a-z0-9]+)*$', image_name):
             raise ValueError('{0} is not a valid image name'.format(image_name))
 
-    def build(self):
-        SdkBaseImage().load_if_missing(self.docker)
-        build_root_path = sdk_util.build_sdk_path('docker', 'build')
-        self.prepare_image_build_directory(build_root_path)
-        print('Building image [{0}]'.format(self.workspace.image_name))
-        self.docker.build_image(self.workspace.image_name, build_root_path)
+    @staticmethod
+    def prepare_base_image(docker):
+        ''' Loads the base image if it is not in the registry. Returns its image ID. '''
+        base_image = SdkBaseImage()
+        base_image.load_if_missing(docker)
+        return docker.retrieve_image(base_image.image_repo + ':' + base_image.image_tag).id
+
+    def build(self, force=False, base_image_id=None):
+        ''' Builds the app image, unless force is False and the image in the registry
+            carries a context digest label matching the current build context.
+            base_image_id may be supplied if prepare_base_image has already been called.
+            Returns True if the image was built, False if the build was skipped.
+        '''
+        if base_image_id is None:
+            base_image_id = self.prepare_base_image(self.docker)
+        with SdkBuildDirectory(self.workspace.image_name) as build_directory:
+            build_context = self.describe_build_context(build_directory.path)
+            context_digest = build_context.digest(base_image_id, *self.docker.build_args().items())
+            if not force and self.docker.retrieve_image_label(
+                    self.workspace.image_name, LABEL_CONTEXT_DIGEST) == context_digest:
+                print('Image [{0}] is up to date with workspace [{1}], skipping build'
+                      .format(self.workspace.image_name, self.workspace.name))
+                return False
+            self.prepare_image_build_directory(build_context)
+            print('Building image [{0}]'.format(self.workspace.image_name))
+            self.docker.build_image(self.workspace.image_name, build_directory.path,
+                                    labels={LABEL_CONTEXT_DIGEST: context_digest})
         print('Image [{0}] build completed successfully'.format(self.workspace.image_name))
+        return True
 
-    def prepare_image_build_directory(self, build_root_path):
-        ''' The build directory is docker/build under the SDK installation.
-            This function always deletes and recreates the directory, then
-            populates it with:
+    def describe_build_context(self, build_root_path):
+        ''' Returns an SdkBuildContext for build_root_path containing:
               + Dockerfile/scripts/config files from the SDK installation's image_files directory
               + any scripts and dependencies from the app workspace.
         '''
-        print('Preparing image build directory {0}'.format(build_root_path))
-        shutil.rmtree(build_root_path, ignore_errors=True)
-        os.mkdir(build_root_path)
+        build_context = SdkBuildContext(build_root_path)
 
         image_files_path = sdk_util.build_sdk_path('image_files')
-        sdk_util.copy_tree(image_files_path, build_root_path, 0o755)
+        build_context.add_tree(image_files_path, '', 0o755)
 
         dependencies_cmd = sdk_dependencies.generate_dependencies_command(self.workspace.path)
         init_cmd = sdk_dependencies.generate_init_command(self.workspace.path)
 
-        sdk_dependencies.copy_dependencies_to_build_root(dependencies_cmd, self.workspace.path)
-        sdk_dependencies.copy_container_scripts_to_build_root(self.workspace.path)
+        sdk_dependencies.add_dependencies_to_build_context(build_context, dependencies_cmd, self.workspace.path)
+        sdk_dependencies.add_container_scripts_to_build_context(build_context, self.workspace.path)
 
-        dockerfile_path = os.path.join(build_root_path, 'Dockerfile')
-        sdk_util.replace_string_in_file(dockerfile_path, 'DEPENDENCIES-PLACE-HOLDER', dependencies_cmd)
-        sdk_util.replace_string_in_file(dockerfile_path, 'INIT-PLACE-HOLDER', init_cmd)
-        print('Using {0}'.format(dockerfile_path))
+        with open(os.path.join(image_files_path, 'Dockerfile')) as dockerfile_template:
+            dockerfile = dockerfile_template.read()
+        dockerfile = dockerfile.replace('DEPENDENCIES-PLACE-HOLDER', dependencies_cmd)
+        dockerignore_patterns = SdkIgnorePatterns.from_file(os.path.join(image_files_path, '.dockerignore'))
+        dockerfile = dockerfile.replace('APP-FILES-PLACE-HOLDER', sdk_dependencies.generate_app_files_command(
+            build_context.entries, dockerignore_patterns))
+        dockerfile = dockerfile.replace('INIT-PLACE-HOLDER', init_cmd)
+        build_context.add_content('Dockerfile', dockerfile, 0o755)
 
-        sdk_supervisor.prepare_supervisord_conf(self.workspace.manifest, build_root_path)
+        supervisord_conf_path = os.path.join('init', 'supervisord.conf')
+        build_context.add_content(supervisord_conf_path, sdk_supervisor.generate_supervisord_conf(
+            self.workspace.manifest, os.path.join(image_files_path, supervisord_conf_path)), 0o755)
 
-        return build_root_path
+        return build_context
+
+    @staticmethod
+    def prepare_image_build_directory(build_context):
+        ''' Brings the build directory into line with build_context, copying only
+            files that have changed since the previous build, so that the
+            build directory is not deleted and recreated every time.
+        '''
+        print('Preparing image build directory {0}'.format(build_context.build_root_path))
+        changes = build_context.sync()
+        print('Build directory updated: {0} changes'.format(changes))
+        print('Using {0}'.format(os.path.join(build_context.build_root_path, 'Dockerfile')))
 
     def is_in_registry(self):
         found = self.docker.registry_contains_image(self.workspace.image_name)
@@ -92,4 +132,5 @@ class SdkImage():
     def remove(self):
         print('Removing image [{0}]'.format(self.workspace.image_name))
         self.docker.remove_image(self.workspace.image_name)
+        SdkBuildDirectory(self.workspace.image_name).remove()
         print('Image [{0}] removal completed successfully'.format(self.workspace.image_name))
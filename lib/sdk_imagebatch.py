@@ -0,0 +1,127 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import collections
+import concurrent.futures
+import contextlib
+import os
+import sys
+import threading
+import time
+from sdk_exceptions import SdkFatalError
+from sdk_image import SdkImage
+import sdk_util
+from sdk_workspace import SdkWorkspace
+
+BuildResult = collections.namedtuple('BuildResult', ['workspace', 'image_name', 'status',
+                                                     'error', 'seconds', 'log_path'])
+BUILD_STATUS_BUILT = 'BUILT'
+BUILD_STATUS_UP_TO_DATE = 'UP_TO_DATE'
+BUILD_STATUS_FAILED = 'FAILED'
+
+# Relative to the workspace root. .cache is never added to an app package.
+BUILD_LOG_PATH = os.path.join('.cache', 'qapp_build.log')
+
+class SdkThreadOutput():
+    ''' Stands in for sys.stdout so that a thread can send everything it prints
+        to a stream of its own. Output from other threads goes to default_stream.
+    '''
+    def __init__(self, default_stream):
+        self.default_stream = default_stream
+        self.thread_local = threading.local()
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default_stream, name)
+
+    @contextlib.contextmanager
+    def redirect(self, stream):
+        self.thread_local.stream = stream
+        try:
+            yield stream
+        finally:
+            self.thread_local.stream = None
+
+    def _stream(self):
+        return getattr(self.thread_local, 'stream', None) or self.default_stream
+
+@contextlib.contextmanager
+def thread_output():
+    ''' Installs an SdkThreadOutput as sys.stdout for the duration of the block.
+        The previous sys.stdout is restored afterwards, also when the block raises.
+    '''
+    previous_stdout = sys.stdout
+    output = SdkThreadOutput(previous_stdout)
+    sys.stdout = output
+    try:
+        yield output
+    finally:
+        sys.stdout = previous_stdout
+
+class SdkImageBatch():
+    ''' Builds images for several workspaces concurrently using up to max_workers threads.
+        The builds share one SdkDockerClient, and the base image is checked once.
+        Each build's output is written to the workspace's BUILD_LOG_PATH
+        instead of the console, so that output from different builds is not mixed.
+    '''
+    def __init__(self, docker, max_workers):
+        self.docker = docker
+        self.max_workers = max_workers
+        self.output = None
+
+    def build(self, workspace_paths, force=False):
+        ''' Returns a list of BuildResult in the same order as workspace_paths.
+            A failure building one image does not stop the others.
+        '''
+        base_image_id = SdkImage.prepare_base_image(self.docker)
+        self.docker.prune_after_failed_build = False
+        try:
+            # The executor is shut down, waiting for every build thread,
+            # before sys.stdout is restored.
+            with thread_output() as self.output, \
+                 concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._build_workspace, workspace_path, force, base_image_id)
+                           for workspace_path in workspace_paths]
+                for completed, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    result = future.result()
+                    print('[{0}/{1}] {2}: {3}'.format(completed, len(futures), result.workspace, result.status))
+                results = [future.result() for future in futures]
+        finally:
+            self.output = None
+            self.docker.prune_after_failed_build = True
+        if [result for result in results if result.status == BUILD_STATUS_FAILED]:
+            self.docker.prune_build_remnants()
+        return results
+
+    def _build_workspace(self, workspace_path, force, base_image_id):
+        ''' The workspace is validated before its log is created, so that no .cache
+            directory is left in a path which is not a workspace.
+            If it is not valid, the result has no log_path.
+        '''
+        start_time = time.monotonic()
+        image_name = None
+        log_path = None
+        try:
+            workspace = SdkWorkspace(workspace_path)
+            image_name = workspace.image_name
+            log_path = os.path.join(workspace.path, BUILD_LOG_PATH)
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, 'w') as log_file, self.output.redirect(log_file):
+                try:
+                    built = SdkImage(self.docker, workspace).build(force, base_image_id)
+                except (ValueError, OSError, SdkFatalError) as err:
+                    print(sdk_util.strip_errno_prefix(str(err)))
+                    raise
+        except (ValueError, OSError, SdkFatalError) as err:
+            return BuildResult(workspace_path, image_name, BUILD_STATUS_FAILED, err,
+                               time.monotonic() - start_time, log_path)
+        status = BUILD_STATUS_BUILT if built else BUILD_STATUS_UP_TO_DATE
+        return BuildResult(workspace_path, image_name, status, None, time.monotonic() - start_time, log_path)
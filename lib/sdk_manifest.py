@@ -8,6 +8,8 @@ import os
 import collections
 import json
 import jsonschema
+import marshal
+import threading
 import uuid
 import zipfile
 import sdk_util
@@ -21,6 +23,14 @@ MSG_SDK_MANIFEST_FLASK_PORT = \
 
 NamedService = collections.namedtuple('NamedService', ['name', 'port'])
 
+# Compiled schema validators, keyed on (schema path, schema mtime).
+# Shared by every validation in the process, so the schema is read and compiled once.
+_SCHEMA_VALIDATOR_CACHE = {}
+_SCHEMA_VALIDATOR_CACHE_LOCK = threading.Lock()
+# The parsed schema is also kept in marshal format under the SDK config directory,
+# which loads faster than JSON on the next start. Remove the file to discard it.
+SCHEMA_CACHE_FILE = 'manifest-schema.marshal'
+
 class SdkManifest():
     def __init__(self, manifest_json):
         self.json = manifest_json
@@ -35,35 +45,74 @@ class SdkManifest():
 
     @staticmethod
     def validate_workspace_manifest(manifest_file):
-        schema = SdkManifest._read_manifest_schema()
-        SdkManifest._validate_manifest(manifest_file, schema)
+        validator = SdkManifest._retrieve_schema_validator()
+        SdkManifest._validate_manifest(manifest_file, validator)
 
     @staticmethod
     def validate_zip_manifest(zip_path):
-        schema = SdkManifest._read_manifest_schema()
+        validator = SdkManifest._retrieve_schema_validator()
         try:
             with zipfile.ZipFile(zip_path) as zip_file:
                 with zip_file.open('manifest.json') as manifest_file:
-                    SdkManifest._validate_manifest(manifest_file, schema)
+                    SdkManifest._validate_manifest(manifest_file, validator)
         except zipfile.BadZipfile:
             raise SdkManifestException('{0} is not a valid zip file'.format(zip_path))
         except KeyError:
             raise SdkManifestException('{0} does not contain a manifest.json file'.format(zip_path))
 
     @staticmethod
-    def _read_manifest_schema():
+    def _retrieve_schema_validator():
+        ''' Returns a Draft4Validator for the SDK manifest schema.
+            The validator is compiled once per process and rebuilt only
+            if the schema file's mtime changes.
+        '''
+        schema_path = sdk_util.build_manifest_schema_path()
+        try:
+            schema_mtime = os.stat(schema_path).st_mtime_ns
+        except OSError as oe:
+            raise SdkManifestException('Unable to perform manifest schema validation: {0}'.format(oe))
+        cache_key = (schema_path, schema_mtime)
+        with _SCHEMA_VALIDATOR_CACHE_LOCK:
+            validator = _SCHEMA_VALIDATOR_CACHE.get(cache_key)
+            if validator is None:
+                schema = SdkManifest._load_manifest_schema(schema_path, schema_mtime)
+                validator = jsonschema.Draft4Validator(schema)
+                _SCHEMA_VALIDATOR_CACHE.clear()
+                _SCHEMA_VALIDATOR_CACHE[cache_key] = validator
+            return validator
+
+    @staticmethod
+    def _load_manifest_schema(schema_path, schema_mtime):
+        ''' Loads the parsed schema from the marshal cache if it was written for
+            this schema path and mtime. Otherwise parses the schema JSON and
+            refreshes the marshal cache. Problems with the cache are ignored.
+        '''
+        cache_path = sdk_util.build_config_path(SCHEMA_CACHE_FILE)
         try:
-            with open(sdk_util.build_manifest_schema_path()) as schema_file:
-                return schema_file.read()
+            with open(cache_path, 'rb') as cache_file:
+                cached_path, cached_mtime, schema = marshal.load(cache_file)
+            if cached_path == schema_path and cached_mtime == schema_mtime:
+                return schema
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        try:
+            with open(schema_path) as schema_file:
+                schema = json.load(schema_file)
         except OSError as oe:
             raise SdkManifestException('Unable to perform manifest schema validation: {0}'.format(oe))
+        try:
+            with open(cache_path, 'wb') as cache_file:
+                marshal.dump((schema_path, schema_mtime, schema), cache_file)
+        except (OSError, ValueError):
+            pass
+        return schema
 
     @staticmethod
-    def _validate_manifest(manifest_file, schema):
+    def _validate_manifest(manifest_file, validator):
         try:
             manifest_json = json.loads(manifest_file.read(),
                                        object_pairs_hook=SdkManifest._find_duplicate_json_keys)
-            error_str = SdkManifest._validate_with_schema(manifest_json, schema)
+            error_str = SdkManifest._validate_with_schema(manifest_json, validator)
             error_str += SdkManifest._validate_uuid(manifest_json)
             error_str += SdkManifest._validate_rest_methods(manifest_json)
             error_str += SdkManifest._validate_named_services(manifest_json)
@@ -81,9 +130,8 @@ class SdkManifest():
         return dict(list_of_pairs)
 
     @staticmethod
-    def _validate_with_schema(manifest_json, schema):
+    def _validate_with_schema(manifest_json, validator):
         error_str = ''
-        validator = jsonschema.Draft4Validator(json.loads(schema))
         schema_errors = sorted(validator.iter_errors(manifest_json), key=lambda e: e.path)
         if schema_errors:
             for error in schema_errors:
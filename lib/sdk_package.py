@@ -4,65 +4,144 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
+import collections
+import concurrent.futures
 import json
 import os
 import zipfile
 from sdk_baseimage import SdkBaseImage
-
-EXCLUDED_ROOT_DIRECTORIES = ['store', '.cache', '.git', '.gradle',
-                             '.pytest_cache', '.settings', 'qradar_appfw_venv']
-EXCLUDED_DIRECTORIES = ['__pycache__', '.idea']
-EXCLUDED_ROOT_FILE_PREFIXES = ('.git', '.py', '.sdkapp')
-EXCLUDED_ROOT_FILES = ['qenv.ini', '.project', '.qradar_app_uuid']
-EXCLUDED_FILES = ['.DS_Store']
-EXCLUDED_FILE_EXTENSIONS = ('.pyc')
+from sdk_compression import SdkCompressionPolicy
+from sdk_packagecache import SdkPackageCache
+from sdk_scanner import SdkWorkspaceScanner
+from sdk_zip import write_raw_entry
 
 WARNING_MANIFEST_IMAGE = 'WARNING: image "{0}" in manifest differs from SDK image "{1}"'
 
-def create_zip(workspace, zip_path):
+# Number of files per worker that may be compressed ahead of their turn to be written to the zip.
+PENDING_FILES_PER_WORKER = 4
+# Total size of the files whose compressed data may be held waiting for their turn.
+# Compressed data is never much larger than its file, so this bounds the memory held.
+MAX_PENDING_BYTES = 64 * 1024 * 1024
+# Larger files are compressed straight into the zip when their turn comes,
+# so that their compressed data is not held in memory.
+PARALLEL_MAX_FILE_SIZE = 16 * 1024 * 1024
+
+def create_zip(workspace, zip_path, incremental=False, workers=1, compression_policy=None, verbose=False):
+    ''' If incremental is True, files that are unchanged since the previous
+        incremental package of this workspace are copied into the new zip
+        in their already-compressed form.
+        If workers is greater than 1, files are compressed on that many threads.
+        The zip content and entry order are the same whatever the number of workers.
+        compression_policy decides which files are deflated and at what level.
+        It defaults to an SdkCompressionPolicy in auto mode.
+        Each entry added is printed only if verbose is True.
+    '''
+    if compression_policy is None:
+        compression_policy = SdkCompressionPolicy()
     zip_file_name = os.path.basename(zip_path)
     zip_full_dir_path = os.path.dirname(os.path.realpath(zip_path))
+    zip_full_path = os.path.join(zip_full_dir_path, zip_file_name)
     if not os.path.exists(zip_full_dir_path):
         os.makedirs(zip_full_dir_path)
     original_working_directory = os.getcwd()
     os.chdir(workspace.path)
-    EXCLUDED_FILES.append(zip_file_name)
-    workspace_paths = _retrieve_workspace_paths()
+    workspace_entries = SdkWorkspaceScanner(workspace.path, excluded_file_names=[zip_file_name]).scan()
     sdk_zip_warnings = ''
-    with zipfile.ZipFile(os.path.join(zip_full_dir_path, zip_file_name), 'w') as target_zip:
-        for path in workspace_paths:
-            sdk_zip_warnings = _add_path_to_zip(path, target_zip, workspace, sdk_zip_warnings)
-    os.chdir(original_working_directory)
+    package_cache = SdkPackageCache(workspace.path, compression_policy) if incremental else None
+    try:
+        if package_cache:
+            package_cache.open()
+        with zipfile.ZipFile(zip_full_path, 'w') as target_zip:
+            if workers > 1:
+                sdk_zip_warnings = _add_entries_to_zip_in_parallel(workspace_entries, target_zip, workspace,
+                                                                   compression_policy, package_cache, workers,
+                                                                   verbose)
+            else:
+                for entry in workspace_entries:
+                    sdk_zip_warnings = _add_entry_to_zip(entry, target_zip, workspace, sdk_zip_warnings,
+                                                         compression_policy, package_cache, verbose)
+        if package_cache:
+            package_cache.save(zip_full_path)
+            print('Reused {0} unchanged files from package cache'.format(package_cache.reused_count))
+    finally:
+        if package_cache:
+            package_cache.close()
+        os.chdir(original_working_directory)
+    print(compression_policy.report())
     print('Created package {0}'.format(zip_path))
     if sdk_zip_warnings:
         print(sdk_zip_warnings)
 
-def _retrieve_workspace_paths():
-    paths = _workspace_root_files()
-    for root_directory in _workspace_root_directories():
-        paths.append(root_directory)
-        for dir_path, dir_names, file_names in os.walk(root_directory):
-            for dir_name in dir_names:
-                if dir_name not in EXCLUDED_DIRECTORIES:
-                    paths.append(os.path.join(dir_path, dir_name))
-            for file_name in file_names:
-                if not _is_excluded_file(dir_path, file_name):
-                    paths.append(os.path.join(dir_path, file_name))
-    return paths
+def _add_entries_to_zip_in_parallel(entries, target_zip, workspace, compression_policy, package_cache, workers,
+                                    verbose):
+    ''' Files that need compressing are submitted to a thread pool as soon as the
+        scanner yields them, while entries are written to target_zip strictly in scan order.
+        Directories, manifest.json, files reused from package_cache and files larger
+        than PARALLEL_MAX_FILE_SIZE are handled by _add_entry_to_zip when their turn comes.
+    '''
+    sdk_zip_warnings = ''
+    pending = collections.deque()
+    pending_bytes = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for entry in entries:
+            future = None
+            file_size = 0
+            if (entry.path != 'manifest.json' and not entry.is_dir and
+                    entry.stat().st_size <= PARALLEL_MAX_FILE_SIZE and
+                    not (package_cache and package_cache.is_unchanged(entry.path, entry.stat()))):
+                future = executor.submit(compression_policy.compress_file, entry.path, package_cache is not None)
+                file_size = entry.stat().st_size
+            pending.append((entry, future, file_size))
+            pending_bytes += file_size
+            while len(pending) > workers * PENDING_FILES_PER_WORKER or pending_bytes > MAX_PENDING_BYTES:
+                pending_entry = pending.popleft()
+                pending_bytes -= pending_entry[2]
+                sdk_zip_warnings = _add_pending_entry_to_zip(pending_entry, target_zip, workspace,
+                                                             sdk_zip_warnings, compression_policy,
+                                                             package_cache, verbose)
+        while pending:
+            sdk_zip_warnings = _add_pending_entry_to_zip(pending.popleft(), target_zip, workspace,
+                                                         sdk_zip_warnings, compression_policy,
+                                                         package_cache, verbose)
+    return sdk_zip_warnings
 
-def _add_path_to_zip(path, target_zip, workspace, sdk_zip_warnings):
+def _add_pending_entry_to_zip(pending_entry, target_zip, workspace, sdk_zip_warnings,
+                              compression_policy, package_cache, verbose):
+    entry, future, _ = pending_entry
+    if future is None:
+        return _add_entry_to_zip(entry, target_zip, workspace, sdk_zip_warnings,
+                                 compression_policy, package_cache, verbose)
+    zinfo, compressed_data, digest = future.result()
+    _print_entry('Adding file', entry.path, verbose)
+    write_raw_entry(target_zip, zinfo, compressed_data, compression_policy.level)
+    if package_cache:
+        package_cache.record_file(entry.path, digest)
+    return sdk_zip_warnings
+
+def _add_entry_to_zip(entry, target_zip, workspace, sdk_zip_warnings, compression_policy, package_cache=None,
+                      verbose=False):
+    path = entry.path
     if path == 'manifest.json':
-        return _add_manifest_to_zip(target_zip, workspace, sdk_zip_warnings)
-    if os.path.isfile(path):
-        compression = zipfile.ZIP_DEFLATED
-        print('Adding file: {0}'.format(path))
+        return _add_manifest_to_zip(target_zip, workspace, sdk_zip_warnings, verbose)
+    if entry.is_dir:
+        _print_entry('Adding directory', path, verbose)
+        target_zip.write(path, compress_type=zipfile.ZIP_STORED)
+    elif package_cache:
+        if package_cache.add_file(path, target_zip, entry.stat()):
+            _print_entry('Reusing file', path, verbose)
+        else:
+            _print_entry('Adding file', path, verbose)
     else:
-        compression = zipfile.ZIP_STORED
-        print('Adding directory: {0}'.format(path))
-    target_zip.write(path, compress_type=compression)
+        _print_entry('Adding file', path, verbose)
+        compression_policy.add_file_to_zip(target_zip, path)
     return sdk_zip_warnings
 
-def _add_manifest_to_zip(target_zip, workspace, sdk_zip_warnings):
+def _print_entry(action, path, verbose):
+    # Printing every entry noticeably slows packaging of large workspaces.
+    if verbose:
+        print('{0}: {1}'.format(action, path))
+
+def _add_manifest_to_zip(target_zip, workspace, sdk_zip_warnings, verbose):
     manifest_json = workspace.manifest.json
     if 'dev_opts' in manifest_json:
         manifest_json.pop('dev_opts')
@@ -74,34 +153,7 @@ def _add_manifest_to_zip(target_zip, workspace, sdk_zip_warnings):
     else:
         print('No base image specified in manifest, adding {0}'.format(image_name))
         manifest_json.update({'image': image_name})
-    print('Adding file: manifest.json')
+    _print_entry('Adding file', 'manifest.json', verbose)
     target_zip.writestr('manifest.json', json.dumps(manifest_json),
                         compress_type=zipfile.ZIP_DEFLATED)
     return sdk_zip_warnings
-
-def _workspace_root_files():
-    return [entry for entry in os.listdir()
-            if _is_valid_workspace_root_file(entry)]
-
-def _is_valid_workspace_root_file(entry):
-    return (os.path.isfile(entry) and
-            entry not in EXCLUDED_ROOT_FILES and
-            not entry.startswith(EXCLUDED_ROOT_FILE_PREFIXES) and
-            not _is_excluded_file('.', entry))
-
-def _workspace_root_directories():
-    return [entry for entry in os.listdir()
-            if _is_valid_workspace_root_directory(entry)]
-
-def _is_valid_workspace_root_directory(entry):
-    return (os.path.isdir(entry) and
-            entry not in EXCLUDED_ROOT_DIRECTORIES and
-            entry not in EXCLUDED_DIRECTORIES)
-
-def _is_excluded_file(dir_path, file_name):
-    return (file_name in EXCLUDED_FILES or
-            file_name.endswith(EXCLUDED_FILE_EXTENSIONS) or
-            _path_contains_excluded_directory(dir_path))
-
-def _path_contains_excluded_directory(dir_path):
-    return [directory for directory in EXCLUDED_DIRECTORIES if directory in dir_path]
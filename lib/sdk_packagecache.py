@@ -0,0 +1,145 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import json
+import os
+import shutil
+import zipfile
+from sdk_zip import hash_file, seek_to_entry_data, write_raw_entry
+
+# Relative to the workspace root. .cache is never added to an app package.
+PACKAGE_CACHE_DIR = os.path.join('.cache', 'qapp_package')
+CACHE_INDEX_FILE = 'index.json'
+CACHE_ZIP_FILE = 'package.zip'
+CACHE_INDEX_VERSION = 2
+
+class SdkPackageCache():
+    ''' Keeps the most recent package built from a workspace, together with an index
+        recording the size, mtime and SHA-256 hash of every file it contains.
+        When a file is unchanged, its compressed bytes are copied from the cached
+        package into the new package without being decompressed or recompressed.
+        The cache is only used if it was built with the same compression settings.
+    '''
+    def __init__(self, workspace_path, compression_policy):
+        self.compression_policy = compression_policy
+        self.cache_dir = os.path.join(workspace_path, PACKAGE_CACHE_DIR)
+        self.index_path = os.path.join(self.cache_dir, CACHE_INDEX_FILE)
+        self.zip_path = os.path.join(self.cache_dir, CACHE_ZIP_FILE)
+        self.index = {}
+        self.new_index = {}
+        self.checked_files = {}
+        self.cache_zip = None
+        self.cache_file = None
+        self.reused_count = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        ''' Loads the index and cached package. If either is missing or unreadable,
+            the cache starts empty and every file is compressed afresh.
+        '''
+        try:
+            with open(self.index_path) as index_file:
+                index_json = json.load(index_file)
+            if (index_json.get('version') != CACHE_INDEX_VERSION or
+                    index_json.get('compression') != self.compression_policy.signature()):
+                return
+            self.cache_zip = zipfile.ZipFile(self.zip_path)
+            self.cache_file = open(self.zip_path, 'rb')
+            self.index = index_json['entries']
+        except (OSError, ValueError, KeyError, zipfile.BadZipfile):
+            self.close()
+            self.index = {}
+
+    def close(self):
+        if self.cache_zip:
+            self.cache_zip.close()
+            self.cache_zip = None
+        if self.cache_file:
+            self.cache_file.close()
+            self.cache_file = None
+
+    def is_unchanged(self, path, file_stat=None):
+        ''' Returns True if the cached package holds an entry for path
+            and the file has not changed since that entry was written.
+            A file is unchanged if its size and mtime match the index or,
+            when only the mtime differs, its SHA-256 hash matches.
+            file_stat may be supplied to avoid another stat of the file.
+        '''
+        if path in self.checked_files:
+            return self.checked_files[path][0]
+        if file_stat is None:
+            file_stat = os.stat(path)
+        cached_entry = self.index.get(path)
+        digest = None
+        unchanged = False
+        if cached_entry and cached_entry['size'] == file_stat.st_size and self._cached_info(path):
+            if cached_entry['mtime_ns'] != file_stat.st_mtime_ns:
+                digest = hash_file(path)
+            unchanged = digest is None or digest == cached_entry['sha256']
+        self.checked_files[path] = (unchanged, digest)
+        return unchanged
+
+    def add_file(self, path, target_zip, file_stat=None):
+        ''' Adds the file at path to target_zip, reusing the cached compressed entry
+            if the file is unchanged. Returns True if the cached entry was reused.
+        '''
+        if self.is_unchanged(path, file_stat):
+            self.add_cached_file(path, target_zip)
+            return True
+        self.compression_policy.add_file_to_zip(target_zip, path)
+        self.record_file(path)
+        return False
+
+    def add_cached_file(self, path, target_zip):
+        ''' Copies the cached entry for path into target_zip.
+            is_unchanged(path) must have returned True.
+        '''
+        cached_info = self._cached_info(path)
+        zinfo = zipfile.ZipInfo.from_file(path)
+        zinfo.compress_type = cached_info.compress_type
+        zinfo.CRC = cached_info.CRC
+        zinfo.compress_size = cached_info.compress_size
+        zinfo.file_size = cached_info.file_size
+        seek_to_entry_data(self.cache_file, cached_info)
+        write_raw_entry(target_zip, zinfo, self.cache_file, self.compression_policy.level)
+        self.record_file(path, self.index[path]['sha256'])
+        self.reused_count += 1
+
+    def record_file(self, path, digest=None):
+        ''' Records the current state of the file at path in the new index.
+            If digest is not supplied, it is taken from an earlier is_unchanged
+            check or calculated.
+        '''
+        if digest is None:
+            digest = self.checked_files.get(path, (False, None))[1] or hash_file(path)
+        file_stat = os.stat(path)
+        self.new_index[path] = {'size': file_stat.st_size,
+                                'mtime_ns': file_stat.st_mtime_ns,
+                                'sha256': digest}
+
+    def save(self, package_path):
+        ''' Stores package_path as the cached package and writes the new index. '''
+        self.close()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        shutil.copyfile(package_path, self.zip_path)
+        with open(self.index_path, 'w') as index_file:
+            json.dump({'version': CACHE_INDEX_VERSION,
+                       'compression': self.compression_policy.signature(),
+                       'entries': self.new_index}, index_file)
+
+    def _cached_info(self, path):
+        if not self.cache_zip:
+            return None
+        try:
+            return self.cache_zip.getinfo(zipfile.ZipInfo(path).filename)
+        except KeyError:
+            return None
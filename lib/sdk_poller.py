@@ -0,0 +1,54 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import random
+import time
+from sdk_exceptions import SdkPollTimeoutError
+
+class SdkPoller():
+    ''' Repeatedly calls a function until its result satisfies a condition.
+        The first checks are made quickly, then the delay between checks grows
+        exponentially up to max_delay. Each delay is reduced by a random amount
+        of up to jitter (a fraction of the delay) so that concurrent pollers
+        do not hit the server in lockstep.
+        If timeout seconds pass before the condition is met, SdkPollTimeoutError is raised.
+    '''
+
+    INITIAL_DELAY = 0.5
+    MAX_DELAY = 15
+    MULTIPLIER = 2
+    JITTER = 0.25
+    TIMEOUT = 3600
+
+    def __init__(self, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY,
+                 multiplier=MULTIPLIER, jitter=JITTER, timeout=TIMEOUT):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+
+    def delays(self):
+        ''' Generator yielding the successive delays between checks. '''
+        delay = self.initial_delay
+        while True:
+            yield delay * (1 - random.uniform(0, self.jitter))
+            delay = min(delay * self.multiplier, self.max_delay)
+
+    def poll(self, check_function, is_complete, description='operation'):
+        ''' Calls check_function until is_complete(result) returns True,
+            then returns that result.
+        '''
+        deadline = time.monotonic() + self.timeout
+        for delay in self.delays():
+            result = check_function()
+            if is_complete(result):
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SdkPollTimeoutError('Timed out after {0}s waiting for {1} to complete'
+                                          .format(self.timeout, description))
+            time.sleep(min(delay, remaining))
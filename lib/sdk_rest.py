@@ -4,15 +4,21 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
+import collections
+import concurrent.futures
 import json
 import os
-import sys
+import threading
 import time
 from packaging.version import Version, InvalidVersion
 from sdk_httpclient import SdkHttpClient
 from sdk_manifest import SdkManifest
+from sdk_poller import SdkPoller
+from sdk_progressbar import ProgressBar
+from sdk_upload import SdkUploadStream
 import sdk_util
-from sdk_exceptions import SdkApiResponseError, SdkQradarVersionError
+from sdk_exceptions import (SdkApiResponseError, SdkFatalError, SdkPollTimeoutError, SdkQradarVersionError,
+                            SdkServerSslError)
 
 ENDPOINT_QRADAR_VERSION = '/api/system/about?fields=external_version'
 QRADAR_MIN_VERSION_DEV_APPS = Version('7.5.0')
@@ -26,6 +32,8 @@ ENDPOINT_APPLICATION_INSTALL_AUTH = ENDPOINT_APPLICATION_INSTALL_STATUS + '/auth
 ENDPOINT_APPLICATION_CANCEL = ENDPOINT_APPLICATION_INSTALL_STATUS + '?status=CANCELLED'
 ENDPOINT_USERS_WITH_CAPABILITIES = '/api/config/access/users_with_capability_filter?capabilities={0}'
 ENDPOINT_APPLICATION_GET_DEFN_ID = ENDPOINT_APPLICATION + '?fields=application_definition_id'
+ENDPOINT_APPLICATIONS_GET_UUID_INDEX = (ENDPOINT_APPLICATIONS +
+                                        '?fields=manifest(uuid),application_state(application_id,status)')
 ENDPOINT_DEFINITIONS = QRADAR_API_ROOT + '/application_definitions'
 ENDPOINT_DEFINITION = ENDPOINT_DEFINITIONS + '/{0}'
 DEVELOPER_APPS = '/developer/applications'
@@ -40,9 +48,16 @@ STATUS_UPGRADING = 'UPGRADING'
 STATUS_AUTH_REQUIRED = 'AUTH_REQUIRED'
 STATUS_RUNNING = 'RUNNING'
 STATUS_ERROR = 'ERROR'
+STATUSES_IN_PROGRESS = (STATUS_CREATING, STATUS_UPGRADING)
 
 QRADAR_REST_FRAMEWORK_MISSING_ENDPOINT_CODE = 4
 
+# Number of seconds for which the uuid to application index is reused.
+APP_INDEX_TTL = 60
+
+# Number of seconds for which cancel_install waits for the install task to stop.
+CANCEL_POLL_TIMEOUT = 30
+
 MSG_DEV_APPS_UNSUPPORTED_QRADAR_VERSION = ('QRadar server {0} is at version {1}\nDevelopment apps '
                                            'are supported only in version 7.5.0 or later')
 MSG_PREREGISTER_SUCCESS = 'App in workspace [{0}] successfully preregistered on server {1}'
@@ -52,9 +67,23 @@ MSG_UPDATE_REGISTER_SUCCESS = ('Registration of app in workspace [{0}] successfu
                                'to serve requests from {2} on these ports: {3}')
 MSG_DEREGISTER_SUCCESS = 'App in workspace [{0}] successfully deregistered on server {1}'
 
+# Outcome of deploying one app package. error is None unless the deploy raised an error.
+DeployResult = collections.namedtuple('DeployResult', ['package', 'app_id', 'status', 'error', 'seconds'])
+
 class SdkRestClient():
-    def __init__(self, qradar_console, username):
-        self.http_client = SdkHttpClient.create_certified_client(qradar_console, username)
+    def __init__(self, qradar_console, username, pool_size=SdkHttpClient.POOL_SIZE):
+        self.http_client = SdkHttpClient.create_certified_client(qradar_console, username, pool_size)
+        self.poller = SdkPoller()
+        self.cancel_poller = SdkPoller(timeout=CANCEL_POLL_TIMEOUT)
+        # When False, upload progress bars and authorization user prompts are suppressed.
+        # Used when several deploys share this client concurrently.
+        self.interactive = True
+        self._app_index = None
+        self._app_index_time = 0
+        self._app_index_lock = threading.Lock()
+
+    def close(self):
+        self.http_client.close()
 
     def retrieve_qradar_version(self):
         response = self.http_client.get(ENDPOINT_QRADAR_VERSION, HEADERS_JSON)
@@ -123,11 +152,11 @@ class SdkRestClient():
         app_status = app_json['application_state']['status']
 
         # See if we can get some extra status info
-        if app_status in (STATUS_CREATING, STATUS_UPGRADING):
+        if app_status in STATUSES_IN_PROGRESS:
             response = self.http_client.get(ENDPOINT_APPLICATION_INSTALL_STATUS.format(app_id),
                                             HEADERS_JSON)
             task_status = response.json()['status']
-            if task_status not in (STATUS_CREATING, STATUS_UPGRADING):
+            if task_status not in STATUSES_IN_PROGRESS:
                 app_status = app_status + ':' + task_status
 
         print(app_id + ':' + app_status)
@@ -144,33 +173,99 @@ class SdkRestClient():
             pass
         return has_errors
 
-    def deploy_app(self, package_path, auth_user_name, upload_timeout):
+    def deploy_app(self, package_path, auth_user_name, upload_timeout=None):
+        ''' Returns a DeployResult whose status is the final application status,
+            or AUTH_REQUIRED if the deploy is waiting for authorization.
+            If upload_timeout is None, the client's current upload timeout is used.
+        '''
+        start_time = time.monotonic()
         app_uuid = SdkManifest.extract_uuid_from_zip_manifest(package_path)
         app_id = self._get_app_id_for_uuid(app_uuid)
-        zip_in_memory = sdk_util.load_zip_into_memory(package_path)
-        self.http_client.set_upload_timeout(upload_timeout)
+        if upload_timeout is not None:
+            self.http_client.set_upload_timeout(upload_timeout)
         if app_id is None:
-            self._new_install(package_path, auth_user_name, zip_in_memory)
+            app_id, status = self._new_install(package_path, auth_user_name)
         else:
-            self._upgrade_install(package_path, app_id, auth_user_name, zip_in_memory)
+            status = self._upgrade_install(package_path, app_id, auth_user_name)
+        return DeployResult(package_path, app_id, status, None, time.monotonic() - start_time)
+
+    def deploy_apps(self, package_paths, auth_user_name, upload_timeout, max_workers):
+        ''' Deploys several app packages concurrently using up to max_workers threads.
+            The packages share this client, and so its connection pool and credentials.
+            Returns a list of DeployResult in the same order as package_paths.
+            An error deploying one package does not stop the others, except for
+            SdkServerSslError, which every deploy would hit: the packages not yet
+            started are cancelled and the error is raised once.
+        '''
+        self.http_client.set_upload_timeout(upload_timeout)
+
+        def deploy_package(package_path):
+            start_time = time.monotonic()
+            try:
+                return self.deploy_app(package_path, auth_user_name)
+            except (KeyError, ValueError, OSError, SdkFatalError) as err:
+                print('{0}: {1}'.format(package_path, sdk_util.strip_errno_prefix(str(err))))
+                return DeployResult(package_path, None, STATUS_ERROR, err, time.monotonic() - start_time)
+
+        interactive = self.interactive
+        self.interactive = False
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(deploy_package, package_path) for package_path in package_paths]
+                # deploy_package returns a result for every error apart from SdkServerSslError.
+                concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+                for future in futures:
+                    if future.done() and isinstance(future.exception(), SdkServerSslError):
+                        for pending_future in futures:
+                            pending_future.cancel()
+                        raise future.exception()
+                return [future.result() for future in futures]
+        finally:
+            self.interactive = interactive
 
     def _get_app_id_for_uuid(self, app_uuid):
-        response = self.http_client.get(ENDPOINT_APPLICATIONS, HEADERS_JSON)
-        response_json = response.json()
-        for app in response_json:
-            if 'uuid' in app["manifest"]:
-                if app["manifest"]["uuid"] == app_uuid:
-                    if app["application_state"]["status"] == "ERROR":
-                        return None
-                    return app["application_state"]["application_id"]
-        return None
+        try:
+            app_id, app_status = self._retrieve_app_index()[app_uuid]
+        except KeyError:
+            return None
+        if app_status == STATUS_ERROR:
+            return None
+        return app_id
+
+    def _retrieve_app_index(self):
+        ''' Returns a dict mapping app uuid to an (application_id, status) tuple.
+            Only those fields are requested from the server, and the index is reused
+            for APP_INDEX_TTL seconds, so concurrent deploys share one listing call.
+        '''
+        with self._app_index_lock:
+            if self._app_index is None or time.monotonic() - self._app_index_time > APP_INDEX_TTL:
+                response = self.http_client.get(ENDPOINT_APPLICATIONS_GET_UUID_INDEX, HEADERS_JSON)
+                app_index = {}
+                for app in response.json():
+                    if 'uuid' in app['manifest']:
+                        app_state = app['application_state']
+                        app_index.setdefault(app['manifest']['uuid'],
+                                             (app_state['application_id'], app_state['status']))
+                self._app_index = app_index
+                self._app_index_time = time.monotonic()
+            return self._app_index
 
     def authorize_app(self, app_id, auth_user_name):
-        self._handle_auth_request(str(app_id), auth_user_name)
+        ''' Returns the final application status, or AUTH_REQUIRED
+            if no authorization user was selected.
+        '''
+        return self._handle_auth_request(str(app_id), auth_user_name)
 
     def cancel_install(self, app_id):
         self.http_client.post(ENDPOINT_APPLICATION_CANCEL.format(app_id), HEADERS_JSON)
         print("Cancel request accepted for application {0}".format(str(app_id)))
+        try:
+            task_status = self._poll_install_task_status(app_id, poller=self.cancel_poller)
+        except SdkPollTimeoutError:
+            print("Application {0}: install task has not stopped after {1}s, "
+                  "use qapp status to check it later".format(app_id, CANCEL_POLL_TIMEOUT))
+            return
+        print("Application {}: {}".format(app_id, task_status))
 
     def delete_app(self, app_id):
         response = self.http_client.get(ENDPOINT_APPLICATION_GET_DEFN_ID.format(app_id),
@@ -180,31 +275,39 @@ class SdkRestClient():
         self.http_client.delete(ENDPOINT_DEFINITION.format(app_definition_id))
         print('Application {0} has been deleted'.format(str(app_id)))
 
-    def _new_install(self, package_path, auth_user_name, zip_in_memory):
+    def _new_install(self, package_path, auth_user_name):
         print("Application fresh install detected")
         print("Uploading {} {} bytes".format(package_path, os.path.getsize(package_path)))
-        response = self.http_client.post(ENDPOINT_APPLICATION_INSTALL, HEADERS_ZIP,
-                                         request_package=zip_in_memory.read())
+        with ProgressBar(ascii=True, unit='b', unit_scale=True,
+                         disable=not self.interactive) as progress_bar:
+            response = self.http_client.post(ENDPOINT_APPLICATION_INSTALL, HEADERS_ZIP,
+                                             request_package=SdkUploadStream(package_path,
+                                                                             progress_bar.progress))
         task_json = response.json()
         app_id = task_json['application_id']
         print("Installing application {}".format(app_id))
-        self._finish_install(task_json, app_id, auth_user_name, expected_status=STATUS_CREATING)
+        return app_id, self._finish_install(task_json, app_id, auth_user_name,
+                                            expected_status=STATUS_CREATING)
 
-    def _upgrade_install(self, package_path, app_id, auth_user_name, zip_in_memory):
+    def _upgrade_install(self, package_path, app_id, auth_user_name):
         print("Application upgrade detected")
         print("Uploading {} {} bytes".format(package_path, os.path.getsize(package_path)))
-        response = self.http_client.put(ENDPOINT_APPLICATION.format(app_id), HEADERS_ZIP,
-                                        request_package=zip_in_memory.read())
+        with ProgressBar(ascii=True, unit='b', unit_scale=True,
+                         disable=not self.interactive) as progress_bar:
+            response = self.http_client.put(ENDPOINT_APPLICATION.format(app_id), HEADERS_ZIP,
+                                            request_package=SdkUploadStream(package_path,
+                                                                            progress_bar.progress))
         task_json = response.json()
-        self._finish_install(task_json, app_id, auth_user_name, expected_status=STATUS_UPGRADING)
+        return self._finish_install(task_json, app_id, auth_user_name, expected_status=STATUS_UPGRADING)
 
     def _finish_install(self, task_json, app_id, auth_user_name, expected_status):
         task_status = task_json['status']
         print("Application {}: {}".format(app_id, task_status))
         if task_status == expected_status:
-            self._wait_for_deploy_end(app_id)
-        elif task_status == STATUS_AUTH_REQUIRED:
-            self._handle_auth_request(str(app_id), auth_user_name)
+            return self._wait_for_deploy_end(app_id)
+        if task_status == STATUS_AUTH_REQUIRED:
+            return self._handle_auth_request(str(app_id), auth_user_name)
+        return task_status
 
     def _handle_auth_request(self, app_id, auth_user_name):
         capable_users = self._retrieve_capable_users(app_id)
@@ -212,13 +315,13 @@ class SdkRestClient():
             auth_user_id = self._retrieve_auth_user_id(auth_user_name, capable_users)
         except ValueError:
             print('Deployment of application {0} is waiting for authorization'.format(app_id))
-            return
+            return STATUS_AUTH_REQUIRED
 
         auth_body = {}
         auth_body['user_id'] = auth_user_id
         self.http_client.post(ENDPOINT_APPLICATION_INSTALL_AUTH.format(app_id), HEADERS_JSON,
                               request_json=auth_body)
-        self._wait_for_deploy_end(app_id)
+        return self._wait_for_deploy_end(app_id)
 
     def _retrieve_capable_users(self, app_id):
         # What capabilities is the app requesting?
@@ -238,6 +341,9 @@ class SdkRestClient():
         if auth_user_id != 0:
             return auth_user_id
 
+        if not self.interactive:
+            raise ValueError
+
         # The caller must choose an authorization user from the list.
         print('These users have the requested capabilities:')
         for capable_user in capable_users:
@@ -280,19 +386,14 @@ class SdkRestClient():
         return 0
 
     def _wait_for_deploy_end(self, app_id):
+        ''' Returns the final application status, which is ERROR if
+            the application reported any error messages.
+        '''
         # Loop over the application_creation_endpoint until the deploy finishes.
         # Note that any error message is not committed to the installed_application table
         # until the very end of the deployment, so there is no point in trying to print
         # error details inside this loop.
-        task_status = STATUS_CREATING
-        while task_status in (STATUS_CREATING, STATUS_UPGRADING):
-            task_response = self.http_client.get(ENDPOINT_APPLICATION_INSTALL_STATUS.format(app_id),
-                                                 HEADERS_JSON)
-            task_json = task_response.json()
-            task_status = task_json['status']
-            print("Application {}: {}".format(app_id, task_status))
-            if task_status in (STATUS_CREATING, STATUS_UPGRADING):
-                time.sleep(5)
+        self._poll_install_task_status(app_id, print_status=True)
 
         # Now call the applications endpoint to get the final status of the deployment.
         app_response = self.http_client.get(ENDPOINT_APPLICATION.format(app_id), HEADERS_JSON)
@@ -307,5 +408,27 @@ class SdkRestClient():
         print("Final application state: {}{}".format(app_final_status, additional_app_details))
         has_errors = self._display_app_json_errors(app_json)
 
-        if app_final_status == STATUS_ERROR or has_errors:
-            sys.exit(1)
+        if has_errors:
+            return STATUS_ERROR
+        return app_final_status
+
+    def _poll_install_task_status(self, app_id, print_status=False, poller=None):
+        ''' Polls the application_creation_task endpoint until the task is no longer
+            creating or upgrading, then returns the final task status.
+            If print_status is True, each change of status is printed.
+            poller defaults to self.poller.
+        '''
+        printed_statuses = []
+
+        def retrieve_task_status():
+            task_response = self.http_client.get(ENDPOINT_APPLICATION_INSTALL_STATUS.format(app_id),
+                                                 HEADERS_JSON)
+            task_status = task_response.json()['status']
+            if print_status and printed_statuses[-1:] != [task_status]:
+                print("Application {}: {}".format(app_id, task_status))
+                printed_statuses.append(task_status)
+            return task_status
+
+        return (poller or self.poller).poll(retrieve_task_status,
+                                            lambda task_status: task_status not in STATUSES_IN_PROGRESS,
+                                            'application {0} install task'.format(app_id))
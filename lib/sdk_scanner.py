@@ -0,0 +1,165 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import re
+
+# Workspace entries that are never added to an app package.
+EXCLUDED_ROOT_DIRECTORIES = frozenset(['store', '.cache', '.git', '.gradle',
+                                       '.pytest_cache', '.settings', 'qradar_appfw_venv'])
+EXCLUDED_DIRECTORIES = frozenset(['__pycache__', '.idea'])
+EXCLUDED_ROOT_FILE_PREFIXES = ('.git', '.py', '.sdkapp')
+EXCLUDED_ROOT_FILES = frozenset(['qenv.ini', '.project', '.qradar_app_uuid', '.qappignore'])
+EXCLUDED_FILES = frozenset(['.DS_Store'])
+EXCLUDED_FILE_EXTENSIONS = ('.pyc',)
+
+QAPPIGNORE_FILE = '.qappignore'
+
+class ScanEntry():
+    ''' A file or directory found by SdkWorkspaceScanner.
+        path is relative to the scanned root directory.
+        stat() results are cached, so each entry is stat'ed at most once.
+    '''
+    __slots__ = ['path', 'is_dir', 'dir_entry']
+
+    def __init__(self, path, is_dir, dir_entry):
+        self.path = path
+        self.is_dir = is_dir
+        self.dir_entry = dir_entry
+
+    def stat(self):
+        return self.dir_entry.stat()
+
+class SdkIgnorePatterns():
+    ''' A set of gitignore-style patterns, compiled into regular expressions once.
+        Supported syntax: blank lines and # comments, the wildcards * ? [...] and **,
+        a leading / to anchor a pattern to the scanned root directory,
+        and a trailing / to match directories only.
+        A pattern containing no other / matches a name at any depth.
+        Negation with ! is not supported.
+    '''
+    def __init__(self, patterns):
+        anchored = {False: [], True: []}
+        unanchored = {False: [], True: []}
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            dirs_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if '/' in pattern:
+                anchored[dirs_only].append(self._translate(pattern.lstrip('/')))
+            else:
+                unanchored[dirs_only].append(self._translate(pattern))
+        self.anchored_any = self._compile(anchored[False])
+        self.anchored_dirs = self._compile(anchored[True])
+        self.unanchored_any = self._compile(unanchored[False])
+        self.unanchored_dirs = self._compile(unanchored[True])
+
+    @classmethod
+    def from_file(cls, ignore_file_path):
+        try:
+            with open(ignore_file_path) as ignore_file:
+                return cls(ignore_file.read().splitlines())
+        except FileNotFoundError:
+            return cls([])
+
+    def matches(self, relative_path, name, is_dir):
+        ''' relative_path must use / as its separator. '''
+        for regex, subject in ((self.anchored_any, relative_path), (self.unanchored_any, name)):
+            if regex and regex.match(subject):
+                return True
+        if is_dir:
+            for regex, subject in ((self.anchored_dirs, relative_path), (self.unanchored_dirs, name)):
+                if regex and regex.match(subject):
+                    return True
+        return False
+
+    @staticmethod
+    def _compile(regex_strings):
+        if not regex_strings:
+            return None
+        return re.compile('(?:' + '|'.join(regex_strings) + r')\Z')
+
+    @staticmethod
+    def _translate(pattern):
+        regex = ''
+        index = 0
+        while index < len(pattern):
+            char = pattern[index]
+            if pattern.startswith('**/', index):
+                regex += '(?:.*/)?'
+                index += 3
+                continue
+            if pattern.startswith('**', index):
+                regex += '.*'
+                index += 2
+                continue
+            if char == '*':
+                regex += '[^/]*'
+            elif char == '?':
+                regex += '[^/]'
+            elif char == '[' and ']' in pattern[index + 1:]:
+                end = pattern.index(']', index + 1)
+                char_class = pattern[index + 1:end]
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+                regex += '[' + char_class.replace('\\', '\\\\') + ']'
+                index = end
+            else:
+                regex += re.escape(char)
+            index += 1
+        return regex
+
+class SdkWorkspaceScanner():
+    ''' Walks a directory tree in a single pass using os.scandir, yielding ScanEntry
+        objects lazily in a stable order: at each level, files sorted by name,
+        then each directory followed by its contents.
+        Excluded directories are pruned, so their contents are never read.
+        With workspace_rules=True, the SDK's EXCLUDED_* rules are applied.
+        Patterns in a .qappignore file at the root are always applied.
+    '''
+    def __init__(self, root_path, excluded_file_names=(), workspace_rules=True):
+        self.root_path = root_path
+        self.workspace_rules = workspace_rules
+        self.excluded_files = EXCLUDED_FILES.union(excluded_file_names)
+        self.ignore_patterns = SdkIgnorePatterns.from_file(os.path.join(root_path, QAPPIGNORE_FILE))
+
+    def scan(self):
+        return self._scan_directory('')
+
+    def _scan_directory(self, relative_dir):
+        with os.scandir(os.path.join(self.root_path, relative_dir)) as dir_entries:
+            dir_entries = sorted(dir_entries, key=lambda dir_entry: dir_entry.name)
+        at_root = relative_dir == ''
+        subdirectories = []
+        for dir_entry in dir_entries:
+            path = os.path.join(relative_dir, dir_entry.name)
+            if dir_entry.is_dir():
+                if not self._is_excluded_directory(path, dir_entry.name, at_root):
+                    subdirectories.append(ScanEntry(path, True, dir_entry))
+            elif dir_entry.is_file():
+                if not self._is_excluded_file(path, dir_entry.name, at_root):
+                    yield ScanEntry(path, False, dir_entry)
+        for subdirectory in subdirectories:
+            yield subdirectory
+            # Like os.walk, do not descend into symbolic links to directories.
+            if not subdirectory.dir_entry.is_symlink():
+                yield from self._scan_directory(subdirectory.path)
+
+    def _is_excluded_directory(self, path, name, at_root):
+        if self.workspace_rules:
+            if name in EXCLUDED_DIRECTORIES or (at_root and name in EXCLUDED_ROOT_DIRECTORIES):
+                return True
+        return self.ignore_patterns.matches(path.replace(os.sep, '/'), name, True)
+
+    def _is_excluded_file(self, path, name, at_root):
+        if self.workspace_rules:
+            if name in self.excluded_files or name.endswith(EXCLUDED_FILE_EXTENSIONS):
+                return True
+            if at_root and (name in EXCLUDED_ROOT_FILES or name.startswith(EXCLUDED_ROOT_FILE_PREFIXES)):
+                return True
+        return self.ignore_patterns.matches(path.replace(os.sep, '/'), name, False)
@@ -4,9 +4,6 @@
 # US Government Users Restricted Rights - Use, duplication or
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
-import os
-import sdk_util
-
 PROGRAM_ATTRIBUTES = ['command',
                       'process_name',
                       'numprocs',
@@ -41,12 +38,19 @@ PROGRAM_ATTRIBUTES = ['command',
                       'serverurl']
 
 PROGRAM_TEMPLATE = '\n[program:{0}]\n'
-DEFAULT_PROGRAM_SETTINGS = {'user': 'appuser', 'autorestart': 'true'}
+# Supervisor rotates program logs by size. Rotated segments are compressed
+# by log_rotator.py in the container. A service in the manifest can override these.
+DEFAULT_PROGRAM_SETTINGS = {'user': 'appuser', 'autorestart': 'true',
+                            'stdout_logfile_maxbytes': '10MB', 'stdout_logfile_backups': '5',
+                            'stderr_logfile_maxbytes': '10MB', 'stderr_logfile_backups': '5'}
 
-def prepare_supervisord_conf(manifest, build_root_path):
+def generate_supervisord_conf(manifest, supervisord_template_path):
+    ''' Returns the content of the template at supervisord_template_path
+        with the placeholder replaced by the programs for the manifest.
+    '''
     programs = generate_programs(manifest)
-    supervisord_conf_path = os.path.join(build_root_path, 'init', 'supervisord.conf')
-    sdk_util.replace_string_in_file(supervisord_conf_path, 'PROGRAM-PLACE-HOLDER', programs)
+    with open(supervisord_template_path) as template_file:
+        return template_file.read().replace('PROGRAM-PLACE-HOLDER', programs)
 
 def generate_programs(manifest):
     programs = ''
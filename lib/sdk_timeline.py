@@ -0,0 +1,80 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import collections
+import json
+import os
+from sdk_exceptions import SdkWorkspaceError
+
+# Written by the container's start.sh and startup_probe.py, relative to the workspace root.
+TIMELINE_PATH = os.path.join('store', 'log', 'startup_timeline.jsonl')
+BAR_WIDTH = 40
+NAME_WIDTH = 40
+
+# end is None for a step which had not finished when the timeline was last written.
+TimelineSpan = collections.namedtuple('TimelineSpan', 'phase name start end status')
+
+class SdkStartupTimeline():
+    ''' The startup timeline of an app container, read from the workspace's store/log
+        directory, which is bind-mounted into the container.
+        Each line is a JSON object with a mono timestamp taken from /proc/uptime,
+        an event of start or end, a phase and a name, and for end events an exit status.
+    '''
+    def __init__(self, workspace_path):
+        self.path = os.path.join(workspace_path, TIMELINE_PATH)
+        if not os.path.isfile(self.path):
+            raise SdkWorkspaceError('No startup timeline found at {0}. '
+                                    'Run the app with qapp run to create one.'.format(self.path))
+        self.spans = self._read_spans()
+
+    def _read_spans(self):
+        spans = []
+        open_spans = collections.defaultdict(collections.deque)
+        with open(self.path) as timeline_file:
+            for line in timeline_file:
+                try:
+                    event = json.loads(line)
+                    mono = float(event['mono'])
+                    key = (event['phase'], event['name'])
+                except (ValueError, KeyError, TypeError):
+                    # The container may be writing a line as it is read.
+                    continue
+                if event.get('event') == 'start':
+                    span = [event['phase'], event['name'], mono, None, None]
+                    spans.append(span)
+                    open_spans[key].append(span)
+                elif open_spans[key]:
+                    span = open_spans[key].popleft()
+                    span[3] = mono
+                    span[4] = event.get('status', 0)
+        return [TimelineSpan(*span) for span in spans]
+
+    def print_waterfall(self):
+        if not self.spans:
+            print('Startup timeline {0} is empty'.format(self.path))
+            return
+        origin = min(span.start for span in self.spans)
+        latest = max(max(span.start, span.end or span.start) for span in self.spans)
+        total = latest - origin
+        scale = BAR_WIDTH / total if total > 0 else 0
+        print('{0:<11}{1:<{width}}{2:>8}{3:>9}'.format('Phase', 'Name', 'Start', 'Duration',
+                                                       width=NAME_WIDTH))
+        for span in self.spans:
+            end = latest if span.end is None else span.end
+            offset = span.start - origin
+            duration = end - span.start
+            bar_start = min(int(offset * scale), BAR_WIDTH - 1)
+            bar = ' ' * bar_start + '#' * max(1, int(round(duration * scale)))
+            notes = []
+            if span.end is None:
+                notes.append('unfinished')
+            elif span.status:
+                notes.append('status {0}'.format(span.status))
+            name = span.name if len(span.name) <= NAME_WIDTH - 2 else span.name[:NAME_WIDTH - 5] + '...'
+            print('{0:<11}{1:<{width}}{2:>7.2f}s{3:>8.2f}s  |{4:<{bar_width}}| {5}'
+                  .format(span.phase, name, offset, duration, bar[:BAR_WIDTH], ', '.join(notes),
+                          width=NAME_WIDTH, bar_width=BAR_WIDTH).rstrip())
+        print('Total startup time: {0:.2f}s'.format(total))
@@ -0,0 +1,37 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+
+class SdkUploadStream():
+    ''' Streams a file from disk in fixed-size chunks for use as a requests payload.
+        Because the object has a length, requests sends a Content-Length header
+        rather than using chunked transfer encoding. Only one chunk is held
+        in memory at a time, however large the file is.
+    '''
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, file_path, progress_callback=None, chunk_size=CHUNK_SIZE):
+        self.file_path = file_path
+        self.size = os.path.getsize(file_path)
+        self.progress_callback = progress_callback
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        bytes_sent = 0
+        with open(self.file_path, 'rb') as upload_file:
+            while True:
+                chunk = upload_file.read(self.chunk_size)
+                if not chunk:
+                    break
+                bytes_sent += len(chunk)
+                if self.progress_callback:
+                    self.progress_callback(bytes_sent, self.size)
+                yield chunk
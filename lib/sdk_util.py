@@ -5,7 +5,6 @@
 # disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
 
 import getpass
-import io
 import os
 import re
 import shutil
@@ -91,13 +90,6 @@ def replace_string_in_file(file_path, target_string, replacement):
     with open(file_path, 'w') as _:
         _.write(modified_content)
 
-def load_zip_into_memory(zip_path):
-    with open(zip_path, 'rb') as app_zip:
-        in_memory_file = io.BytesIO()
-        in_memory_file.write(app_zip.read())
-        in_memory_file.seek(0)
-        return in_memory_file
-
 def is_os_linux():
     return platform.startswith('linux')
 
@@ -0,0 +1,136 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import hashlib
+import json
+from sdk_exceptions import SdkContainerError, SdkDockerError, SdkPollTimeoutError
+from sdk_poller import SdkPoller
+
+# Container label holding the fingerprint of the image and settings a warm container was started with.
+LABEL_WARM_POOL = 'com.ibm.si.app.sdk.warm-pool'
+WARM_CONTAINER_NAME_FORMAT = '{0}-warm-{1}'
+# supervisorctl status exits with 0 once every Supervisor program is running.
+READY_CHECK_COMMAND = ['supervisorctl', 'status']
+READY_TIMEOUT = 300
+# Warm containers run their whole startup chain against the workspace's store,
+# so only one may be started, and only while no app container is using the store.
+MAX_POOL_SIZE = 1
+
+class SdkWarmPool():
+    ''' Keeps containers for a workspace's app started and then paused, so that
+        qapp run can unpause one instead of waiting for a new container to start.
+        Docker cannot add mounts or environment variables to an existing container,
+        so a warm container is started with the settings qapp run would use.
+        A fingerprint of those settings and the image ID is stored as a label,
+        and only a container with a matching fingerprint is used.
+        Docker also cannot add the store mount when a container is claimed, so a warm
+        container mounts the workspace's store directory from the start, and runs
+        container/run commands, log collection and rotation against it.
+        For that reason the pool holds at most MAX_POOL_SIZE containers, and it is
+        not filled while the app container exists. qapp run without --warm empties it.
+    '''
+    def __init__(self, docker, workspace, container_name):
+        self.docker = docker
+        self.workspace = workspace
+        self.container_name = container_name
+        self.name_prefix = WARM_CONTAINER_NAME_FORMAT.format(container_name, '')
+
+    def fingerprint(self, run_settings):
+        image = self.docker.retrieve_image(self.workspace.image_name)
+        if image is None:
+            raise SdkDockerError('No image found for workspace [{0}]'.format(self.workspace.name))
+        settings_json = json.dumps([image.id, run_settings._asdict()], sort_keys=True, default=str)
+        return hashlib.sha256(settings_json.encode()).hexdigest()
+
+    def claim(self, run_settings):
+        ''' Returns a warm container started with run_settings, renamed to the app container name
+            and unpaused, or None if the pool has no such container.
+        '''
+        matching_containers = self._retrieve_matching_containers(self.fingerprint(run_settings))
+        for container in matching_containers:
+            try:
+                self.docker.rename_container(container, self.container_name)
+                if container.status == 'paused':
+                    self.docker.unpause_container(container)
+            except SdkContainerError:
+                # Removed since it was listed, e.g. because it stopped.
+                continue
+            container.reload()
+            print('Using warm container {0}'.format(container.short_id))
+            return container
+        print('No warm container is available for these settings')
+        return None
+
+    def fill(self, run_settings, size):
+        ''' Starts containers until the pool holds size containers for run_settings,
+            waits for each to finish starting up, then pauses it.
+        '''
+        if size > MAX_POOL_SIZE:
+            raise SdkContainerError('The warm pool can hold at most {0} container'.format(MAX_POOL_SIZE))
+        try:
+            self.docker.retrieve_container(self.container_name)
+        except SdkContainerError:
+            pass
+        else:
+            raise SdkContainerError('Container [{0}] is using the store of workspace [{1}]. '
+                                    'Remove it with qapp clean before starting a warm container'
+                                    .format(self.container_name, self.workspace.name))
+        fingerprint = self.fingerprint(run_settings)
+        warm_containers = self._retrieve_matching_containers(fingerprint)
+        used_names = set(container.name for container in warm_containers)
+        new_containers = []
+        index = 0
+        while len(warm_containers) + len(new_containers) < size:
+            index += 1
+            container_name = WARM_CONTAINER_NAME_FORMAT.format(self.container_name, index)
+            if container_name in used_names:
+                continue
+            print('Starting warm container [{0}]'.format(container_name))
+            new_containers.append(self.docker.run(
+                self.workspace.image_name, container_name, run_settings.mounts, run_settings.env_vars,
+                run_settings.port_mappings, run_settings.memory_limit, False,
+                labels={LABEL_WARM_POOL: fingerprint}))
+        for container in new_containers:
+            self._pause_when_ready(container)
+        print('Warm pool for workspace [{0}] holds {1} containers'
+              .format(self.workspace.name, len(warm_containers) + len(new_containers)))
+
+    def empty(self):
+        for container in self.docker.retrieve_containers_with_label(LABEL_WARM_POOL, self.name_prefix):
+            self._remove(container)
+
+    def _retrieve_matching_containers(self, fingerprint):
+        ''' Returns the warm containers started with fingerprint.
+            Any started with different settings or an older image are removed.
+        '''
+        matching_containers = []
+        for container in self.docker.retrieve_containers_with_label(LABEL_WARM_POOL, self.name_prefix):
+            if container.labels.get(LABEL_WARM_POOL) == fingerprint and container.status in ('running', 'paused'):
+                matching_containers.append(container)
+            else:
+                self._remove(container)
+        return matching_containers
+
+    def _pause_when_ready(self, container):
+        print('Waiting for warm container [{0}] to start'.format(container.name))
+        try:
+            SdkPoller(max_delay=2, timeout=READY_TIMEOUT).poll(
+                lambda: self.docker.execute_in_container(container, READY_CHECK_COMMAND)[0],
+                lambda exit_code: exit_code == 0, 'container {0} startup'.format(container.name))
+        except SdkPollTimeoutError as timeout_error:
+            print('{0}, leaving it running'.format(timeout_error))
+            return
+        self.docker.pause_container(container)
+        print('Warm container [{0}] is ready and paused'.format(container.name))
+
+    def _remove(self, container):
+        print('Removing warm container [{0}]'.format(container.name))
+        try:
+            if container.status == 'paused':
+                self.docker.unpause_container(container)
+            self.docker.remove_container(container)
+        except SdkContainerError:
+            pass
@@ -0,0 +1,207 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from sdk_scanner import EXCLUDED_DIRECTORIES, EXCLUDED_FILE_EXTENSIONS, QAPPIGNORE_FILE, SdkIgnorePatterns
+
+# Changes arriving within this many seconds of each other are reported together,
+# so that saving several files, or an editor's write-and-rename, is one change.
+SETTLE_SECONDS = 0.5
+POLL_INTERVAL_SECONDS = 1.0
+
+# From <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER_FORMAT = 'iIII'
+EVENT_HEADER_SIZE = struct.calcsize(EVENT_HEADER_FORMAT)
+READ_BUFFER_SIZE = 64 * 1024
+
+def create_watcher(root_path, watched_paths):
+    ''' Returns an SdkInotifyWatcher if inotify is available, otherwise an SdkPollingWatcher. '''
+    try:
+        return SdkInotifyWatcher(root_path, watched_paths)
+    except OSError:
+        return SdkPollingWatcher(root_path, watched_paths)
+
+def _is_ignored(ignore_patterns, relative_path, is_dir):
+    ''' relative_path is relative to the workspace root, where ignore_patterns,
+        the workspace's .qappignore patterns, are anchored.
+    '''
+    name = os.path.basename(relative_path)
+    if name in EXCLUDED_DIRECTORIES or name.endswith(EXCLUDED_FILE_EXTENSIONS):
+        return True
+    return ignore_patterns.matches(relative_path.replace(os.sep, '/'), name, is_dir)
+
+def _walk_tree(root_path, relative_dir, ignore_patterns):
+    ''' Yields a (path, is_dir) tuple, with path relative to root_path, for each file
+        and directory beneath relative_dir that is not ignored.
+        Ignored directories are pruned, so nothing inside them is read.
+    '''
+    for dir_path, dir_names, file_names in os.walk(os.path.join(root_path, relative_dir)):
+        relative_parent = os.path.relpath(dir_path, root_path)
+        dir_names[:] = [dir_name for dir_name in sorted(dir_names)
+                        if not _is_ignored(ignore_patterns, os.path.join(relative_parent, dir_name), True)]
+        for dir_name in dir_names:
+            yield os.path.join(relative_parent, dir_name), True
+        for file_name in sorted(file_names):
+            path = os.path.join(relative_parent, file_name)
+            if not _is_ignored(ignore_patterns, path, False):
+                yield path, False
+
+class SdkInotifyWatcher():
+    ''' Watches files and directory trees beneath root_path using Linux inotify.
+        watched_paths are relative to root_path. A watched directory is watched
+        recursively, including directories created after watching starts.
+        A watched file is watched through its parent directory, so that
+        editors which replace a file on save are handled.
+        Directories ignored by the SDK or by the workspace's .qappignore
+        are not watched, and neither is anything inside them.
+    '''
+    description = 'inotify'
+
+    def __init__(self, root_path, watched_paths):
+        self.root_path = root_path
+        self.ignore_patterns = SdkIgnorePatterns.from_file(os.path.join(root_path, QAPPIGNORE_FILE))
+        self.watched_files = set()
+        self.watched_trees = set()
+        self.watch_descriptors = {}
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('C library not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError('inotify is not supported')
+        self.inotify_fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        for watched_path in watched_paths:
+            if os.path.isdir(os.path.join(root_path, watched_path)):
+                self._add_tree(watched_path)
+            else:
+                self.watched_files.add(watched_path)
+                self._add_watch(os.path.dirname(watched_path))
+
+    def close(self):
+        os.close(self.inotify_fd)
+
+    def wait_for_changes(self):
+        ''' Blocks until something changes, then returns the set of changed paths
+            relative to root_path.
+        '''
+        changes = set()
+        while not changes:
+            select.select([self.inotify_fd], [], [])
+            changes.update(self._read_events())
+        while select.select([self.inotify_fd], [], [], SETTLE_SECONDS)[0]:
+            changes.update(self._read_events())
+        return changes
+
+    def _add_tree(self, relative_dir):
+        self.watched_trees.add(relative_dir)
+        self._add_watch(relative_dir)
+        # os.walk yields nothing if the directory was removed again before it could be walked.
+        for path, is_dir in _walk_tree(self.root_path, relative_dir, self.ignore_patterns):
+            if is_dir:
+                self.watched_trees.add(path)
+                self._add_watch(path)
+
+    def _add_watch(self, relative_dir):
+        full_path = os.path.join(self.root_path, relative_dir)
+        watch_descriptor = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(full_path), WATCH_MASK)
+        if watch_descriptor >= 0:
+            self.watch_descriptors[watch_descriptor] = relative_dir
+
+    def _read_events(self):
+        try:
+            buffer = os.read(self.inotify_fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return set()
+        changes = set()
+        offset = 0
+        while offset < len(buffer):
+            watch_descriptor, mask, _, name_length = struct.unpack_from(EVENT_HEADER_FORMAT, buffer, offset)
+            offset += EVENT_HEADER_SIZE
+            name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            relative_dir = self.watch_descriptors.get(watch_descriptor)
+            if relative_dir is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self.watch_descriptors[watch_descriptor]
+                self.watched_trees.discard(relative_dir)
+                continue
+            if not name:
+                continue
+            path = os.path.join(relative_dir, name)
+            if _is_ignored(self.ignore_patterns, path, bool(mask & IN_ISDIR)):
+                continue
+            if relative_dir in self.watched_trees:
+                changes.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+            elif path in self.watched_files:
+                changes.add(path)
+        return changes
+
+class SdkPollingWatcher():
+    ''' Watches the same paths as SdkInotifyWatcher by comparing the size and mtime
+        of every file every POLL_INTERVAL_SECONDS, for platforms without inotify.
+    '''
+    description = 'polling'
+
+    def __init__(self, root_path, watched_paths):
+        self.root_path = root_path
+        self.watched_paths = watched_paths
+        self.ignore_patterns = SdkIgnorePatterns.from_file(os.path.join(root_path, QAPPIGNORE_FILE))
+        self.snapshot = self._take_snapshot()
+
+    def close(self):
+        pass
+
+    def wait_for_changes(self):
+        changes = set()
+        while True:
+            time.sleep(SETTLE_SECONDS if changes else POLL_INTERVAL_SECONDS)
+            snapshot = self._take_snapshot()
+            new_changes = set(path for path in set(snapshot).union(self.snapshot)
+                              if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if changes and not new_changes:
+                return changes
+            changes.update(new_changes)
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for watched_path in self.watched_paths:
+            full_path = os.path.join(self.root_path, watched_path)
+            if os.path.isdir(full_path):
+                file_paths = [path for path, is_dir in _walk_tree(self.root_path, watched_path, self.ignore_patterns)
+                              if not is_dir]
+            else:
+                file_paths = [watched_path]
+            for file_path in file_paths:
+                try:
+                    file_stat = os.stat(os.path.join(self.root_path, file_path))
+                except FileNotFoundError:
+                    continue
+                snapshot[file_path] = (file_stat.st_size, file_stat.st_mtime_ns)
+        return snapshot
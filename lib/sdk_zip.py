@@ -0,0 +1,135 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import hashlib
+import io
+import os
+import struct
+import sys
+import zipfile
+import zlib
+
+# Size of the fixed part of a zip local file header, see zipfile.sizeFileHeader.
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_LENGTHS_FORMAT = '<HH'
+BUFFER_SIZE = 1024 * 1024
+# write_raw_entry uses ZipFile internals that are known to behave the same in these
+# Python versions. In any other version, entries are decompressed and written through
+# ZipFile.open instead, which gives the same zip content at a higher cost.
+RAW_ENTRY_PYTHON_VERSIONS = ((3, 6), (3, 13))
+ZIPFILE_INTERNALS = ('_lock', '_writecheck', '_didModify', 'start_dir')
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        for block in iter(lambda: hashed_file.read(BUFFER_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def compress_file(path, compress_type=zipfile.ZIP_DEFLATED, level=zlib.Z_DEFAULT_COMPRESSION,
+                  compute_digest=False):
+    ''' Compresses the file at path as ZipFile.write would, but without writing it
+        to a zip, so that it can run on a worker thread. zlib releases the GIL while
+        compressing, so several files can be compressed at the same time.
+        compress_type is zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED.
+        Returns a (ZipInfo, compressed bytes, SHA-256 hex digest or None) tuple.
+    '''
+    zinfo = zipfile.ZipInfo.from_file(path)
+    zinfo.compress_type = compress_type
+    compressor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    sha256 = hashlib.sha256() if compute_digest else None
+    crc = 0
+    file_size = 0
+    compressed_blocks = []
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(BUFFER_SIZE), b''):
+            crc = zlib.crc32(block, crc)
+            file_size += len(block)
+            if sha256:
+                sha256.update(block)
+            compressed_blocks.append(compressor.compress(block) if compressor else block)
+    if compressor:
+        compressed_blocks.append(compressor.flush())
+    compressed_data = b''.join(compressed_blocks)
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(compressed_data)
+    return zinfo, compressed_data, sha256.hexdigest() if sha256 else None
+
+def seek_to_entry_data(zip_file_object, zinfo):
+    ''' Positions zip_file_object, an open binary file containing a zip,
+        at the start of the compressed data for the entry described by zinfo.
+    '''
+    zip_file_object.seek(zinfo.header_offset + LOCAL_HEADER_SIZE - 4)
+    name_length, extra_length = struct.unpack(LOCAL_HEADER_LENGTHS_FORMAT, zip_file_object.read(4))
+    zip_file_object.seek(name_length + extra_length, os.SEEK_CUR)
+
+def set_compress_level(zinfo, level):
+    ''' Sets the level at which ZipFile.open compresses the entry for zinfo.
+        Python 3.6 has no such setting, and always uses zlib's default level.
+    '''
+    # pylint: disable=protected-access
+    if hasattr(zinfo, '_compresslevel'):
+        zinfo._compresslevel = level
+
+def raw_entries_supported(target_zip):
+    ''' Returns True if write_raw_entry can copy compressed data straight into target_zip. '''
+    return (RAW_ENTRY_PYTHON_VERSIONS[0] <= sys.version_info[:2] <= RAW_ENTRY_PYTHON_VERSIONS[1] and
+            all(hasattr(target_zip, name) for name in ZIPFILE_INTERNALS))
+
+def write_raw_entry(target_zip, zinfo, source, level=zlib.Z_DEFAULT_COMPRESSION):
+    ''' Writes an entry whose data has already been compressed into target_zip.
+        zinfo must have compress_type, CRC, compress_size and file_size set.
+        source is either a file object positioned at the start of the compressed
+        data, from which compress_size bytes are copied, or a bytes object.
+        zipfile has no public API for this, so the local header is written here
+        and the entry is registered for the central directory as ZipFile.write does.
+        If raw_entries_supported is False, the data is decompressed and compressed
+        again at level through ZipFile.open.
+    '''
+    if not raw_entries_supported(target_zip):
+        _rewrite_entry(target_zip, zinfo, source, level)
+        return
+    # pylint: disable=protected-access
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zinfo.flag_bits = 0
+    with target_zip._lock:
+        zinfo.header_offset = target_zip.fp.tell()
+        target_zip._writecheck(zinfo)
+        target_zip._didModify = True
+        target_zip.fp.write(zinfo.FileHeader(zip64))
+        if isinstance(source, bytes):
+            target_zip.fp.write(source)
+        else:
+            remaining = zinfo.compress_size
+            while remaining > 0:
+                block = source.read(min(BUFFER_SIZE, remaining))
+                if not block:
+                    raise OSError('Unexpected end of data while copying {0}'.format(zinfo.filename))
+                target_zip.fp.write(block)
+                remaining -= len(block)
+        target_zip.start_dir = target_zip.fp.tell()
+        target_zip.filelist.append(zinfo)
+        target_zip.NameToInfo[zinfo.filename] = zinfo
+
+def _rewrite_entry(target_zip, zinfo, source, level):
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    decompressor = zlib.decompressobj(-15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+    # ZipFile.open resets the sizes in zinfo.
+    remaining = zinfo.compress_size
+    set_compress_level(zinfo, level)
+    with target_zip.open(zinfo, 'w') as entry_file:
+        while remaining > 0:
+            block = source.read(min(BUFFER_SIZE, remaining))
+            if not block:
+                raise OSError('Unexpected end of data while copying {0}'.format(zinfo.filename))
+            remaining -= len(block)
+            entry_file.write(decompressor.decompress(block) if decompressor else block)
+        if decompressor:
+            entry_file.write(decompressor.flush())
@@ -0,0 +1,170 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'image_files', 'bin'))
+# pylint: disable=wrong-import-position
+from log_collector import LogFileTailer, RateLimiter, TokenBucket
+
+class FakeClock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+class ClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('log_collector.time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class TestTokenBucket(ClockTestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=10, burst=20)
+        self.assertEqual(bucket.take(15), 15)
+        self.assertEqual(bucket.take(15), 5)
+        self.assertEqual(bucket.take(1), 0)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.take(15), 5)
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = TokenBucket(rate=10, burst=20)
+        bucket.take(20)
+        self.clock.now += 60
+        self.assertEqual(bucket.take(100), 20)
+
+    def test_give_back(self):
+        bucket = TokenBucket(rate=10, burst=20)
+        bucket.take(20)
+        bucket.give_back(5)
+        self.assertEqual(bucket.take(10), 5)
+        bucket.give_back(100)
+        self.assertEqual(bucket.take(100), 20)
+
+class TestRateLimiter(ClockTestCase):
+    LINES = ['line {0}'.format(number) for number in range(10)]
+
+    def test_unlimited(self):
+        limiter = RateLimiter(0, 0, 0, 0, sample_interval=0)
+        self.assertEqual(limiter.admit('app.log', self.LINES), self.LINES)
+        self.assertEqual(limiter.take_unreported(), {})
+
+    def test_file_limit_suppresses_and_reports(self):
+        limiter = RateLimiter(file_rate=1, file_burst=4, global_rate=0, global_burst=0, sample_interval=0)
+        self.assertEqual(limiter.admit('app.log', self.LINES), self.LINES[:4])
+        # Each file has its own budget.
+        self.assertEqual(limiter.admit('other.log', self.LINES[:2]), self.LINES[:2])
+        self.assertEqual(limiter.take_unreported(), {'app.log': 6})
+        self.assertEqual(limiter.take_unreported(), {})
+        self.assertEqual(limiter.stats()['app.log'], {'shipped': 4, 'suppressed': 6, 'sampled': 0})
+
+    def test_over_budget_lines_are_sampled(self):
+        limiter = RateLimiter(file_rate=1, file_burst=4, global_rate=0, global_burst=0, sample_interval=3)
+        admitted = limiter.admit('app.log', self.LINES)
+        self.assertEqual(admitted, self.LINES[:4] + ['line 4', 'line 7'])
+        self.assertEqual(limiter.stats()['app.log'], {'shipped': 6, 'suppressed': 4, 'sampled': 2})
+
+    def test_global_limit_returns_unused_file_tokens(self):
+        limiter = RateLimiter(file_rate=1, file_burst=8, global_rate=1, global_burst=3, sample_interval=0)
+        self.assertEqual(limiter.admit('app.log', self.LINES[:5]), self.LINES[:3])
+        # The two lines refused by the global limit are given back to the file's bucket.
+        self.assertEqual(limiter.counters_for('app.log').bucket.tokens, 5)
+        self.assertEqual(limiter.admit('other.log', self.LINES[:5]), [])
+
+class TestLogFileTailer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.temp_dir.name, 'app.log')
+        self.shipped = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _ship(self, log_file_path, lines, position):
+        self.assertEqual(log_file_path, self.log_path)
+        self.shipped.extend(lines)
+        self.position = position
+
+    def _append(self, text, path=None):
+        with open(path or self.log_path, 'ab') as log_file:
+            log_file.write(text)
+
+    def _tailer(self, position=(0, 0)):
+        tailer = LogFileTailer(self.log_path, self._ship, position, check_interval=1)
+        self.addCleanup(lambda: tailer.log_file and tailer.log_file.close())
+        return tailer
+
+    def test_ships_complete_lines_only(self):
+        self._append(b'one\ntwo\nthr')
+        tailer = self._tailer()
+        self.assertTrue(tailer.follow())
+        self.assertEqual(self.shipped, ['one', 'two'])
+        self.assertEqual(self.position, (os.stat(self.log_path).st_ino, 8))
+        self._append(b'ee\n')
+        tailer.follow()
+        self.assertEqual(self.shipped, ['one', 'two', 'three'])
+
+    def test_resumes_from_position(self):
+        self._append(b'one\ntwo\n')
+        inode = os.stat(self.log_path).st_ino
+        self._tailer((inode, 4)).follow()
+        self.assertEqual(self.shipped, ['two'])
+
+    def test_position_for_another_inode_starts_at_beginning(self):
+        self._append(b'one\ntwo\n')
+        inode = os.stat(self.log_path).st_ino
+        self._tailer((inode + 1, 4)).follow()
+        self.assertEqual(self.shipped, ['one', 'two'])
+
+    def test_rotation(self):
+        self._append(b'one\n')
+        tailer = self._tailer()
+        tailer.follow()
+        rotated_path = self.log_path + '.1'
+        os.rename(self.log_path, rotated_path)
+        # Written by the app before it reopened its log file.
+        self._append(b'two\nlast', rotated_path)
+        self._append(b'new\n')
+        self.assertTrue(tailer.follow())
+        self.assertEqual(self.shipped, ['one', 'two', 'last', 'new'])
+        self.assertEqual(self.position, (os.stat(self.log_path).st_ino, 4))
+
+    def test_truncation(self):
+        self._append(b'a long first line\n')
+        tailer = self._tailer()
+        tailer.follow()
+        with open(self.log_path, 'wb') as log_file:
+            log_file.write(b'new\n')
+        tailer.follow()
+        self.assertEqual(self.shipped, ['a long first line', 'new'])
+        self.assertEqual(self.position[1], 4)
+
+    def test_removed(self):
+        self._append(b'one\npartial')
+        tailer = self._tailer()
+        tailer.follow()
+        os.remove(self.log_path)
+        self.assertFalse(tailer.follow())
+        self.assertEqual(self.shipped, ['one', 'partial'])
+
+    def test_missing_file(self):
+        self.assertFalse(self._tailer().follow())
+
+    def test_long_line_is_shipped_in_pieces(self):
+        self._append(b'x' * (LogFileTailer.MAX_LINE_SIZE + 10))
+        tailer = self._tailer()
+        tailer.follow()
+        self.assertEqual(self.shipped, ['x' * (LogFileTailer.MAX_LINE_SIZE + 10)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+from sdk_compression import (SdkCompressionPolicy, MODE_AUTO, MODE_DEFLATE, MODE_EXTENSION,
+                             TRIAL_MIN_FILE_SIZE)
+from sdk_zip import write_raw_entry
+
+class TestCompressionPolicy(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # Repetitive text deflates well; random bytes do not.
+        self.text_path = self._write('large.txt', b'line of text\n' * TRIAL_MIN_FILE_SIZE)
+        self.random_path = self._write('large.bin', os.urandom(TRIAL_MIN_FILE_SIZE * 2))
+        self.small_random_path = self._write('small.bin', os.urandom(TRIAL_MIN_FILE_SIZE // 2))
+        self.wheel_path = self._write('package.whl', b'line of text\n' * 100)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as target_file:
+            target_file.write(content)
+        return path
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            SdkCompressionPolicy('fastest')
+
+    def test_signature_reflects_settings(self):
+        self.assertNotEqual(SdkCompressionPolicy(MODE_AUTO, 6).signature(),
+                            SdkCompressionPolicy(MODE_AUTO, 9).signature())
+        self.assertNotEqual(SdkCompressionPolicy(MODE_AUTO, 6).signature(),
+                            SdkCompressionPolicy(MODE_DEFLATE, 6).signature())
+
+    def test_auto_mode(self):
+        policy = SdkCompressionPolicy(MODE_AUTO)
+        self.assertEqual(policy.choose_compression(self.wheel_path), zipfile.ZIP_STORED)
+        self.assertEqual(policy.choose_compression(self.random_path), zipfile.ZIP_STORED)
+        self.assertEqual(policy.choose_compression(self.small_random_path), zipfile.ZIP_DEFLATED)
+        self.assertEqual(policy.choose_compression(self.text_path), zipfile.ZIP_DEFLATED)
+
+    def test_extension_mode(self):
+        policy = SdkCompressionPolicy(MODE_EXTENSION)
+        self.assertEqual(policy.choose_compression(self.wheel_path), zipfile.ZIP_STORED)
+        self.assertEqual(policy.choose_compression(self.wheel_path.upper()), zipfile.ZIP_STORED)
+        self.assertEqual(policy.choose_compression(self.random_path), zipfile.ZIP_DEFLATED)
+
+    def test_deflate_mode(self):
+        policy = SdkCompressionPolicy(MODE_DEFLATE)
+        self.assertEqual(policy.choose_compression(self.wheel_path), zipfile.ZIP_DEFLATED)
+        self.assertEqual(policy.choose_compression(self.random_path), zipfile.ZIP_DEFLATED)
+
+    def test_add_file_to_zip(self):
+        policy = SdkCompressionPolicy(MODE_AUTO)
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w') as target_zip:
+            for path in (self.text_path, self.random_path, self.wheel_path):
+                policy.add_file_to_zip(target_zip, path)
+        with zipfile.ZipFile(zip_buffer) as package_zip:
+            self.assertIsNone(package_zip.testzip())
+            compress_types = [zinfo.compress_type for zinfo in package_zip.infolist()]
+            with open(self.random_path, 'rb') as random_file:
+                self.assertEqual(package_zip.read(package_zip.infolist()[1]), random_file.read())
+        self.assertEqual(compress_types, [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED, zipfile.ZIP_STORED])
+        self.assertEqual(policy.deflated_count, 1)
+        self.assertEqual(policy.stored_count, 2)
+        self.assertEqual(policy.deflated_input_bytes, os.path.getsize(self.text_path))
+        self.assertLess(policy.deflated_output_bytes, policy.deflated_input_bytes)
+        self.assertEqual(policy.stored_bytes,
+                         os.path.getsize(self.random_path) + os.path.getsize(self.wheel_path))
+
+    def test_compress_file_for_raw_entry(self):
+        policy = SdkCompressionPolicy(MODE_AUTO)
+        zinfo, data, digest = policy.compress_file(self.text_path, compute_digest=True)
+        with open(self.text_path, 'rb') as text_file:
+            content = text_file.read()
+        self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w') as target_zip:
+            write_raw_entry(target_zip, zinfo, io.BytesIO(data), policy.level)
+        with zipfile.ZipFile(zip_buffer) as package_zip:
+            self.assertIsNone(package_zip.testzip())
+            self.assertEqual(package_zip.read(zinfo.filename), content)
+        self.assertEqual(policy.deflated_count, 1)
+        self.assertEqual(policy.deflated_output_bytes, len(data))
+
+if __name__ == '__main__':
+    unittest.main()
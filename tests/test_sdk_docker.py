@@ -0,0 +1,77 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import sys
+import unittest
+from unittest import mock
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+docker = pytest.importorskip('docker')
+requests = pytest.importorskip('requests')
+from sdk_docker import SdkDockerClient
+from sdk_exceptions import SdkContainerError, SdkDockerError
+
+class TestWaitForContainerRemoveComplete(unittest.TestCase):
+    def _container(self, wait_error=None, reload_error=None):
+        container = mock.Mock()
+        container.name = 'qapp-1001'
+        container.wait.side_effect = wait_error
+        container.reload.side_effect = reload_error
+        return container
+
+    def test_removed_automatically(self):
+        container = self._container()
+        SdkDockerClient._wait_for_container_remove_complete(container)
+        container.remove.assert_not_called()
+
+    def test_already_removed(self):
+        container = self._container(wait_error=docker.errors.NotFound('gone'))
+        SdkDockerClient._wait_for_container_remove_complete(container)
+        container.remove.assert_not_called()
+
+    def test_stalled_wait_forces_remove(self):
+        # Docker sends the headers immediately, so a stalled body raises ConnectionError.
+        container = self._container(wait_error=requests.exceptions.ConnectionError('Read timed out.'),
+                                    reload_error=docker.errors.NotFound('gone'))
+        SdkDockerClient._wait_for_container_remove_complete(container)
+        container.remove.assert_called_once_with(force=True)
+
+    def test_read_timeout_forces_remove(self):
+        container = self._container(wait_error=requests.exceptions.ReadTimeout(),
+                                    reload_error=docker.errors.NotFound('gone'))
+        SdkDockerClient._wait_for_container_remove_complete(container)
+        container.remove.assert_called_once_with(force=True)
+
+    def test_container_still_present_after_forced_remove(self):
+        container = self._container(wait_error=requests.exceptions.ConnectionError('Read timed out.'))
+        with self.assertRaises(SdkContainerError):
+            SdkDockerClient._wait_for_container_remove_complete(container)
+
+class TestBuildImage(unittest.TestCase):
+    BUILD_STREAM = [{'stream': 'Step 1/1 : FROM base\n'}, {'aux': {'ID': 'sha256:1234'}},
+                    {'stream': 'Successfully tagged qapp-1001:latest\n'}]
+
+    def _docker_client(self, tagged_image_id):
+        docker_client = SdkDockerClient.__new__(SdkDockerClient)
+        docker_client.docker_client = mock.Mock()
+        docker_client.docker_client.api.build.return_value = iter(self.BUILD_STREAM)
+        docker_client.retrieve_image = mock.Mock(return_value=mock.Mock(id=tagged_image_id))
+        return docker_client
+
+    def test_built_image_is_tagged(self):
+        docker_client = self._docker_client('sha256:1234')
+        docker_client.build_image('qapp-1001', '/build')
+        docker_client.retrieve_image.assert_called_once_with('qapp-1001')
+
+    def test_tag_on_another_image_raises(self):
+        docker_client = self._docker_client('sha256:5678')
+        with self.assertRaises(SdkDockerError):
+            docker_client.build_image('qapp-1001', '/build')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+from sdk_compression import SdkCompressionPolicy, MODE_DEFLATE
+from sdk_packagecache import SdkPackageCache
+
+class TestPackageCache(unittest.TestCase):
+    def setUp(self):
+        self.original_dir = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.makedirs('app')
+        self._write('app/main.py', b'print("hello")\n' * 100)
+        self._write('app/data.txt', b'some data\n' * 100)
+
+    def tearDown(self):
+        os.chdir(self.original_dir)
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def _write(path, content):
+        with open(path, 'wb') as target_file:
+            target_file.write(content)
+
+    def _package(self, package_path, policy=None):
+        ''' Returns the paths whose cached entries were reused. '''
+        reused = []
+        with SdkPackageCache('.', policy or SdkCompressionPolicy()) as cache:
+            with zipfile.ZipFile(package_path, 'w') as target_zip:
+                for path in ('app/main.py', 'app/data.txt'):
+                    if cache.add_file(path, target_zip):
+                        reused.append(path)
+            cache.save(package_path)
+        return reused
+
+    def _assert_package_matches_files(self, package_path):
+        with zipfile.ZipFile(package_path) as package_zip:
+            self.assertIsNone(package_zip.testzip())
+            for path in ('app/main.py', 'app/data.txt'):
+                with open(path, 'rb') as source_file:
+                    self.assertEqual(package_zip.read(path), source_file.read())
+
+    def test_first_package_reuses_nothing(self):
+        self.assertEqual(self._package('first.zip'), [])
+        self._assert_package_matches_files('first.zip')
+
+    def test_unchanged_files_are_reused(self):
+        self._package('first.zip')
+        self.assertEqual(self._package('second.zip'), ['app/main.py', 'app/data.txt'])
+        self._assert_package_matches_files('second.zip')
+
+    def test_touched_file_with_same_content_is_reused(self):
+        self._package('first.zip')
+        file_stat = os.stat('app/main.py')
+        os.utime('app/main.py', ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+        self.assertEqual(self._package('second.zip'), ['app/main.py', 'app/data.txt'])
+        self._assert_package_matches_files('second.zip')
+
+    def test_changed_file_is_compressed_again(self):
+        self._package('first.zip')
+        self._write('app/main.py', b'print("goodbye")\n' * 100)
+        self.assertEqual(self._package('second.zip'), ['app/data.txt'])
+        self._assert_package_matches_files('second.zip')
+
+    def test_changed_compression_settings_disable_cache(self):
+        self._package('first.zip')
+        self.assertEqual(self._package('second.zip', SdkCompressionPolicy(MODE_DEFLATE, 9)), [])
+        self._assert_package_matches_files('second.zip')
+
+    def test_unreadable_index_disables_cache(self):
+        self._package('first.zip')
+        cache = SdkPackageCache('.', SdkCompressionPolicy())
+        self._write(cache.index_path, b'not json')
+        self.assertEqual(self._package('second.zip'), [])
+        self._assert_package_matches_files('second.zip')
+
+if __name__ == '__main__':
+    unittest.main()
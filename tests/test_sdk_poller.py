@@ -0,0 +1,73 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import itertools
+import os
+import sys
+import unittest
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+from sdk_exceptions import SdkPollTimeoutError
+from sdk_poller import SdkPoller
+
+class FakeClock():
+    ''' Replaces time.monotonic and time.sleep so that polls run instantly. '''
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestPollerDelays(unittest.TestCase):
+    def test_backoff_without_jitter(self):
+        poller = SdkPoller(initial_delay=0.5, max_delay=4, multiplier=2, jitter=0)
+        self.assertEqual(list(itertools.islice(poller.delays(), 7)), [0.5, 1, 2, 4, 4, 4, 4])
+
+    def test_jitter_only_shortens_delays(self):
+        poller = SdkPoller(initial_delay=1, max_delay=8, multiplier=2, jitter=0.25)
+        undelayed = [1, 2, 4, 8, 8, 8]
+        for _ in range(50):
+            for delay, undelayed_delay in zip(poller.delays(), undelayed):
+                self.assertLessEqual(delay, undelayed_delay)
+                self.assertGreaterEqual(delay, undelayed_delay * 0.75)
+
+class TestPollerPoll(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple('sdk_poller.time', monotonic=self.clock.monotonic,
+                                      sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_first_complete_result(self):
+        check_function = mock.Mock(side_effect=['queued', 'running', 'done', 'unused'])
+        poller = SdkPoller(initial_delay=0.5, jitter=0)
+        self.assertEqual(poller.poll(check_function, lambda status: status == 'done'), 'done')
+        self.assertEqual(check_function.call_count, 3)
+        self.assertEqual(self.clock.sleeps, [0.5, 1])
+
+    def test_complete_on_first_check_does_not_sleep(self):
+        poller = SdkPoller()
+        self.assertEqual(poller.poll(lambda: 'done', lambda status: status == 'done'), 'done')
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_timeout(self):
+        check_function = mock.Mock(return_value='running')
+        poller = SdkPoller(initial_delay=1, max_delay=4, multiplier=2, jitter=0, timeout=10)
+        with self.assertRaisesRegex(SdkPollTimeoutError, 'Timed out after 10s waiting for install'):
+            poller.poll(check_function, lambda status: status == 'done', 'install')
+        # The last sleep is cut short so that the deadline is not overshot.
+        self.assertEqual(self.clock.sleeps, [1, 2, 4, 3])
+        self.assertEqual(check_function.call_count, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+from sdk_scanner import SdkIgnorePatterns, SdkWorkspaceScanner
+
+class TestIgnorePatterns(unittest.TestCase):
+    def _matches(self, patterns, relative_path, is_dir=False):
+        return SdkIgnorePatterns(patterns).matches(relative_path, relative_path.split('/')[-1], is_dir)
+
+    def test_comments_and_blank_lines_are_skipped(self):
+        patterns = SdkIgnorePatterns(['# a comment', '', '   '])
+        self.assertFalse(patterns.matches('# a comment', '# a comment', False))
+        self.assertIsNone(patterns.unanchored_any)
+        self.assertIsNone(patterns.anchored_any)
+
+    def test_name_pattern_matches_at_any_depth(self):
+        self.assertTrue(self._matches(['*.log'], 'debug.log'))
+        self.assertTrue(self._matches(['*.log'], 'app/logs/debug.log'))
+        self.assertFalse(self._matches(['*.log'], 'app/debug.log.txt'))
+
+    def test_wildcards(self):
+        self.assertTrue(self._matches(['file?.txt'], 'app/file1.txt'))
+        self.assertFalse(self._matches(['file?.txt'], 'app/file10.txt'))
+        self.assertTrue(self._matches(['file[0-9].txt'], 'file7.txt'))
+        self.assertFalse(self._matches(['file[!0-9].txt'], 'file7.txt'))
+        self.assertTrue(self._matches(['file[!0-9].txt'], 'filex.txt'))
+
+    def test_pattern_with_slash_is_anchored(self):
+        self.assertTrue(self._matches(['app/static/*.map'], 'app/static/main.map'))
+        self.assertFalse(self._matches(['app/static/*.map'], 'other/app/static/main.map'))
+        self.assertFalse(self._matches(['app/static/*.map'], 'app/static/js/main.map'))
+
+    def test_leading_slash_anchors_to_root(self):
+        self.assertTrue(self._matches(['/build'], 'build', is_dir=True))
+        self.assertFalse(self._matches(['/build'], 'app/build', is_dir=True))
+
+    def test_double_star(self):
+        self.assertTrue(self._matches(['app/**/test_*.py'], 'app/test_main.py'))
+        self.assertTrue(self._matches(['app/**/test_*.py'], 'app/a/b/test_main.py'))
+        self.assertTrue(self._matches(['docs/**'], 'docs/a/b.md'))
+
+    def test_trailing_slash_matches_directories_only(self):
+        self.assertTrue(self._matches(['node_modules/'], 'app/node_modules', is_dir=True))
+        self.assertFalse(self._matches(['node_modules/'], 'app/node_modules', is_dir=False))
+
+    def test_from_missing_file_matches_nothing(self):
+        patterns = SdkIgnorePatterns.from_file(os.path.join(tempfile.gettempdir(), 'no-such-dir', '.qappignore'))
+        self.assertFalse(patterns.matches('app', 'app', True))
+
+class TestWorkspaceScanner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for path in ('manifest.json', 'qenv.ini', '.qradar_app_uuid', 'app/main.py', 'app/main.pyc',
+                     'app/.DS_Store', 'app/__pycache__/main.cpython-36.pyc', 'app/static/b.js',
+                     'app/static/a.js', 'app/node_modules/lib/index.js', 'store/db.sqlite',
+                     '.git/HEAD', 'container/build.sh', 'notes/app.log'):
+            self._write(path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, path, content=''):
+        full_path = os.path.join(self.root, *path.split('/'))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as target_file:
+            target_file.write(content)
+
+    def _scan(self, **kwargs):
+        return [(entry.path.replace(os.sep, '/'), entry.is_dir)
+                for entry in SdkWorkspaceScanner(self.root, **kwargs).scan()]
+
+    def test_workspace_rules_and_order(self):
+        self.assertEqual(self._scan(),
+                         [('manifest.json', False),
+                          ('app', True),
+                          ('app/main.py', False),
+                          ('app/node_modules', True),
+                          ('app/node_modules/lib', True),
+                          ('app/node_modules/lib/index.js', False),
+                          ('app/static', True),
+                          ('app/static/a.js', False),
+                          ('app/static/b.js', False),
+                          ('container', True),
+                          ('container/build.sh', False),
+                          ('notes', True),
+                          ('notes/app.log', False)])
+
+    def test_excluded_file_names(self):
+        paths = [path for path, _ in self._scan(excluded_file_names=['main.py'])]
+        self.assertNotIn('app/main.py', paths)
+        self.assertIn('manifest.json', paths)
+
+    def test_without_workspace_rules(self):
+        paths = [path for path, _ in self._scan(workspace_rules=False)]
+        self.assertIn('qenv.ini', paths)
+        self.assertIn('app/__pycache__/main.cpython-36.pyc', paths)
+        self.assertIn('store/db.sqlite', paths)
+
+    def test_qappignore_patterns(self):
+        self._write('.qappignore', '# build output\nnode_modules/\n*.log\n/container\n')
+        paths = [path for path, _ in self._scan()]
+        self.assertNotIn('.qappignore', paths)
+        self.assertNotIn('app/node_modules', paths)
+        self.assertNotIn('notes/app.log', paths)
+        self.assertNotIn('container', paths)
+        self.assertIn('notes', paths)
+        self.assertIn('app/static/a.js', paths)
+
+    def test_excluded_directories_are_not_read(self):
+        self._write('.qappignore', 'node_modules/\n')
+        scanned_dirs = []
+        real_scandir = os.scandir
+
+        def recording_scandir(path):
+            scanned_dirs.append(os.path.relpath(path, self.root).replace(os.sep, '/'))
+            return real_scandir(path)
+
+        with mock.patch('sdk_scanner.os.scandir', side_effect=recording_scandir):
+            self._scan()
+        self.assertIn('app/static', scanned_dirs)
+        for excluded_dir in ('app/node_modules', 'app/__pycache__', 'store', '.git'):
+            self.assertNotIn(excluded_dir, scanned_dirs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# Licensed Materials - Property of IBM
+# 5725I71-CC011829
+# (C) Copyright IBM Corp. 2015, 2020. All Rights Reserved.
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with IBM Corp.
+
+import collections
+import os
+import sys
+import unittest
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+# pylint: disable=wrong-import-position
+from sdk_exceptions import SdkContainerError
+from sdk_warmpool import SdkWarmPool
+
+RunSettings = collections.namedtuple('RunSettings', ['env_vars', 'mounts', 'port_mappings', 'memory_limit'])
+RUN_SETTINGS = RunSettings({}, [], {}, '1024m')
+
+class TestWarmPoolFill(unittest.TestCase):
+    def _warm_pool(self, app_container_exists):
+        docker = mock.Mock()
+        docker.retrieve_image.return_value = mock.Mock(id='sha256:1234')
+        docker.retrieve_containers_with_label.return_value = []
+        if app_container_exists:
+            docker.retrieve_container.return_value = mock.Mock()
+        else:
+            docker.retrieve_container.side_effect = SdkContainerError('Container not found')
+        docker.execute_in_container.return_value = (0, b'')
+        workspace = mock.Mock(image_name='myapp')
+        workspace.name = 'myapp'
+        return SdkWarmPool(docker, workspace, 'qradar-myapp')
+
+    def test_fill_starts_and_pauses_container(self):
+        warm_pool = self._warm_pool(app_container_exists=False)
+        warm_pool.fill(RUN_SETTINGS, 1)
+        warm_pool.docker.run.assert_called_once()
+        warm_pool.docker.pause_container.assert_called_once()
+
+    def test_fill_refused_while_app_container_exists(self):
+        warm_pool = self._warm_pool(app_container_exists=True)
+        with self.assertRaises(SdkContainerError):
+            warm_pool.fill(RUN_SETTINGS, 1)
+        warm_pool.docker.run.assert_not_called()
+
+    def test_fill_refuses_more_than_one_container(self):
+        warm_pool = self._warm_pool(app_container_exists=False)
+        with self.assertRaises(SdkContainerError):
+            warm_pool.fill(RUN_SETTINGS, 2)
+        warm_pool.docker.run.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()